@@ -0,0 +1,124 @@
+"""Add soft delete columns
+
+Revision ID: 225382bdda7a
+Revises: 819c84d57241
+Create Date: 2026-10-17 15:02:44.371205
+
+"""
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel.sql.sqltypes
+
+
+# revision identifiers, used by Alembic.
+revision = '225382bdda7a'
+down_revision = '819c84d57241'
+branch_labels = None
+depends_on = None
+
+# Item counts leave out the soft deleted items, the counter of an owner is
+# decremented when an item is soft deleted, not again when it's purged
+itemcount_functions = """
+    CREATE OR REPLACE FUNCTION itemcount_insert() RETURNS trigger LANGUAGE plpgsql AS $$
+    BEGIN
+        INSERT INTO itemcount (owner_id, count)
+        SELECT owner_id, count(*) FROM new_items {new_items_where} GROUP BY owner_id
+        ON CONFLICT (owner_id)
+        DO UPDATE SET count = itemcount.count + EXCLUDED.count;
+        RETURN NULL;
+    END
+    $$;
+    CREATE OR REPLACE FUNCTION itemcount_delete() RETURNS trigger LANGUAGE plpgsql AS $$
+    BEGIN
+        UPDATE itemcount SET count = itemcount.count - deleted.count
+        FROM (
+            SELECT owner_id, count(*) AS count FROM old_items {old_items_where}
+            GROUP BY owner_id
+        ) AS deleted
+        WHERE itemcount.owner_id = deleted.owner_id;
+        RETURN NULL;
+    END
+    $$;
+    CREATE OR REPLACE FUNCTION itemcount_update() RETURNS trigger LANGUAGE plpgsql AS $$
+    BEGIN
+        INSERT INTO itemcount (owner_id, count)
+        SELECT owner_id, sum(delta) FROM (
+            SELECT owner_id, 1 AS delta FROM new_items {new_items_where}
+            UNION ALL
+            SELECT owner_id, -1 AS delta FROM old_items {old_items_where}
+        ) AS changes
+        GROUP BY owner_id
+        HAVING sum(delta) <> 0
+        ON CONFLICT (owner_id)
+        DO UPDATE SET count = itemcount.count + EXCLUDED.count;
+        RETURN NULL;
+    END
+    $$;
+"""
+
+
+def item_partitions():
+    """
+    Names of the partitions of item, none if it's not partitioned, whatever
+    ITEM_HASH_PARTITIONS is now.
+    """
+    connection = op.get_bind()
+    return connection.execute(sa.text(
+        "SELECT inhrelid::regclass::text FROM pg_inherits WHERE inhparent = 'item'::regclass ORDER BY 1"
+    )).scalars().all()
+
+
+def create_item_index(name, column, where):
+    """
+    Create an index of item without blocking writes. Indexes of a partitioned
+    table can't be created concurrently, so the index of each partition is,
+    then attached to the index of the table.
+    """
+    partitions = item_partitions()
+    if not partitions:
+        op.create_index(name, 'item', [column], unique=False, postgresql_where=sa.text(where), postgresql_concurrently=True)
+        return
+    op.execute(f'CREATE INDEX {name} ON ONLY item ({column}) WHERE {where}')
+    for partition in partitions:
+        partition_index = f"{name}_{partition.removeprefix('item_')}"
+        op.execute(f'CREATE INDEX CONCURRENTLY {partition_index} ON {partition} ({column}) WHERE {where}')
+        op.execute(f'ALTER INDEX {name} ATTACH PARTITION {partition_index}')
+
+
+def upgrade():
+    # Nullable columns without a default are added without rewriting the tables
+    # ### commands auto generated by Alembic - please adjust! ###
+    op.add_column('user', sa.Column('deleted_at', sa.DateTime(timezone=True), nullable=True))
+    op.add_column('item', sa.Column('deleted_at', sa.DateTime(timezone=True), nullable=True))
+    # ### end Alembic commands ###
+    op.execute(itemcount_functions.format(
+        new_items_where='WHERE deleted_at IS NULL',
+        old_items_where='WHERE deleted_at IS NULL',
+    ))
+    with op.get_context().autocommit_block():
+        # The unique index of the emails is replaced by one leaving out the
+        # deleted users, it's built before the old one is dropped
+        op.create_index('ix_user_email_not_deleted', 'user', ['email'], unique=True, postgresql_where=sa.text('deleted_at IS NULL'), postgresql_concurrently=True)
+        op.drop_index('ix_user_email', table_name='user', postgresql_concurrently=True)
+        op.execute('ALTER INDEX ix_user_email_not_deleted RENAME TO ix_user_email')
+        op.create_index('ix_user_deleted_at', 'user', ['deleted_at'], unique=False, postgresql_where=sa.text('deleted_at IS NOT NULL'), postgresql_concurrently=True)
+        create_item_index('ix_item_deleted_at', 'deleted_at', 'deleted_at IS NOT NULL')
+
+
+def downgrade():
+    # The soft deleted rows would be visible again, they are purged first, the
+    # items while they are still left out of the counts
+    op.execute('DELETE FROM item WHERE deleted_at IS NOT NULL')
+    op.execute('DELETE FROM "user" WHERE deleted_at IS NOT NULL')
+    op.execute(itemcount_functions.format(new_items_where='', old_items_where=''))
+    with op.get_context().autocommit_block():
+        # Indexes of a partitioned table can't be dropped concurrently
+        op.drop_index('ix_item_deleted_at', table_name='item', postgresql_concurrently=not item_partitions())
+        op.drop_index('ix_user_deleted_at', table_name='user', postgresql_concurrently=True)
+        op.create_index('ix_user_email_all', 'user', ['email'], unique=True, postgresql_concurrently=True)
+        op.drop_index('ix_user_email', table_name='user', postgresql_concurrently=True)
+        op.execute('ALTER INDEX ix_user_email_all RENAME TO ix_user_email')
+    # ### commands auto generated by Alembic - please adjust! ###
+    op.drop_column('item', 'deleted_at')
+    op.drop_column('user', 'deleted_at')
+    # ### end Alembic commands ###
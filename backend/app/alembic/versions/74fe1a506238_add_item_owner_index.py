@@ -0,0 +1,28 @@
+"""Add item owner index
+
+Revision ID: 74fe1a506238
+Revises: 211a3ac2543a
+Create Date: 2026-10-17 12:02:41.377260
+
+"""
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel.sql.sqltypes
+
+
+# revision identifiers, used by Alembic.
+revision = '74fe1a506238'
+down_revision = '211a3ac2543a'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Built concurrently, without blocking writes to the item table
+    with op.get_context().autocommit_block():
+        op.create_index('ix_item_owner_id_id', 'item', ['owner_id', 'id'], unique=False, postgresql_concurrently=True)
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_item_owner_id_id', table_name='item', postgresql_concurrently=True)
@@ -0,0 +1,32 @@
+"""Add user trigram indexes
+
+Revision ID: 80d336cddf4b
+Revises: 66d959f1b69f
+Create Date: 2026-10-17 13:21:52.640187
+
+"""
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel.sql.sqltypes
+
+
+# revision identifiers, used by Alembic.
+revision = '80d336cddf4b'
+down_revision = '66d959f1b69f'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    # Built concurrently, without blocking writes to the user table
+    with op.get_context().autocommit_block():
+        op.create_index('ix_user_email_trgm', 'user', ['email'], unique=False, postgresql_using='gin', postgresql_ops={'email': 'gin_trgm_ops'}, postgresql_concurrently=True)
+        op.create_index('ix_user_full_name_trgm', 'user', ['full_name'], unique=False, postgresql_using='gin', postgresql_ops={'full_name': 'gin_trgm_ops'}, postgresql_concurrently=True)
+
+
+def downgrade():
+    # The extension is left installed, it may be used outside of the app
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_user_full_name_trgm', table_name='user', postgresql_using='gin', postgresql_concurrently=True)
+        op.drop_index('ix_user_email_trgm', table_name='user', postgresql_using='gin', postgresql_concurrently=True)
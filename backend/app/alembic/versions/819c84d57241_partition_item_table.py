@@ -0,0 +1,149 @@
+"""Partition item table
+
+Revision ID: 819c84d57241
+Revises: 80d336cddf4b
+Create Date: 2026-10-17 14:05:37.918462
+
+"""
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel.sql.sqltypes
+
+from app.core.config import settings
+
+
+# revision identifiers, used by Alembic.
+revision = '819c84d57241'
+down_revision = '80d336cddf4b'
+branch_labels = None
+depends_on = None
+
+# Items are copied in batches of this many rows, each in its own transaction
+batch_size = 10000
+columns = 'id, owner_id, title, description'
+
+
+def create_item_table(partitions):
+    """
+    Create item_new, hash partitioned on owner_id, or a single table when
+    `partitions` is 0, and mirror the writes to item on it.
+    """
+    partition_by = ' PARTITION BY HASH (owner_id)' if partitions else ''
+    op.execute(f'CREATE TABLE item_new (LIKE item INCLUDING DEFAULTS INCLUDING GENERATED){partition_by}')
+    for remainder in range(partitions):
+        op.execute(f'CREATE TABLE item_new_p{remainder} PARTITION OF item_new FOR VALUES WITH (MODULUS {partitions}, REMAINDER {remainder})')
+    # The primary key of a partitioned table includes the partition key
+    primary_key = 'id, owner_id' if partitions else 'id'
+    op.execute(f'ALTER TABLE item_new ADD CONSTRAINT item_new_pkey PRIMARY KEY ({primary_key})')
+    op.execute('ALTER TABLE item_new ADD CONSTRAINT item_new_owner_id_fkey FOREIGN KEY (owner_id) REFERENCES "user" (id) ON DELETE CASCADE')
+    op.execute('CREATE INDEX ix_item_new_owner_id_id ON item_new (owner_id, id)')
+    op.execute('CREATE INDEX ix_item_new_search_vector ON item_new USING gin (search_vector)')
+    op.execute(f"""
+        CREATE FUNCTION item_mirror() RETURNS trigger LANGUAGE plpgsql AS $$
+        BEGIN
+            IF TG_OP <> 'INSERT' THEN
+                DELETE FROM item_new WHERE id = OLD.id AND owner_id = OLD.owner_id;
+            END IF;
+            IF TG_OP <> 'DELETE' THEN
+                INSERT INTO item_new ({columns})
+                VALUES (NEW.id, NEW.owner_id, NEW.title, NEW.description)
+                ON CONFLICT DO NOTHING;
+            END IF;
+            RETURN NULL;
+        END
+        $$
+    """)
+    op.execute("""
+        CREATE TRIGGER item_mirror AFTER INSERT OR UPDATE OR DELETE ON item
+        FOR EACH ROW EXECUTE FUNCTION item_mirror()
+    """)
+
+
+def copy_items():
+    """
+    Copy the items to item_new, in batches committed one at a time, while
+    they are still being written.
+
+    The rows of a batch are locked until it's committed, an update or delete
+    of one of them waits for the copy, then its mirror applies to the copied
+    row. Rows inserted or updated before the copy reaches them are already
+    mirrored, the copy skips them.
+    """
+    connection = op.get_bind()
+    copy_batch = sa.text(f"""
+        WITH batch AS (
+            SELECT {columns} FROM item
+            WHERE id > :last_id ORDER BY id LIMIT {batch_size}
+            FOR SHARE
+        ), copied AS (
+            INSERT INTO item_new ({columns})
+            SELECT {columns} FROM batch
+            ON CONFLICT DO NOTHING
+        )
+        SELECT id FROM batch ORDER BY id DESC LIMIT 1
+    """)
+    last_id = '00000000-0000-0000-0000-000000000000'
+    while last_id:
+        last_id = connection.execute(copy_batch, {'last_id': last_id}).scalar()
+
+
+def swap_item_table(partitions):
+    """
+    Replace item by item_new, the writes to item wait for the swap.
+    """
+    op.execute('LOCK TABLE item IN ACCESS EXCLUSIVE MODE')
+    # Also drops its partitions and triggers, including the mirror
+    op.execute('DROP TABLE item')
+    op.execute('DROP FUNCTION item_mirror()')
+    op.execute('ALTER TABLE item_new RENAME TO item')
+    for remainder in range(partitions):
+        op.execute(f'ALTER TABLE item_new_p{remainder} RENAME TO item_p{remainder}')
+    op.execute('ALTER TABLE item RENAME CONSTRAINT item_new_pkey TO item_pkey')
+    op.execute('ALTER TABLE item RENAME CONSTRAINT item_new_owner_id_fkey TO item_owner_id_fkey')
+    op.execute('ALTER INDEX ix_item_new_owner_id_id RENAME TO ix_item_owner_id_id')
+    op.execute('ALTER INDEX ix_item_new_search_vector RENAME TO ix_item_search_vector')
+    # Item counts were kept up to date by the triggers of the old table
+    op.execute("""
+        CREATE TRIGGER itemcount_insert AFTER INSERT ON item
+        REFERENCING NEW TABLE AS new_items
+        FOR EACH STATEMENT EXECUTE FUNCTION itemcount_insert()
+    """)
+    op.execute("""
+        CREATE TRIGGER itemcount_delete AFTER DELETE ON item
+        REFERENCING OLD TABLE AS old_items
+        FOR EACH STATEMENT EXECUTE FUNCTION itemcount_delete()
+    """)
+    op.execute("""
+        CREATE TRIGGER itemcount_update AFTER UPDATE ON item
+        REFERENCING OLD TABLE AS old_items NEW TABLE AS new_items
+        FOR EACH STATEMENT EXECUTE FUNCTION itemcount_update()
+    """)
+
+
+def item_is_partitioned():
+    connection = op.get_bind()
+    return connection.execute(sa.text(
+        "SELECT EXISTS (SELECT FROM pg_partitioned_table WHERE partrelid = 'item'::regclass)"
+    )).scalar()
+
+
+def upgrade():
+    # Opt-in, set ITEM_HASH_PARTITIONS before upgrading past this revision
+    partitions = settings.ITEM_HASH_PARTITIONS
+    if not partitions:
+        return
+    create_item_table(partitions)
+    with op.get_context().autocommit_block():
+        copy_items()
+    swap_item_table(partitions)
+
+
+def downgrade():
+    # Whether it was upgraded with ITEM_HASH_PARTITIONS set, which may have
+    # changed since
+    if not item_is_partitioned():
+        return
+    create_item_table(0)
+    with op.get_context().autocommit_block():
+        copy_items()
+    swap_item_table(0)
@@ -1,17 +1,21 @@
-from collections.abc import Generator
+import uuid
+from collections.abc import AsyncGenerator, Generator
 from typing import Annotated
 
-import jwt
-from fastapi import Depends, HTTPException, status
+from fastapi import Depends, Header, HTTPException, Response, status
 from fastapi.security import OAuth2PasswordBearer
 from jwt.exceptions import InvalidTokenError
 from pydantic import ValidationError
 from sqlmodel import Session
+from sqlmodel.ext.asyncio.session import AsyncSession
 
 from app.core import security
+from app.core.cache import principal_cache
 from app.core.config import settings
-from app.core.db import engine
-from app.models import TokenPayload, User
+from app.core.db import async_engine, engine, replica_router
+from app.core.revocation import revocation_filter
+from app.models import Principal, User
+from app.utils import decode_cursor, decode_search_cursor, etag_matches
 
 reusable_oauth2 = OAuth2PasswordBearer(
     tokenUrl=f"{settings.API_V1_STR}/login/access-token"
@@ -19,37 +23,129 @@ reusable_oauth2 = OAuth2PasswordBearer(
 
 
 def get_db() -> Generator[Session, None, None]:
-    with Session(engine) as session:
+    # Objects returned by a write stay loaded after its commit, reading them
+    # in the response doesn't take another SELECT
+    with Session(engine, expire_on_commit=False) as session:
+        yield session
+
+
+def get_read_db() -> Generator[Session, None, None]:
+    # Replicas lag behind the primary, don't use it to read what was just
+    # written in the same request
+    with Session(replica_router.get_engine(), expire_on_commit=False) as session:
+        yield session
+
+
+async def get_async_db() -> AsyncGenerator[AsyncSession, None]:
+    # Attributes can't be lazy loaded in async code, keep them after commit
+    async with AsyncSession(async_engine, expire_on_commit=False) as session:
         yield session
 
 
 SessionDep = Annotated[Session, Depends(get_db)]
+ReadSessionDep = Annotated[Session, Depends(get_read_db)]
+AsyncSessionDep = Annotated[AsyncSession, Depends(get_async_db)]
 TokenDep = Annotated[str, Depends(reusable_oauth2)]
 
 
-def get_current_user(session: SessionDep, token: TokenDep) -> User:
+def get_cursor(cursor: str | None = None) -> uuid.UUID | None:
+    if cursor is None:
+        return None
     try:
-        payload = jwt.decode(
-            token, settings.SECRET_KEY, algorithms=[security.ALGORITHM]
-        )
-        token_data = TokenPayload(**payload)
-    except (InvalidTokenError, ValidationError):
+        return decode_cursor(cursor)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+CursorDep = Annotated[uuid.UUID | None, Depends(get_cursor)]
+
+
+def get_search_cursor(cursor: str | None = None) -> tuple[float, uuid.UUID] | None:
+    if cursor is None:
+        return None
+    try:
+        return decode_search_cursor(cursor)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+SearchCursorDep = Annotated[tuple[float, uuid.UUID] | None, Depends(get_search_cursor)]
+
+
+# ETags of the representation the client has, for conditional requests
+IfNoneMatchHeader = Annotated[str | None, Header()]
+IfMatchHeader = Annotated[str | None, Header()]
+
+
+def not_modified(
+    response: Response, if_none_match: str | None, etag: str
+) -> Response | None:
+    """
+    Set the ETag of the response, or return a 304 response to send instead
+    when the client already has this representation, the body is then never
+    serialized.
+    """
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers={"ETag": etag})
+    response.headers["ETag"] = etag
+    return None
+
+
+def get_current_principal(session: SessionDep, token: TokenDep) -> Principal:
+    try:
+        token_data = security.decode_token(token)
+        user_id = uuid.UUID(token_data.sub)
+        if token_data.type != "access":
+            raise InvalidTokenError("Not an access token")
+        if token_data.jti and revocation_filter.is_revoked(session, token_data.jti):
+            raise InvalidTokenError("Token revoked")
+    except (InvalidTokenError, ValidationError, TypeError, ValueError):
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Could not validate credentials",
         )
-    user = session.get(User, token_data.sub)
+    if (
+        token_data.email is not None
+        and token_data.is_active is not None
+        and token_data.is_superuser is not None
+    ):
+        # Short-lived tokens carry their claims, no need to look the user up.
+        # They were validated when the token was decoded, which is cached,
+        # validating the email again on each request would cost more
+        principal: Principal | None = Principal.model_construct(
+            id=user_id,
+            email=token_data.email,
+            is_active=token_data.is_active,
+            is_superuser=token_data.is_superuser,
+        )
+    else:
+        principal = principal_cache.get(user_id)
+    if not principal:
+        user = session.get(User, user_id)
+        if not user:
+            raise HTTPException(status_code=404, detail="User not found")
+        principal = Principal.model_validate(user)
+        principal_cache.set(user_id, principal)
+    if not principal.is_active:
+        raise HTTPException(status_code=400, detail="Inactive user")
+    return principal
+
+
+CurrentPrincipal = Annotated[Principal, Depends(get_current_principal)]
+
+
+def get_current_user(session: SessionDep, principal: CurrentPrincipal) -> User:
+    user = session.get(User, principal.id)
     if not user:
+        principal_cache.invalidate(principal.id)
         raise HTTPException(status_code=404, detail="User not found")
-    if not user.is_active:
-        raise HTTPException(status_code=400, detail="Inactive user")
     return user
 
 
 CurrentUser = Annotated[User, Depends(get_current_user)]
 
 
-def get_current_active_superuser(current_user: CurrentUser) -> User:
+def get_current_active_superuser(current_user: CurrentPrincipal) -> Principal:
     if not current_user.is_superuser:
         raise HTTPException(
             status_code=403, detail="The user doesn't have enough privileges"
@@ -1,13 +1,29 @@
 from fastapi import APIRouter
 
-from app.api.routes import items, login, private, users, utils
+from app.api.routes import (
+    items,
+    items_async,
+    login,
+    login_async,
+    private,
+    users,
+    users_async,
+    utils,
+)
 from app.core.config import settings
 
 api_router = APIRouter()
+if settings.ASYNC_ROUTES:
+    # Matched before the sync routes of the same paths, which document them
+    api_router.include_router(login_async.router)
+    api_router.include_router(users_async.router)
 api_router.include_router(login.router)
 api_router.include_router(users.router)
 api_router.include_router(utils.router)
-api_router.include_router(items.router)
+if settings.ASYNC_ROUTES:
+    api_router.include_router(items_async.router)
+else:
+    api_router.include_router(items.router)
 
 
 if settings.ENVIRONMENT == "local":
@@ -1,109 +1,285 @@
 import uuid
-from typing import Any
+from typing import Annotated, Any
 
-from fastapi import APIRouter, HTTPException
-from sqlmodel import func, select
+from fastapi import APIRouter, Body, HTTPException, Response
+from fastapi.responses import StreamingResponse
+from sqlmodel import Session
 
-from app.api.deps import CurrentUser, SessionDep
-from app.models import Item, ItemCreate, ItemPublic, ItemsPublic, ItemUpdate, Message
+from app import crud
+from app.api.deps import (
+    CurrentPrincipal,
+    CursorDep,
+    IfMatchHeader,
+    IfNoneMatchHeader,
+    ReadSessionDep,
+    SearchCursorDep,
+    SessionDep,
+    not_modified,
+)
+from app.core.config import settings
+from app.core.db import replica_router
+from app.export import ExportFormat, export_rows, media_types
+from app.models import (
+    ItemBulkUpdate,
+    ItemCreate,
+    ItemPublic,
+    ItemsBulkResult,
+    ItemsPublic,
+    ItemUpdate,
+    Message,
+)
+from app.utils import encode_cursor, encode_search_cursor, etag_matches, make_etag
 
 router = APIRouter(prefix="/items", tags=["items"])
 
+BulkItemsCreate = Annotated[
+    list[ItemCreate], Body(max_length=settings.ITEMS_BULK_MAX_SIZE)
+]
+BulkItemsUpdate = Annotated[
+    list[ItemBulkUpdate], Body(max_length=settings.ITEMS_BULK_MAX_SIZE)
+]
+BulkItemIds = Annotated[list[uuid.UUID], Body(max_length=settings.ITEMS_BULK_MAX_SIZE)]
+
 
 @router.get("/", response_model=ItemsPublic)
 def read_items(
-    session: SessionDep, current_user: CurrentUser, skip: int = 0, limit: int = 100
+    session: ReadSessionDep,
+    current_user: CurrentPrincipal,
+    response: Response,
+    skip: int = 0,
+    limit: int = 100,
+    cursor: CursorDep = None,
+    if_none_match: IfNoneMatchHeader = None,
 ) -> Any:
     """
     Retrieve items.
+
+    Pass the `next_cursor` of a page as `cursor` to get the page after it,
+    `skip` is ignored then. Pass the `ETag` of a page as `If-None-Match` to
+    get a 304 response when it's unchanged.
     """
+    # One more row than asked for tells if there is a next page
+    page: dict[str, Any] = {"limit": limit + 1}
+    page |= {"after": cursor} if cursor else {"skip": skip}
+    if current_user.is_superuser:
+        count = crud.count_items(session=session)
+        statement = crud.items_after_statement if cursor else crud.items_statement
+        items = session.exec(statement, params=page).all()
+    else:
+        count = crud.count_items(session=session, owner_id=current_user.id)
+        statement = (
+            crud.owner_items_after_statement if cursor else crud.owner_items_statement
+        )
+        page["owner_id"] = current_user.id
+        items = session.exec(statement, params=page).all()
 
+    has_more = len(items) > limit
+    items = items[:limit]
+    next_cursor = encode_cursor(items[-1].id) if has_more and items else None
+    # Fingerprint of the page, from the versions of its items
+    etag = make_etag(
+        count, has_more, next_cursor, [(item.id, item.version) for item in items]
+    )
+    if not_modified_response := not_modified(response, if_none_match, etag):
+        return not_modified_response
+    return ItemsPublic(
+        data=items, count=count, has_more=has_more, next_cursor=next_cursor
+    )
+
+
+@router.get("/export", response_class=StreamingResponse)
+def export_items(
+    current_user: CurrentPrincipal, file_format: ExportFormat = "ndjson"
+) -> Any:
+    """
+    Export all the items as NDJSON or CSV, streamed as they are read.
+    """
     if current_user.is_superuser:
-        count_statement = select(func.count()).select_from(Item)
-        count = session.exec(count_statement).one()
-        statement = select(Item).offset(skip).limit(limit)
-        items = session.exec(statement).all()
+        statement = crud.items_export_statement
+        params = {}
     else:
-        count_statement = (
-            select(func.count())
-            .select_from(Item)
-            .where(Item.owner_id == current_user.id)
+        statement = crud.owner_items_export_statement
+        params = {"owner_id": current_user.id}
+    return StreamingResponse(
+        export_rows(replica_router.get_engine(), statement, params, file_format),
+        media_type=media_types[file_format],
+        headers={"Content-Disposition": f"attachment; filename=items.{file_format}"},
+    )
+
+
+@router.get("/search", response_model=ItemsPublic)
+def search_items(
+    session: ReadSessionDep,
+    current_user: CurrentPrincipal,
+    q: str,
+    limit: int = 100,
+    cursor: SearchCursorDep = None,
+) -> Any:
+    """
+    Search items by their title and description, best matches first.
+
+    `q` takes the web search syntax: quoted phrases, `or` and `-` to exclude
+    a word. Pass the `next_cursor` of a page as `cursor` to get the page
+    after it.
+    """
+    # One more row than asked for tells if there is a next page
+    page: dict[str, Any] = {"q": q, "limit": limit + 1}
+    if cursor:
+        page["rank"], page["after"] = cursor
+    if current_user.is_superuser:
+        statement = (
+            crud.items_search_after_statement if cursor else crud.items_search_statement
         )
-        count = session.exec(count_statement).one()
+    else:
         statement = (
-            select(Item)
-            .where(Item.owner_id == current_user.id)
-            .offset(skip)
-            .limit(limit)
+            crud.owner_items_search_after_statement
+            if cursor
+            else crud.owner_items_search_statement
         )
-        items = session.exec(statement).all()
+        page["owner_id"] = current_user.id
+    results = session.exec(statement, params=page).all()
 
-    return ItemsPublic(data=items, count=count)
+    has_more = len(results) > limit
+    results = results[:limit]
+    next_cursor = None
+    if has_more and results:
+        last_item, last_rank = results[-1]
+        next_cursor = encode_search_cursor(last_rank, last_item.id)
+    return ItemsPublic(
+        data=[ItemPublic.model_validate(item) for item, _ in results],
+        count=None,
+        has_more=has_more,
+        next_cursor=next_cursor,
+    )
+
+
+@router.post("/bulk", response_model=ItemsBulkResult)
+def create_items(
+    *, session: SessionDep, current_user: CurrentPrincipal, items_in: BulkItemsCreate
+) -> Any:
+    """
+    Create many items.
+    """
+    results = crud.create_items(
+        session=session, items_in=items_in, owner_id=current_user.id
+    )
+    return ItemsBulkResult(data=results)
+
+
+@router.put("/bulk", response_model=ItemsBulkResult)
+def update_items(
+    *, session: SessionDep, current_user: CurrentPrincipal, items_in: BulkItemsUpdate
+) -> Any:
+    """
+    Update many items, each result tells if its item was updated.
+    """
+    results = crud.update_items(
+        session=session, items_in=items_in, principal=current_user
+    )
+    return ItemsBulkResult(data=results)
+
+
+@router.delete("/bulk", response_model=ItemsBulkResult)
+def delete_items(
+    *, session: SessionDep, current_user: CurrentPrincipal, ids: BulkItemIds
+) -> Any:
+    """
+    Delete many items, each result tells if its item was deleted.
+    """
+    results = crud.delete_items(session=session, ids=ids, principal=current_user)
+    return ItemsBulkResult(data=results)
+
+
+def item_error(session: Session, id: uuid.UUID) -> HTTPException:
+    """
+    Error for an item the ownership-checked statement didn't return.
+    """
+    if crud.item_exists(session=session, id=id):
+        return HTTPException(status_code=400, detail="Not enough permissions")
+    return HTTPException(status_code=404, detail="Item not found")
 
 
 @router.get("/{id}", response_model=ItemPublic)
-def read_item(session: SessionDep, current_user: CurrentUser, id: uuid.UUID) -> Any:
+def read_item(
+    session: ReadSessionDep,
+    primary_session: SessionDep,
+    current_user: CurrentPrincipal,
+    response: Response,
+    id: uuid.UUID,
+    if_none_match: IfNoneMatchHeader = None,
+) -> Any:
     """
     Get item by ID.
     """
-    item = session.get(Item, id)
+    item = crud.get_item(session=session, id=id, principal=current_user)
+    if not item:
+        # Fall back to the primary for an item not replicated yet
+        item = crud.get_item(session=primary_session, id=id, principal=current_user)
     if not item:
-        raise HTTPException(status_code=404, detail="Item not found")
-    if not current_user.is_superuser and (item.owner_id != current_user.id):
-        raise HTTPException(status_code=400, detail="Not enough permissions")
+        raise item_error(primary_session, id)
+    etag = make_etag(item.id, item.version)
+    if not_modified_response := not_modified(response, if_none_match, etag):
+        return not_modified_response
     return item
 
 
 @router.post("/", response_model=ItemPublic)
 def create_item(
-    *, session: SessionDep, current_user: CurrentUser, item_in: ItemCreate
+    *, session: SessionDep, current_user: CurrentPrincipal, item_in: ItemCreate
 ) -> Any:
     """
     Create new item.
     """
-    item = Item.model_validate(item_in, update={"owner_id": current_user.id})
-    session.add(item)
-    session.commit()
-    session.refresh(item)
-    return item
+    return crud.create_item(session=session, item_in=item_in, owner_id=current_user.id)
 
 
 @router.put("/{id}", response_model=ItemPublic)
 def update_item(
     *,
     session: SessionDep,
-    current_user: CurrentUser,
+    current_user: CurrentPrincipal,
+    response: Response,
     id: uuid.UUID,
     item_in: ItemUpdate,
+    if_match: IfMatchHeader = None,
 ) -> Any:
     """
     Update an item.
+
+    With an `If-Match` header, the item is only updated if its `ETag` still
+    matches, otherwise the response is a 412.
     """
-    item = session.get(Item, id)
+    version = None
+    if if_match:
+        item = crud.get_item(session=session, id=id, principal=current_user)
+        if not item:
+            raise item_error(session, id)
+        if not etag_matches(if_match, make_etag(item.id, item.version), weak=False):
+            raise HTTPException(status_code=412, detail="Item was modified")
+        version = item.version
+    item = crud.update_item(
+        session=session,
+        id=id,
+        item_in=item_in,
+        principal=current_user,
+        version=version,
+    )
+    if not item and version is not None:
+        # Updated or deleted since it was read
+        raise HTTPException(status_code=412, detail="Item was modified")
     if not item:
-        raise HTTPException(status_code=404, detail="Item not found")
-    if not current_user.is_superuser and (item.owner_id != current_user.id):
-        raise HTTPException(status_code=400, detail="Not enough permissions")
-    update_dict = item_in.model_dump(exclude_unset=True)
-    item.sqlmodel_update(update_dict)
-    session.add(item)
-    session.commit()
-    session.refresh(item)
+        raise item_error(session, id)
+    response.headers["ETag"] = make_etag(item.id, item.version)
     return item
 
 
 @router.delete("/{id}")
 def delete_item(
-    session: SessionDep, current_user: CurrentUser, id: uuid.UUID
+    session: SessionDep, current_user: CurrentPrincipal, id: uuid.UUID
 ) -> Message:
     """
     Delete an item.
     """
-    item = session.get(Item, id)
-    if not item:
-        raise HTTPException(status_code=404, detail="Item not found")
-    if not current_user.is_superuser and (item.owner_id != current_user.id):
-        raise HTTPException(status_code=400, detail="Not enough permissions")
-    session.delete(item)
-    session.commit()
+    if not crud.delete_item(session=session, id=id, principal=current_user):
+        raise item_error(session, id)
     return Message(message="Item deleted successfully")
@@ -0,0 +1,282 @@
+import uuid
+from typing import Any
+
+from fastapi import APIRouter, HTTPException, Response
+from fastapi.responses import StreamingResponse
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app import async_crud, crud
+from app.api.deps import (
+    AsyncSessionDep,
+    CurrentPrincipal,
+    CursorDep,
+    IfMatchHeader,
+    IfNoneMatchHeader,
+    SearchCursorDep,
+    not_modified,
+)
+from app.api.routes.items import BulkItemIds, BulkItemsCreate, BulkItemsUpdate
+from app.core.db import async_engine
+from app.export import ExportFormat, export_rows_async, media_types
+from app.models import (
+    ItemCreate,
+    ItemPublic,
+    ItemsBulkResult,
+    ItemsPublic,
+    ItemUpdate,
+    Message,
+)
+from app.utils import encode_cursor, encode_search_cursor, etag_matches, make_etag
+
+# Same routes as app.api.routes.items, served with async handlers and sessions,
+# mounted instead of them when settings.ASYNC_ROUTES is enabled
+router = APIRouter(prefix="/items", tags=["items"])
+
+
+@router.get("/", response_model=ItemsPublic)
+async def read_items(
+    session: AsyncSessionDep,
+    current_user: CurrentPrincipal,
+    response: Response,
+    skip: int = 0,
+    limit: int = 100,
+    cursor: CursorDep = None,
+    if_none_match: IfNoneMatchHeader = None,
+) -> Any:
+    """
+    Retrieve items.
+
+    Pass the `next_cursor` of a page as `cursor` to get the page after it,
+    `skip` is ignored then. Pass the `ETag` of a page as `If-None-Match` to
+    get a 304 response when it's unchanged.
+    """
+    # One more row than asked for tells if there is a next page
+    page: dict[str, Any] = {"limit": limit + 1}
+    page |= {"after": cursor} if cursor else {"skip": skip}
+    if current_user.is_superuser:
+        count = await async_crud.count_items(session=session)
+        statement = crud.items_after_statement if cursor else crud.items_statement
+        items = (await session.exec(statement, params=page)).all()
+    else:
+        count = await async_crud.count_items(session=session, owner_id=current_user.id)
+        statement = (
+            crud.owner_items_after_statement if cursor else crud.owner_items_statement
+        )
+        page["owner_id"] = current_user.id
+        items = (await session.exec(statement, params=page)).all()
+
+    has_more = len(items) > limit
+    items = items[:limit]
+    next_cursor = encode_cursor(items[-1].id) if has_more and items else None
+    etag = make_etag(
+        count, has_more, next_cursor, [(item.id, item.version) for item in items]
+    )
+    if not_modified_response := not_modified(response, if_none_match, etag):
+        return not_modified_response
+    return ItemsPublic(
+        data=items, count=count, has_more=has_more, next_cursor=next_cursor
+    )
+
+
+@router.get("/export", response_class=StreamingResponse)
+async def export_items(
+    current_user: CurrentPrincipal, file_format: ExportFormat = "ndjson"
+) -> Any:
+    """
+    Export all the items as NDJSON or CSV, streamed as they are read.
+    """
+    if current_user.is_superuser:
+        statement = crud.items_export_statement
+        params = {}
+    else:
+        statement = crud.owner_items_export_statement
+        params = {"owner_id": current_user.id}
+    return StreamingResponse(
+        export_rows_async(async_engine, statement, params, file_format),
+        media_type=media_types[file_format],
+        headers={"Content-Disposition": f"attachment; filename=items.{file_format}"},
+    )
+
+
+@router.get("/search", response_model=ItemsPublic)
+async def search_items(
+    session: AsyncSessionDep,
+    current_user: CurrentPrincipal,
+    q: str,
+    limit: int = 100,
+    cursor: SearchCursorDep = None,
+) -> Any:
+    """
+    Search items by their title and description, best matches first.
+
+    `q` takes the web search syntax: quoted phrases, `or` and `-` to exclude
+    a word. Pass the `next_cursor` of a page as `cursor` to get the page
+    after it.
+    """
+    # One more row than asked for tells if there is a next page
+    page: dict[str, Any] = {"q": q, "limit": limit + 1}
+    if cursor:
+        page["rank"], page["after"] = cursor
+    if current_user.is_superuser:
+        statement = (
+            crud.items_search_after_statement if cursor else crud.items_search_statement
+        )
+    else:
+        statement = (
+            crud.owner_items_search_after_statement
+            if cursor
+            else crud.owner_items_search_statement
+        )
+        page["owner_id"] = current_user.id
+    results = (await session.exec(statement, params=page)).all()
+
+    has_more = len(results) > limit
+    results = results[:limit]
+    next_cursor = None
+    if has_more and results:
+        last_item, last_rank = results[-1]
+        next_cursor = encode_search_cursor(last_rank, last_item.id)
+    return ItemsPublic(
+        data=[ItemPublic.model_validate(item) for item, _ in results],
+        count=None,
+        has_more=has_more,
+        next_cursor=next_cursor,
+    )
+
+
+@router.post("/bulk", response_model=ItemsBulkResult)
+async def create_items(
+    *,
+    session: AsyncSessionDep,
+    current_user: CurrentPrincipal,
+    items_in: BulkItemsCreate,
+) -> Any:
+    """
+    Create many items.
+    """
+    results = await async_crud.create_items(
+        session=session, items_in=items_in, owner_id=current_user.id
+    )
+    return ItemsBulkResult(data=results)
+
+
+@router.put("/bulk", response_model=ItemsBulkResult)
+async def update_items(
+    *,
+    session: AsyncSessionDep,
+    current_user: CurrentPrincipal,
+    items_in: BulkItemsUpdate,
+) -> Any:
+    """
+    Update many items, each result tells if its item was updated.
+    """
+    results = await async_crud.update_items(
+        session=session, items_in=items_in, principal=current_user
+    )
+    return ItemsBulkResult(data=results)
+
+
+@router.delete("/bulk", response_model=ItemsBulkResult)
+async def delete_items(
+    *, session: AsyncSessionDep, current_user: CurrentPrincipal, ids: BulkItemIds
+) -> Any:
+    """
+    Delete many items, each result tells if its item was deleted.
+    """
+    results = await async_crud.delete_items(
+        session=session, ids=ids, principal=current_user
+    )
+    return ItemsBulkResult(data=results)
+
+
+async def item_error(session: AsyncSession, id: uuid.UUID) -> HTTPException:
+    """
+    Error for an item the ownership-checked statement didn't return.
+    """
+    if await async_crud.item_exists(session=session, id=id):
+        return HTTPException(status_code=400, detail="Not enough permissions")
+    return HTTPException(status_code=404, detail="Item not found")
+
+
+@router.get("/{id}", response_model=ItemPublic)
+async def read_item(
+    session: AsyncSessionDep,
+    current_user: CurrentPrincipal,
+    response: Response,
+    id: uuid.UUID,
+    if_none_match: IfNoneMatchHeader = None,
+) -> Any:
+    """
+    Get item by ID.
+    """
+    item = await async_crud.get_item(session=session, id=id, principal=current_user)
+    if not item:
+        raise await item_error(session, id)
+    etag = make_etag(item.id, item.version)
+    if not_modified_response := not_modified(response, if_none_match, etag):
+        return not_modified_response
+    return item
+
+
+@router.post("/", response_model=ItemPublic)
+async def create_item(
+    *, session: AsyncSessionDep, current_user: CurrentPrincipal, item_in: ItemCreate
+) -> Any:
+    """
+    Create new item.
+    """
+    return await async_crud.create_item(
+        session=session, item_in=item_in, owner_id=current_user.id
+    )
+
+
+@router.put("/{id}", response_model=ItemPublic)
+async def update_item(
+    *,
+    session: AsyncSessionDep,
+    current_user: CurrentPrincipal,
+    response: Response,
+    id: uuid.UUID,
+    item_in: ItemUpdate,
+    if_match: IfMatchHeader = None,
+) -> Any:
+    """
+    Update an item.
+
+    With an `If-Match` header, the item is only updated if its `ETag` still
+    matches, otherwise the response is a 412.
+    """
+    version = None
+    if if_match:
+        item = await async_crud.get_item(session=session, id=id, principal=current_user)
+        if not item:
+            raise await item_error(session, id)
+        if not etag_matches(if_match, make_etag(item.id, item.version), weak=False):
+            raise HTTPException(status_code=412, detail="Item was modified")
+        version = item.version
+    item = await async_crud.update_item(
+        session=session,
+        id=id,
+        item_in=item_in,
+        principal=current_user,
+        version=version,
+    )
+    if not item and version is not None:
+        # Updated or deleted since it was read
+        raise HTTPException(status_code=412, detail="Item was modified")
+    if not item:
+        raise await item_error(session, id)
+    response.headers["ETag"] = make_etag(item.id, item.version)
+    return item
+
+
+@router.delete("/{id}")
+async def delete_item(
+    session: AsyncSessionDep, current_user: CurrentPrincipal, id: uuid.UUID
+) -> Message:
+    """
+    Delete an item.
+    """
+    if not await async_crud.delete_item(session=session, id=id, principal=current_user):
+        raise await item_error(session, id)
+    return Message(message="Item deleted successfully")
@@ -1,17 +1,29 @@
-from datetime import timedelta
+import math
+import uuid
 from typing import Annotated, Any
 
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request
 from fastapi.responses import HTMLResponse
 from fastapi.security import OAuth2PasswordRequestForm
+from jwt.exceptions import InvalidTokenError
+from pydantic import ValidationError
 
 from app import crud
-from app.api.deps import CurrentUser, SessionDep, get_current_active_superuser
+from app.api.deps import (
+    CurrentPrincipal,
+    CurrentUser,
+    SessionDep,
+    TokenDep,
+    get_current_active_superuser,
+)
 from app.core import security
-from app.core.config import settings
+from app.core.cache import principal_cache
+from app.core.revocation import revocation_filter
 from app.core.security import get_password_hash
-from app.models import Message, NewPassword, Token, UserPublic
+from app.core.throttle import login_throttle
+from app.models import Message, NewPassword, RefreshToken, Token, User, UserPublic
 from app.utils import (
+    generate_login_token,
     generate_password_reset_token,
     generate_reset_password_email,
     send_email,
@@ -21,26 +33,89 @@ from app.utils import (
 router = APIRouter(tags=["login"])
 
 
+def check_login_throttle(request: Request, *, account: str) -> None:
+    # Behind a proxy this is the client IP from X-Forwarded-For, resolved by
+    # the server for the proxies trusted with FORWARDED_ALLOW_IPS
+    ip = request.client.host if request.client else None
+    retry_after = login_throttle.attempt(account=account, ip=ip)
+    if retry_after:
+        raise HTTPException(
+            status_code=429,
+            detail="Too many attempts, try again later",
+            headers={"Retry-After": str(math.ceil(retry_after))},
+        )
+
+
 @router.post("/login/access-token")
 def login_access_token(
-    session: SessionDep, form_data: Annotated[OAuth2PasswordRequestForm, Depends()]
+    request: Request,
+    session: SessionDep,
+    form_data: Annotated[OAuth2PasswordRequestForm, Depends()],
 ) -> Token:
     """
     OAuth2 compatible token login, get an access token for future requests
     """
+    check_login_throttle(request, account=form_data.username)
     user = crud.authenticate(
         session=session, email=form_data.username, password=form_data.password
     )
     if not user:
         raise HTTPException(status_code=400, detail="Incorrect email or password")
+    login_throttle.succeeded(account=form_data.username)
+    if not user.is_active:
+        raise HTTPException(status_code=400, detail="Inactive user")
+    return generate_login_token(user)
+
+
+@router.post("/login/refresh-token")
+def refresh_access_token(session: SessionDep, body: RefreshToken) -> Token:
+    """
+    Get a new access token and refresh token, using a refresh token
+    """
+    try:
+        token_data = security.decode_token(body.refresh_token)
+        if token_data.type != "refresh":
+            raise InvalidTokenError("Not a refresh token")
+        user = session.get(User, uuid.UUID(token_data.sub))
+    except (InvalidTokenError, ValidationError, TypeError, ValueError):
+        raise HTTPException(status_code=403, detail="Could not validate credentials")
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found")
     elif not user.is_active:
         raise HTTPException(status_code=400, detail="Inactive user")
-    access_token_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
-    return Token(
-        access_token=security.create_access_token(
-            user.id, expires_delta=access_token_expires
-        )
-    )
+    # Rotate, each refresh token can only be used once. Revoking it on the
+    # primary is the check, of concurrent uses of a token only one revokes it
+    if not revocation_filter.revoke(session, token_data):
+        raise HTTPException(status_code=403, detail="Could not validate credentials")
+    session.commit()
+    return generate_login_token(user)
+
+
+@router.post("/logout")
+def logout(
+    session: SessionDep,
+    token: TokenDep,
+    current_user: CurrentPrincipal,
+    body: RefreshToken | None = None,
+) -> Message:
+    """
+    Revoke the access token used, and the refresh token if one is given
+    """
+    refresh_token_data = None
+    if body:
+        try:
+            refresh_token_data = security.decode_token(body.refresh_token)
+        except (InvalidTokenError, ValidationError):
+            raise HTTPException(status_code=400, detail="Invalid token")
+        if refresh_token_data.type != "refresh" or refresh_token_data.sub != str(
+            current_user.id
+        ):
+            raise HTTPException(status_code=400, detail="Invalid token")
+    revocation_filter.revoke(session, security.decode_token(token))
+    if refresh_token_data:
+        revocation_filter.revoke(session, refresh_token_data)
+    session.commit()
+    return Message(message="Logged out successfully")
 
 
 @router.post("/login/test-token", response_model=UserPublic)
@@ -52,10 +127,11 @@ def test_token(current_user: CurrentUser) -> Any:
 
 
 @router.post("/password-recovery/{email}")
-def recover_password(email: str, session: SessionDep) -> Message:
+def recover_password(request: Request, email: str, session: SessionDep) -> Message:
     """
     Password Recovery
     """
+    check_login_throttle(request, account=email)
     user = crud.get_user_by_email(session=session, email=email)
 
     if not user:
@@ -95,6 +171,7 @@ def reset_password(session: SessionDep, body: NewPassword) -> Message:
     user.hashed_password = hashed_password
     session.add(user)
     session.commit()
+    principal_cache.invalidate(user.id)
     return Message(message="Password updated successfully")
 
 
@@ -0,0 +1,39 @@
+from typing import Annotated
+
+from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.security import OAuth2PasswordRequestForm
+
+from app import async_crud
+from app.api.deps import AsyncSessionDep
+from app.api.routes.login import check_login_throttle
+from app.core.throttle import login_throttle
+from app.models import Token
+from app.utils import generate_login_token
+
+# Async version of the login route of app.api.routes.login, matched before it
+# when settings.ASYNC_ROUTES is enabled
+router = APIRouter(tags=["login"], include_in_schema=False)
+
+
+@router.post("/login/access-token")
+async def login_access_token(
+    request: Request,
+    session: AsyncSessionDep,
+    form_data: Annotated[OAuth2PasswordRequestForm, Depends()],
+) -> Token:
+    """
+    OAuth2 compatible token login, get an access token for future requests
+    """
+    # The password is verified in the hashing pool without holding a thread,
+    # the throttle backend may still block on the database
+    await run_in_threadpool(check_login_throttle, request, account=form_data.username)
+    user = await async_crud.authenticate(
+        session=session, email=form_data.username, password=form_data.password
+    )
+    if not user:
+        raise HTTPException(status_code=400, detail="Incorrect email or password")
+    await run_in_threadpool(login_throttle.succeeded, account=form_data.username)
+    if not user.is_active:
+        raise HTTPException(status_code=400, detail="Inactive user")
+    return generate_login_token(user)
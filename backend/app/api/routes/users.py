@@ -1,19 +1,37 @@
+import shutil
+import tempfile
 import uuid
-from typing import Any
+from pathlib import Path
+from typing import Annotated, Any
 
-from fastapi import APIRouter, Depends, HTTPException
-from sqlmodel import col, delete, func, select
+from fastapi import (
+    APIRouter,
+    BackgroundTasks,
+    Depends,
+    HTTPException,
+    Query,
+    Response,
+    UploadFile,
+)
+from fastapi.responses import StreamingResponse
 
-from app import crud
+from app import crud, provisioning
 from app.api.deps import (
+    CurrentPrincipal,
     CurrentUser,
+    CursorDep,
+    IfNoneMatchHeader,
+    ReadSessionDep,
     SessionDep,
     get_current_active_superuser,
+    not_modified,
 )
+from app.core.cache import principal_cache
 from app.core.config import settings
-from app.core.security import get_password_hash, verify_password
+from app.core.db import replica_router
+from app.core.security import verify_password
+from app.export import ExportFormat, export_rows, media_types
 from app.models import (
-    Item,
     Message,
     UpdatePassword,
     User,
@@ -24,7 +42,13 @@ from app.models import (
     UserUpdate,
     UserUpdateMe,
 )
-from app.utils import generate_new_account_email, send_email
+from app.provisioning import FileFormat
+from app.utils import (
+    encode_cursor,
+    generate_new_account_email,
+    make_etag,
+    send_email,
+)
 
 router = APIRouter(prefix="/users", tags=["users"])
 
@@ -34,18 +58,87 @@ router = APIRouter(prefix="/users", tags=["users"])
     dependencies=[Depends(get_current_active_superuser)],
     response_model=UsersPublic,
 )
-def read_users(session: SessionDep, skip: int = 0, limit: int = 100) -> Any:
+def read_users(
+    session: ReadSessionDep,
+    skip: int = 0,
+    limit: int = 100,
+    cursor: CursorDep = None,
+) -> Any:
     """
     Retrieve users.
+
+    Pass the `next_cursor` of a page as `cursor` to get the page after it,
+    `skip` is ignored then.
     """
 
-    count_statement = select(func.count()).select_from(User)
-    count = session.exec(count_statement).one()
+    count = crud.count_users(session=session)
 
-    statement = select(User).offset(skip).limit(limit)
-    users = session.exec(statement).all()
+    # One more row than asked for tells if there is a next page
+    if cursor:
+        statement = crud.users_after_statement
+        page: dict[str, Any] = {"after": cursor, "limit": limit + 1}
+    else:
+        statement = crud.users_statement
+        page = {"skip": skip, "limit": limit + 1}
+    users = session.exec(statement, params=page).all()
 
-    return UsersPublic(data=users, count=count)
+    has_more = len(users) > limit
+    users = users[:limit]
+    next_cursor = encode_cursor(users[-1].id) if has_more and users else None
+    return UsersPublic(
+        data=users, count=count, has_more=has_more, next_cursor=next_cursor
+    )
+
+
+@router.get(
+    "/export",
+    dependencies=[Depends(get_current_active_superuser)],
+    response_class=StreamingResponse,
+)
+def export_users(file_format: ExportFormat = "ndjson") -> Any:
+    """
+    Export all the users as NDJSON or CSV, streamed as they are read.
+    """
+    return StreamingResponse(
+        export_rows(
+            replica_router.get_engine(),
+            crud.users_export_statement,
+            {},
+            file_format,
+        ),
+        media_type=media_types[file_format],
+        headers={"Content-Disposition": f"attachment; filename=users.{file_format}"},
+    )
+
+
+@router.get(
+    "/search",
+    dependencies=[Depends(get_current_active_superuser)],
+    response_model=UsersPublic,
+)
+def search_users(
+    session: ReadSessionDep,
+    q: Annotated[str, Query(min_length=3)],
+    is_active: bool | None = None,
+    is_superuser: bool | None = None,
+    limit: Annotated[int, Query(ge=1, le=settings.USERS_SEARCH_MAX_LIMIT)] = 20,
+) -> Any:
+    """
+    Search users by email or name.
+
+    Returns the users whose email or full name contains `q`, ignoring case,
+    ordered by email. `q` needs at least 3 characters to use the trigram
+    indexes.
+    """
+    # One more row than asked for tells if there are more results
+    users = crud.search_users(
+        session=session,
+        q=q,
+        is_active=is_active,
+        is_superuser=is_superuser,
+        limit=limit + 1,
+    )
+    return UsersPublic(data=users[:limit], count=None, has_more=len(users) > limit)
 
 
 @router.post(
@@ -55,14 +148,12 @@ def create_user(*, session: SessionDep, user_in: UserCreate) -> Any:
     """
     Create new user.
     """
-    user = crud.get_user_by_email(session=session, email=user_in.email)
-    if user:
+    user = crud.create_user(session=session, user_create=user_in)
+    if not user:
         raise HTTPException(
             status_code=400,
             detail="The user with this email already exists in the system.",
         )
-
-    user = crud.create_user(session=session, user_create=user_in)
     if settings.emails_enabled and user_in.email:
         email_data = generate_new_account_email(
             email_to=user_in.email, username=user_in.email, password=user_in.password
@@ -75,6 +166,55 @@ def create_user(*, session: SessionDep, user_in: UserCreate) -> Any:
     return user
 
 
+@router.post(
+    "/bulk",
+    dependencies=[Depends(get_current_active_superuser)],
+    response_model=Message,
+    status_code=202,
+)
+def provision_users(
+    *,
+    background_tasks: BackgroundTasks,
+    file: UploadFile,
+    file_format: FileFormat = "csv",
+    send_emails: bool = False,
+) -> Any:
+    """
+    Create users from a CSV or JSON Lines file of user records.
+
+    The file is processed in the background once it is uploaded. Users with
+    an existing email are skipped, and invalid records logged with their line
+    number. A server worker processes one upload at a time. For large files
+    use app/provision_users.py.
+    """
+    if not provisioning.upload_lock.acquire(blocking=False):
+        raise HTTPException(
+            status_code=409, detail="Another upload is being provisioned"
+        )
+    try:
+        # The upload is closed with the request, the background task reads a
+        # copy of it
+        with tempfile.NamedTemporaryFile(
+            suffix=f".{file_format}", delete=False
+        ) as upload:
+            path = Path(upload.name)
+            try:
+                shutil.copyfileobj(file.file, upload)
+            except BaseException:
+                path.unlink()
+                raise
+    except BaseException:
+        provisioning.upload_lock.release()
+        raise
+    background_tasks.add_task(
+        provisioning.provision_uploaded_users,
+        path,
+        file_format,
+        send_emails=send_emails and settings.emails_enabled,
+    )
+    return Message(message="Users are being provisioned")
+
+
 @router.patch("/me", response_model=UserPublic)
 def update_user_me(
     *, session: SessionDep, user_in: UserUpdateMe, current_user: CurrentUser
@@ -90,11 +230,11 @@ def update_user_me(
                 status_code=409, detail="User with this email already exists"
             )
     user_data = user_in.model_dump(exclude_unset=True)
-    current_user.sqlmodel_update(user_data)
-    session.add(current_user)
-    session.commit()
-    session.refresh(current_user)
-    return current_user
+    return crud.update_user(
+        session=session,
+        db_user=current_user,
+        user_in=UserUpdate.model_validate(user_data),
+    )
 
 
 @router.patch("/me/password", response_model=Message)
@@ -110,19 +250,36 @@ def update_password_me(
         raise HTTPException(
             status_code=400, detail="New password cannot be the same as the current one"
         )
-    hashed_password = get_password_hash(body.new_password)
-    current_user.hashed_password = hashed_password
-    session.add(current_user)
-    session.commit()
+    crud.update_user(
+        session=session,
+        db_user=current_user,
+        user_in=UserUpdate(password=body.new_password),
+    )
     return Message(message="Password updated successfully")
 
 
 @router.get("/me", response_model=UserPublic)
-def read_user_me(current_user: CurrentUser) -> Any:
+def read_user_me(
+    session: ReadSessionDep,
+    primary_session: SessionDep,
+    current_user: CurrentPrincipal,
+    response: Response,
+    if_none_match: IfNoneMatchHeader = None,
+) -> Any:
     """
     Get current user.
     """
-    return current_user
+    # Fall back to the primary for a user not replicated yet
+    user = session.get(User, current_user.id) or primary_session.get(
+        User, current_user.id
+    )
+    if not user:
+        principal_cache.invalidate(current_user.id)
+        raise HTTPException(status_code=404, detail="User not found")
+    etag = make_etag(user.id, user.version)
+    if not_modified_response := not_modified(response, if_none_match, etag):
+        return not_modified_response
+    return user
 
 
 @router.delete("/me", response_model=Message)
@@ -134,8 +291,7 @@ def delete_user_me(session: SessionDep, current_user: CurrentUser) -> Any:
         raise HTTPException(
             status_code=403, detail="Super users are not allowed to delete themselves"
         )
-    session.delete(current_user)
-    session.commit()
+    crud.delete_user(session=session, user_id=current_user.id)
     return Message(message="User deleted successfully")
 
 
@@ -144,26 +300,28 @@ def register_user(session: SessionDep, user_in: UserRegister) -> Any:
     """
     Create new user without the need to be logged in.
     """
-    user = crud.get_user_by_email(session=session, email=user_in.email)
-    if user:
+    user_create = UserCreate.model_validate(user_in)
+    user = crud.create_user(session=session, user_create=user_create)
+    if not user:
         raise HTTPException(
             status_code=400,
             detail="The user with this email already exists in the system",
         )
-    user_create = UserCreate.model_validate(user_in)
-    user = crud.create_user(session=session, user_create=user_create)
     return user
 
 
 @router.get("/{user_id}", response_model=UserPublic)
 def read_user_by_id(
-    user_id: uuid.UUID, session: SessionDep, current_user: CurrentUser
+    user_id: uuid.UUID,
+    session: ReadSessionDep,
+    primary_session: SessionDep,
+    current_user: CurrentPrincipal,
 ) -> Any:
     """
     Get a specific user by id.
     """
-    user = session.get(User, user_id)
-    if user == current_user:
+    user = session.get(User, user_id) or primary_session.get(User, user_id)
+    if user and user.id == current_user.id:
         return user
     if not current_user.is_superuser:
         raise HTTPException(
@@ -207,20 +365,15 @@ def update_user(
 
 @router.delete("/{user_id}", dependencies=[Depends(get_current_active_superuser)])
 def delete_user(
-    session: SessionDep, current_user: CurrentUser, user_id: uuid.UUID
+    session: SessionDep, current_user: CurrentPrincipal, user_id: uuid.UUID
 ) -> Message:
     """
     Delete a user.
     """
-    user = session.get(User, user_id)
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
-    if user == current_user:
+    if user_id == current_user.id:
         raise HTTPException(
             status_code=403, detail="Super users are not allowed to delete themselves"
         )
-    statement = delete(Item).where(col(Item.owner_id) == user_id)
-    session.exec(statement)  # type: ignore
-    session.delete(user)
-    session.commit()
+    if not crud.delete_user(session=session, user_id=user_id):
+        raise HTTPException(status_code=404, detail="User not found")
     return Message(message="User deleted successfully")
@@ -0,0 +1,86 @@
+from typing import Any
+
+from fastapi import APIRouter, HTTPException
+
+from app import async_crud
+from app.api.deps import AsyncSessionDep, CurrentPrincipal
+from app.core.cache import principal_cache
+from app.core.hashing import hasher
+from app.models import (
+    Message,
+    UpdatePassword,
+    User,
+    UserCreate,
+    UserPublic,
+    UserRegister,
+    UserUpdate,
+    UserUpdateMe,
+)
+
+# Async versions of the routes of app.api.routes.users that hash passwords,
+# matched before them when settings.ASYNC_ROUTES is enabled
+router = APIRouter(prefix="/users", tags=["users"], include_in_schema=False)
+
+
+@router.patch("/me", response_model=UserPublic)
+async def update_user_me(
+    *, session: AsyncSessionDep, user_in: UserUpdateMe, current_user: CurrentPrincipal
+) -> Any:
+    """
+    Update own user.
+    """
+
+    if user_in.email:
+        existing_user = await async_crud.get_user_by_email(
+            session=session, email=user_in.email
+        )
+        if existing_user and existing_user.id != current_user.id:
+            raise HTTPException(
+                status_code=409, detail="User with this email already exists"
+            )
+    user = await session.get(User, current_user.id)
+    if not user:
+        principal_cache.invalidate(current_user.id)
+        raise HTTPException(status_code=404, detail="User not found")
+    user_data = user_in.model_dump(exclude_unset=True)
+    return await async_crud.update_user(
+        session=session, db_user=user, user_in=UserUpdate.model_validate(user_data)
+    )
+
+
+@router.patch("/me/password", response_model=Message)
+async def update_password_me(
+    *, session: AsyncSessionDep, body: UpdatePassword, current_user: CurrentPrincipal
+) -> Any:
+    """
+    Update own password.
+    """
+    user = await session.get(User, current_user.id)
+    if not user:
+        principal_cache.invalidate(current_user.id)
+        raise HTTPException(status_code=404, detail="User not found")
+    if not await hasher.verify_password(body.current_password, user.hashed_password):
+        raise HTTPException(status_code=400, detail="Incorrect password")
+    if body.current_password == body.new_password:
+        raise HTTPException(
+            status_code=400, detail="New password cannot be the same as the current one"
+        )
+    await async_crud.update_user(
+        session=session, db_user=user, user_in=UserUpdate(password=body.new_password)
+    )
+    return Message(message="Password updated successfully")
+
+
+@router.post("/signup", response_model=UserPublic)
+async def register_user(session: AsyncSessionDep, user_in: UserRegister) -> Any:
+    """
+    Create new user without the need to be logged in.
+    """
+    user_create = UserCreate.model_validate(user_in)
+    user = await async_crud.create_user(session=session, user_create=user_create)
+    if not user:
+        raise HTTPException(
+            status_code=400,
+            detail="The user with this email already exists in the system",
+        )
+    return user
@@ -1,7 +1,13 @@
+from dataclasses import asdict
+from typing import Any
+
 from fastapi import APIRouter, Depends
 from pydantic.networks import EmailStr
 
 from app.api.deps import get_current_active_superuser
+from app.core.cache import principal_cache, token_cache
+from app.core.db import async_pool_metrics, pool_metrics
+from app.core.hashing import hasher
 from app.models import Message
 from app.utils import generate_test_email, send_email
 
@@ -29,3 +35,24 @@ def test_email(email_to: EmailStr) -> Message:
 @router.get("/health-check/")
 async def health_check() -> bool:
     return True
+
+
+@router.get(
+    "/diagnostics/",
+    dependencies=[Depends(get_current_active_superuser)],
+)
+def diagnostics() -> dict[str, Any]:
+    """
+    Connection pool, password hashing and cache metrics of this worker.
+    """
+    return {
+        "database_pools": {
+            "sync": asdict(pool_metrics.stats()),
+            "async": asdict(async_pool_metrics.stats()),
+        },
+        "password_hashing": asdict(hasher.stats()),
+        "caches": {
+            "principal": asdict(principal_cache.stats()),
+            "token": asdict(token_cache.stats()),
+        },
+    }
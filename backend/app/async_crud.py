@@ -0,0 +1,220 @@
+import uuid
+from collections.abc import Sequence
+from typing import Any
+
+from sqlmodel import insert
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.core.cache import principal_cache
+from app.core.config import settings
+from app.core.hashing import hasher
+from app.crud import (
+    check_items_access,
+    counted_items_statement,
+    create_item_statement,
+    create_user_statement,
+    delete_item_statement,
+    delete_items_statement,
+    estimated_items_count_statement,
+    item_access_params,
+    item_exists_statement,
+    item_owners_statement,
+    item_statement,
+    item_update_batches,
+    items_count_statement,
+    owner_counted_items_statement,
+    owner_items_count_statement,
+    soft_delete_item_statement,
+    soft_delete_items_statement,
+    update_item_statement,
+    update_item_version_statement,
+    update_items_statement,
+    user_by_email_statement,
+)
+from app.models import (
+    Item,
+    ItemBulkResult,
+    ItemBulkUpdate,
+    ItemCreate,
+    ItemUpdate,
+    Principal,
+    User,
+    UserCreate,
+    UserUpdate,
+)
+
+
+async def create_user(*, session: AsyncSession, user_create: UserCreate) -> User | None:
+    hashed_password = await hasher.hash_password(user_create.password)
+    db_obj = User.model_validate(
+        user_create, update={"hashed_password": hashed_password}
+    )
+    result = await session.exec(create_user_statement, params=db_obj.model_dump())
+    user: User | None = result.scalar_one_or_none()
+    await session.commit()
+    return user
+
+
+async def update_user(
+    *, session: AsyncSession, db_user: User, user_in: UserUpdate
+) -> Any:
+    user_data = user_in.model_dump(exclude_unset=True)
+    extra_data = {}
+    if "password" in user_data:
+        password = user_data["password"]
+        hashed_password = await hasher.hash_password(password)
+        extra_data["hashed_password"] = hashed_password
+    db_user.sqlmodel_update(user_data, update=extra_data)
+    session.add(db_user)
+    await session.commit()
+    await session.refresh(db_user)
+    principal_cache.invalidate(db_user.id)
+    return db_user
+
+
+async def get_user_by_email(*, session: AsyncSession, email: str) -> User | None:
+    result = await session.exec(user_by_email_statement, params={"email": email})
+    session_user = result.first()
+    return session_user
+
+
+async def authenticate(
+    *, session: AsyncSession, email: str, password: str
+) -> User | None:
+    db_user = await get_user_by_email(session=session, email=email)
+    if not db_user:
+        return None
+    verified, updated_hash = await hasher.verify_and_update_password(
+        password, db_user.hashed_password
+    )
+    if not verified:
+        return None
+    if updated_hash:
+        db_user.hashed_password = updated_hash
+        session.add(db_user)
+        await session.commit()
+        await session.refresh(db_user)
+    return db_user
+
+
+async def create_item(
+    *, session: AsyncSession, item_in: ItemCreate, owner_id: uuid.UUID
+) -> Item:
+    db_item = Item.model_validate(item_in, update={"owner_id": owner_id})
+    result = await session.exec(create_item_statement, params=db_item.model_dump())
+    item: Item = result.scalar_one()
+    await session.commit()
+    return item
+
+
+async def get_item(
+    *, session: AsyncSession, id: uuid.UUID, principal: Principal
+) -> Item | None:
+    params = item_access_params(id=id, principal=principal)
+    return (await session.exec(item_statement, params=params)).first()
+
+
+async def update_item(
+    *,
+    session: AsyncSession,
+    id: uuid.UUID,
+    item_in: ItemUpdate,
+    principal: Principal,
+    version: int | None = None,
+) -> Item | None:
+    update_dict = item_in.model_dump(exclude_unset=True)
+    if not update_dict:
+        return await get_item(session=session, id=id, principal=principal)
+    params = item_access_params(id=id, principal=principal)
+    statement = update_item_statement
+    if version is not None:
+        statement = update_item_version_statement
+        params["item_version"] = version
+    result = await session.exec(statement.values(update_dict), params=params)
+    item: Item | None = result.scalar_one_or_none()
+    await session.commit()
+    return item
+
+
+async def delete_item(
+    *, session: AsyncSession, id: uuid.UUID, principal: Principal
+) -> bool:
+    params = item_access_params(id=id, principal=principal)
+    statement = (
+        soft_delete_item_statement if settings.SOFT_DELETE else delete_item_statement
+    )
+    result = await session.exec(statement, params=params)
+    deleted = result.first() is not None
+    await session.commit()
+    return deleted
+
+
+async def item_exists(*, session: AsyncSession, id: uuid.UUID) -> bool:
+    result = await session.exec(item_exists_statement, params={"item_id": id})
+    return result.first() is not None
+
+
+async def count_items(
+    *, session: AsyncSession, owner_id: uuid.UUID | None = None
+) -> int | None:
+    strategy = settings.LIST_COUNT_STRATEGY
+    if strategy == "none":
+        return None
+    if owner_id is None:
+        if strategy == "estimated":
+            estimate = (await session.exec(estimated_items_count_statement)).one()
+            if estimate >= 0:
+                return estimate
+        if strategy == "counter":
+            return (await session.exec(counted_items_statement)).one()
+        return (await session.exec(items_count_statement)).one()
+    params = {"owner_id": owner_id}
+    if strategy == "exact":
+        return (await session.exec(owner_items_count_statement, params=params)).one()
+    # There is no planner estimate for a single owner, the counter is as cheap
+    result = await session.exec(owner_counted_items_statement, params=params)
+    return result.first() or 0
+
+
+async def create_items(
+    *, session: AsyncSession, items_in: Sequence[ItemCreate], owner_id: uuid.UUID
+) -> list[ItemBulkResult]:
+    rows = [
+        Item.model_validate(item_in, update={"owner_id": owner_id}).model_dump()
+        for item_in in items_in
+    ]
+    if rows:
+        await session.exec(insert(Item), params=rows)
+        await session.commit()
+    return [ItemBulkResult(id=row["id"]) for row in rows]
+
+
+async def update_items(
+    *, session: AsyncSession, items_in: Sequence[ItemBulkUpdate], principal: Principal
+) -> list[ItemBulkResult]:
+    ids = [item_in.id for item_in in items_in]
+    owners = dict(
+        (await session.exec(item_owners_statement, params={"ids": ids})).all()
+    )
+    results = check_items_access(ids=ids, owners=owners, principal=principal)
+    for batch in item_update_batches(items_in, results=results, owners=owners):
+        await session.exec(update_items_statement, params=batch)
+    await session.commit()
+    return results
+
+
+async def delete_items(
+    *, session: AsyncSession, ids: Sequence[uuid.UUID], principal: Principal
+) -> list[ItemBulkResult]:
+    owners = dict(
+        (await session.exec(item_owners_statement, params={"ids": ids})).all()
+    )
+    results = check_items_access(ids=ids, owners=owners, principal=principal)
+    allowed = [result.id for result in results if result.status_code == 200]
+    statement = (
+        soft_delete_items_statement if settings.SOFT_DELETE else delete_items_statement
+    )
+    if allowed:
+        await session.exec(statement, params={"ids": allowed})
+    await session.commit()
+    return results
@@ -0,0 +1,81 @@
+import argparse
+import logging
+import statistics
+import time
+
+from passlib.context import CryptContext
+
+from app.core.config import settings
+from app.core.hashing import build_pwd_context
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+samples = 5
+password = "calibration-password"
+
+
+def measure(context: CryptContext) -> float:
+    """
+    Median time in milliseconds to hash a password with the given context.
+    """
+    timings = []
+    for _ in range(samples):
+        start = time.perf_counter()
+        context.hash(password)
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings)
+
+
+def calibrate_bcrypt(target_ms: float) -> dict[str, int]:
+    rounds = 4
+    while rounds < 31:
+        elapsed = measure(build_pwd_context(scheme="bcrypt", bcrypt_rounds=rounds + 1))
+        logger.info(f"bcrypt rounds={rounds + 1}: {elapsed:.1f}ms")
+        if elapsed > target_ms:
+            break
+        rounds += 1
+    return {"BCRYPT_ROUNDS": rounds}
+
+
+def calibrate_argon2(target_ms: float) -> dict[str, int]:
+    time_cost = 1
+    while True:
+        elapsed = measure(
+            build_pwd_context(scheme="argon2", argon2_time_cost=time_cost + 1)
+        )
+        logger.info(f"argon2 time_cost={time_cost + 1}: {elapsed:.1f}ms")
+        if elapsed > target_ms:
+            break
+        time_cost += 1
+    return {
+        "ARGON2_TIME_COST": time_cost,
+        "ARGON2_MEMORY_COST": settings.ARGON2_MEMORY_COST,
+        "ARGON2_PARALLELISM": settings.ARGON2_PARALLELISM,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Suggest password hashing parameters for a target latency"
+    )
+    parser.add_argument(
+        "--scheme", choices=["bcrypt", "argon2"], default=settings.PASSWORD_HASH_SCHEME
+    )
+    parser.add_argument(
+        "--target-ms", type=float, default=250, help="Target time for a single hash"
+    )
+    args = parser.parse_args()
+
+    logger.info(f"Calibrating {args.scheme} for {args.target_ms:.0f}ms per hash")
+    if args.scheme == "bcrypt":
+        suggested = calibrate_bcrypt(args.target_ms)
+    else:
+        suggested = calibrate_argon2(args.target_ms)
+    logger.info("Suggested settings:")
+    for name, value in {"PASSWORD_HASH_SCHEME": args.scheme, **suggested}.items():
+        logger.info(f"{name}={value}")
+
+
+if __name__ == "__main__":
+    main()
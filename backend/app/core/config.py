@@ -35,6 +35,50 @@ class Settings(BaseSettings):
     SECRET_KEY: str = secrets.token_urlsafe(32)
     # 60 minutes * 24 hours * 8 days = 8 days
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 60 * 24 * 8
+    # Issue short-lived access tokens carrying the user's authorization claims,
+    # and refresh tokens to renew them, instead of long-lived subject-only
+    # tokens. Claims changes are seen once the current access token expires
+    ACCESS_TOKEN_CLAIMS: bool = False
+    CLAIMS_ACCESS_TOKEN_EXPIRE_MINUTES: int = 15
+    # 60 minutes * 24 hours * 8 days = 8 days
+    REFRESH_TOKEN_EXPIRE_MINUTES: int = 60 * 24 * 8
+    # Revoked token ids are kept in a per-worker Bloom filter synced from the
+    # database, a revocation is seen by other workers after at most
+    # TOKEN_REVOCATION_SYNC_SECONDS. The filter is rebuilt, and the expired
+    # tokens deleted, every TOKEN_REVOCATION_REBUILD_SECONDS
+    TOKEN_REVOCATION_SYNC_SECONDS: int = 5
+    TOKEN_REVOCATION_REBUILD_SECONDS: int = 60 * 60
+    TOKEN_REVOCATION_FILTER_CAPACITY: int = 1_000_000
+    TOKEN_REVOCATION_FILTER_ERROR_RATE: float = 0.001
+    # Token bucket throttling of login and password recovery attempts, per
+    # account and per client IP. "memory" buckets are per worker, "database"
+    # buckets are shared by all the workers
+    LOGIN_THROTTLE_BACKEND: Literal["memory", "database", "none"] = "memory"
+    LOGIN_THROTTLE_ACCOUNT_BURST: int = 10
+    LOGIN_THROTTLE_ACCOUNT_PER_MINUTE: float = 5
+    LOGIN_THROTTLE_IP_BURST: int = 100
+    LOGIN_THROTTLE_IP_PER_MINUTE: float = 60
+    # Server worker processes on the host, as given to `fastapi run --workers`,
+    # each one has its own password hashing pool
+    WORKERS: int = 1
+    # Processes in the password hashing pool of each server worker, defaults
+    # to the CPUs divided between the WORKERS, 0 hashes inline in the request
+    PASSWORD_HASH_WORKERS: int | None = None
+    # New hashes use this scheme and cost, existing hashes are upgraded on
+    # login, argon2 requires the argon2-cffi package.
+    # Run `python app/calibrate_password_hash.py` to tune them for the host
+    PASSWORD_HASH_SCHEME: Literal["bcrypt", "argon2"] = "bcrypt"
+    BCRYPT_ROUNDS: int = 12
+    ARGON2_TIME_COST: int = 2
+    ARGON2_MEMORY_COST: int = 102400  # KiB
+    ARGON2_PARALLELISM: int = 8
+    # Authenticated users are cached per worker, changes made through another
+    # worker are seen after at most this many seconds, 0 disables the cache
+    PRINCIPAL_CACHE_TTL_SECONDS: int = 60
+    PRINCIPAL_CACHE_MAX_SIZE: int = 10_000
+    # Verified access tokens are cached until they expire, at most this long
+    TOKEN_CACHE_TTL_SECONDS: int = 300
+    TOKEN_CACHE_MAX_SIZE: int = 10_000
     FRONTEND_HOST: str = "http://localhost:5173"
     ENVIRONMENT: Literal["local", "staging", "production"] = "local"
 
@@ -69,6 +113,82 @@ class Settings(BaseSettings):
             path=self.POSTGRES_DB,
         )
 
+    # Connection pool of each worker process, and of each engine
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT: float = 30
+    # Recycle connections older than this many seconds, -1 to keep them
+    DB_POOL_RECYCLE: int = 30 * 60
+    DB_POOL_PRE_PING: bool = True
+    # psycopg prepares a statement on the server once it ran this many times
+    # on a connection, None disables prepared statements, as needed behind
+    # PgBouncer in transaction mode before version 1.21
+    DB_PREPARE_THRESHOLD: int | None = 5
+
+    # Read replicas of the database for the read-only routes, as "host" or
+    # "host:port", with the same user, password and database as the primary.
+    # Replicas that are down or more than REPLICA_MAX_LAG_SECONDS behind are
+    # skipped until the next health check, reads go to the primary if there
+    # is no replica left
+    POSTGRES_REPLICA_SERVERS: Annotated[
+        list[str] | str, BeforeValidator(parse_cors)
+    ] = []
+    REPLICA_MAX_LAG_SECONDS: float = 10
+    REPLICA_HEALTH_CHECK_SECONDS: float = 5
+
+    @computed_field  # type: ignore[prop-decorator]
+    @property
+    def replica_database_uris(self) -> list[MultiHostUrl]:
+        uris = []
+        for server in self.POSTGRES_REPLICA_SERVERS:
+            host, _, port = server.partition(":")
+            uris.append(
+                MultiHostUrl.build(
+                    scheme="postgresql+psycopg",
+                    username=self.POSTGRES_USER,
+                    password=self.POSTGRES_PASSWORD,
+                    host=host,
+                    port=int(port) if port else self.POSTGRES_PORT,
+                    path=self.POSTGRES_DB,
+                )
+            )
+        return uris
+
+    # How the list endpoints count the total rows: "exact" counts them,
+    # "estimated" uses the planner's estimate of the whole table and the item
+    # counters for a single owner, "counter" sums the item counters maintained
+    # by triggers, "none" skips the count, use has_more instead.
+    # Users are always counted exactly, except with "estimated" and "none"
+    LIST_COUNT_STRATEGY: Literal["exact", "estimated", "counter", "none"] = "exact"
+
+    # Most items accepted by a single bulk request
+    ITEMS_BULK_MAX_SIZE: int = 5000
+
+    # Most users returned by a user search, searches are not paginated
+    USERS_SEARCH_MAX_LIMIT: int = 100
+
+    # Number of hash partitions of the item table on owner_id, 0 keeps a single
+    # table. Set it before upgrading past the migration partitioning the
+    # table, which copies the existing items while they are still written
+    ITEM_HASH_PARTITIONS: int = 0
+
+    # Deleting users and items only marks them deleted, which hides them from
+    # the queries, instead of deleting them and all the items of a user in the
+    # request. The purge worker, app/purge_deleted.py, deletes them for good
+    # in batches of PURGE_BATCH_SIZE rows, waits PURGE_BATCH_DELAY_SECONDS
+    # between batches, and checks for deleted rows every PURGE_IDLE_SECONDS
+    SOFT_DELETE: bool = False
+    PURGE_BATCH_SIZE: int = 500
+    PURGE_BATCH_DELAY_SECONDS: float = 0.5
+    PURGE_IDLE_SECONDS: float = 30
+
+    # Serve the item routes, login, signup and the updates of the own user
+    # with async handlers on an AsyncEngine, instead of sync handlers running
+    # in the threadpool. The AsyncEngine has a pool of its own, which doubles
+    # the connections of each worker: keep WORKERS * 2 * (DB_POOL_SIZE +
+    # DB_MAX_OVERFLOW) under the max_connections of the database
+    ASYNC_ROUTES: bool = False
+
     SMTP_TLS: bool = True
     SMTP_SSL: bool = False
     SMTP_PORT: int = 587
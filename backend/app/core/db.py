@@ -1,10 +1,54 @@
+from typing import Any
+
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
 from sqlmodel import Session, create_engine, select
 
 from app import crud
 from app.core.config import settings
+from app.core.pool import PoolMetrics, instrumented_pool_class
+from app.core.replicas import ReplicaRouter
 from app.models import User, UserCreate
 
-engine = create_engine(str(settings.SQLALCHEMY_DATABASE_URI))
+
+def engine_options() -> dict[str, Any]:
+    return {
+        "connect_args": {"prepare_threshold": settings.DB_PREPARE_THRESHOLD},
+        "pool_size": settings.DB_POOL_SIZE,
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "pool_timeout": settings.DB_POOL_TIMEOUT,
+        "pool_recycle": settings.DB_POOL_RECYCLE,
+        "pool_pre_ping": settings.DB_POOL_PRE_PING,
+    }
+
+
+pool_metrics = PoolMetrics()
+engine = create_engine(
+    str(settings.SQLALCHEMY_DATABASE_URI),
+    poolclass=instrumented_pool_class(QueuePool, pool_metrics),
+    **engine_options(),
+)
+pool_metrics.listen(engine)
+
+replica_engines = [
+    create_engine(str(uri), **engine_options())
+    for uri in settings.replica_database_uris
+]
+replica_router = ReplicaRouter(
+    primary=engine,
+    replicas=replica_engines,
+    max_lag=settings.REPLICA_MAX_LAG_SECONDS,
+    check_interval=settings.REPLICA_HEALTH_CHECK_SECONDS,
+)
+
+# psycopg provides both the sync and the async drivers with the same URL
+async_pool_metrics = PoolMetrics()
+async_engine = create_async_engine(
+    str(settings.SQLALCHEMY_DATABASE_URI),
+    poolclass=instrumented_pool_class(AsyncAdaptedQueuePool, async_pool_metrics),
+    **engine_options(),
+)
+async_pool_metrics.listen(async_engine.sync_engine)
 
 
 # make sure all SQLModel models are imported (app.models) before initializing DB
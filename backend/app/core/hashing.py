@@ -0,0 +1,181 @@
+import asyncio
+import multiprocessing
+import os
+import threading
+from collections.abc import Callable, Sequence
+from concurrent.futures import Future, ProcessPoolExecutor
+from dataclasses import dataclass
+from typing import Any, TypeVar
+
+from passlib.context import CryptContext
+
+from app.core.config import settings
+
+
+def build_pwd_context(
+    scheme: str = settings.PASSWORD_HASH_SCHEME,
+    bcrypt_rounds: int = settings.BCRYPT_ROUNDS,
+    argon2_time_cost: int = settings.ARGON2_TIME_COST,
+    argon2_memory_cost: int = settings.ARGON2_MEMORY_COST,
+    argon2_parallelism: int = settings.ARGON2_PARALLELISM,
+) -> CryptContext:
+    # Hashes using the other scheme or different parameters are still
+    # verified, but flagged by needs_update() so they get re-hashed
+    return CryptContext(
+        schemes=["bcrypt", "argon2"],
+        default=scheme,
+        deprecated="auto",
+        bcrypt__rounds=bcrypt_rounds,
+        argon2__time_cost=argon2_time_cost,
+        argon2__memory_cost=argon2_memory_cost,
+        argon2__parallelism=argon2_parallelism,
+    )
+
+
+pwd_context = build_pwd_context()
+
+T = TypeVar("T")
+
+
+# These run inside the pool's worker processes, so they must be module level
+# (picklable) and only depend on state rebuilt when the module is imported.
+def _hash(password: str) -> str:
+    return pwd_context.hash(password)
+
+
+def _hash_many(passwords: Sequence[str]) -> list[str]:
+    return [pwd_context.hash(password) for password in passwords]
+
+
+def _verify(plain_password: str, hashed_password: str) -> bool:
+    return pwd_context.verify(plain_password, hashed_password)
+
+
+def _verify_and_update(
+    plain_password: str, hashed_password: str
+) -> tuple[bool, str | None]:
+    return pwd_context.verify_and_update(plain_password, hashed_password)
+
+
+@dataclass
+class HashingStats:
+    workers: int
+    pending: int
+    peak_pending: int
+    completed: int
+
+
+class PasswordHasher:
+    """
+    Run password hashing in a dedicated, bounded process pool.
+
+    Hashing is CPU bound and deliberately slow, running it in worker processes
+    keeps it from holding the GIL and the request threadpool while it runs.
+    With `max_workers=0` hashing runs inline in the calling thread. The
+    default shares the CPUs between the pools of the server workers.
+    """
+
+    def __init__(self, max_workers: int | None = None) -> None:
+        if max_workers is None:
+            max_workers = max(1, (os.cpu_count() or 1) // settings.WORKERS)
+        self.max_workers = max_workers
+        self._executor: ProcessPoolExecutor | None = None
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._peak_pending = 0
+        self._completed = 0
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.max_workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                )
+            return self._executor
+
+    def _on_done(self, _: Future[Any]) -> None:
+        with self._lock:
+            self._pending -= 1
+            self._completed += 1
+
+    def _submit(self, fn: Callable[..., T], *args: Any) -> Future[T]:
+        executor = self._get_executor()
+        with self._lock:
+            self._pending += 1
+            self._peak_pending = max(self._peak_pending, self._pending)
+        try:
+            future = executor.submit(fn, *args)
+        except Exception:
+            with self._lock:
+                self._pending -= 1
+            raise
+        future.add_done_callback(self._on_done)
+        return future
+
+    def _run(self, fn: Callable[..., T], *args: Any) -> T:
+        if not self.max_workers:
+            return fn(*args)
+        return self._submit(fn, *args).result()
+
+    async def _run_async(self, fn: Callable[..., T], *args: Any) -> T:
+        if not self.max_workers:
+            return await asyncio.to_thread(fn, *args)
+        return await asyncio.wrap_future(self._submit(fn, *args))
+
+    def hash(self, password: str) -> str:
+        return self._run(_hash, password)
+
+    def hash_many(self, passwords: Sequence[str]) -> list[str]:
+        """
+        Hash a batch of passwords in parallel on all the workers.
+        """
+        if not self.max_workers:
+            return _hash_many(passwords)
+        # A few chunks per worker, fewer round trips to the workers while
+        # still evening out the load
+        size = max(1, len(passwords) // (self.max_workers * 4))
+        futures = [
+            self._submit(_hash_many, passwords[i : i + size])
+            for i in range(0, len(passwords), size)
+        ]
+        return [hashed for future in futures for hashed in future.result()]
+
+    def verify(self, plain_password: str, hashed_password: str) -> bool:
+        return self._run(_verify, plain_password, hashed_password)
+
+    def verify_and_update(
+        self, plain_password: str, hashed_password: str
+    ) -> tuple[bool, str | None]:
+        return self._run(_verify_and_update, plain_password, hashed_password)
+
+    async def hash_password(self, password: str) -> str:
+        return await self._run_async(_hash, password)
+
+    async def verify_password(self, plain_password: str, hashed_password: str) -> bool:
+        return await self._run_async(_verify, plain_password, hashed_password)
+
+    async def verify_and_update_password(
+        self, plain_password: str, hashed_password: str
+    ) -> tuple[bool, str | None]:
+        return await self._run_async(
+            _verify_and_update, plain_password, hashed_password
+        )
+
+    def stats(self) -> HashingStats:
+        with self._lock:
+            return HashingStats(
+                workers=self.max_workers,
+                pending=self._pending,
+                peak_pending=self._peak_pending,
+                completed=self._completed,
+            )
+
+    def shutdown(self) -> None:
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown()
+
+
+hasher = PasswordHasher(settings.PASSWORD_HASH_WORKERS)
@@ -0,0 +1,114 @@
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any
+
+from sqlalchemy import Engine, event
+from sqlalchemy import exc as sa_exc
+from sqlalchemy.pool import PoolProxiedConnection, QueuePool
+
+
+@dataclass
+class PoolStats:
+    size: int
+    checked_out: int
+    idle: int
+    overflow: int
+    checkouts: int
+    timeouts: int
+    connects: int
+    invalidations: int
+    wait_seconds_total: float
+    wait_seconds_max: float
+
+
+class PoolMetrics:
+    """
+    Checkout and connection counters of a connection pool.
+    """
+
+    def __init__(self) -> None:
+        self.pool: QueuePool | None = None
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.timeouts = 0
+        self.connects = 0
+        self.invalidations = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+
+    def record_wait(self, seconds: float, timed_out: bool) -> None:
+        with self._lock:
+            self.wait_seconds_total += seconds
+            self.wait_seconds_max = max(self.wait_seconds_max, seconds)
+            if timed_out:
+                self.timeouts += 1
+
+    def listen(self, engine: Engine) -> None:
+        """
+        Count checkouts, new connections and invalidations with the pool
+        events of the engine.
+        """
+
+        def on_checkout(*_: Any) -> None:
+            with self._lock:
+                self.checkouts += 1
+
+        def on_connect(*_: Any) -> None:
+            with self._lock:
+                self.connects += 1
+
+        def on_invalidate(*_: Any) -> None:
+            with self._lock:
+                self.invalidations += 1
+
+        event.listen(engine, "checkout", on_checkout)
+        event.listen(engine, "connect", on_connect)
+        event.listen(engine, "invalidate", on_invalidate)
+
+    def stats(self) -> PoolStats:
+        pool = self.pool
+        with self._lock:
+            return PoolStats(
+                size=pool.size() if pool else 0,
+                checked_out=pool.checkedout() if pool else 0,
+                idle=pool.checkedin() if pool else 0,
+                overflow=max(pool.overflow(), 0) if pool else 0,
+                checkouts=self.checkouts,
+                timeouts=self.timeouts,
+                connects=self.connects,
+                invalidations=self.invalidations,
+                wait_seconds_total=self.wait_seconds_total,
+                wait_seconds_max=self.wait_seconds_max,
+            )
+
+
+def instrumented_pool_class(
+    base: type[QueuePool], metrics: PoolMetrics
+) -> type[QueuePool]:
+    """
+    Subclass of a QueuePool class recording the time spent waiting for a
+    connection, and the checkouts that timed out, in `metrics`.
+
+    There is no pool event fired before a checkout waits, so the wait is
+    timed around the pool's connect().
+    """
+
+    class InstrumentedPool(base):  # type: ignore[valid-type,misc]
+        def __init__(self, *args: Any, **kwargs: Any) -> None:
+            super().__init__(*args, **kwargs)
+            # Pools are recreated when the engine is disposed
+            metrics.pool = self
+
+        def connect(self) -> PoolProxiedConnection:
+            start = time.perf_counter()
+            timed_out = False
+            try:
+                return super().connect()  # type: ignore[no-any-return]
+            except sa_exc.TimeoutError:
+                timed_out = True
+                raise
+            finally:
+                metrics.record_wait(time.perf_counter() - start, timed_out)
+
+    return InstrumentedPool
@@ -0,0 +1,100 @@
+import itertools
+import logging
+import math
+import threading
+import time
+
+from sqlalchemy import Engine, text
+
+logger = logging.getLogger(__name__)
+
+# 0 when the replica has replayed everything it received, so an idle primary
+# doesn't make a caught up replica look like it's lagging. NULL when it isn't
+# streaming from the primary, it then can't tell what it hasn't received
+lag_query = text(
+    """
+    SELECT CASE
+        WHEN NOT EXISTS (
+            SELECT FROM pg_stat_wal_receiver WHERE status = 'streaming'
+        ) THEN NULL
+        WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE COALESCE(
+            EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0
+        )
+    END
+    """
+)
+
+
+class ReplicaRouter:
+    """
+    Choose the engine for read-only queries.
+
+    Reads are spread over the replicas that are up and lag behind the primary
+    by at most `max_lag` seconds, and go to the primary when there is none.
+    The health of each replica is checked at most every `check_interval`
+    seconds, in a background thread, requests use the last known health
+    meanwhile.
+    """
+
+    def __init__(
+        self,
+        primary: Engine,
+        replicas: list[Engine],
+        max_lag: float,
+        check_interval: float,
+    ) -> None:
+        self.primary = primary
+        self.replicas = replicas
+        self.max_lag = max_lag
+        self.check_interval = check_interval
+        self._healthy: dict[Engine, bool] = {}
+        self._checked_at: float | None = None
+        self._lock = threading.Lock()
+        self._counter = itertools.count()
+        self._checker: threading.Thread | None = None
+
+    def lag(self, engine: Engine) -> float:
+        with engine.connect() as connection:
+            lag = connection.execute(lag_query).scalar_one()
+        return math.inf if lag is None else float(lag)
+
+    def check(self) -> None:
+        for replica in self.replicas:
+            try:
+                lag = self.lag(replica)
+            except Exception as e:
+                logger.warning(f"Read replica {replica.url!r} is down: {e}")
+                self._healthy[replica] = False
+                continue
+            if lag == math.inf:
+                logger.warning(f"Read replica {replica.url!r} is not streaming")
+            elif lag > self.max_lag:
+                logger.warning(f"Read replica {replica.url!r} is {lag:.1f}s behind")
+            self._healthy[replica] = lag <= self.max_lag
+        self._checked_at = time.monotonic()
+
+    def _check_and_release(self) -> None:
+        try:
+            self.check()
+        finally:
+            self._lock.release()
+
+    def get_engine(self) -> Engine:
+        if not self.replicas:
+            return self.primary
+        if (
+            self._checked_at is None
+            or time.monotonic() - self._checked_at >= self.check_interval
+        ):
+            # A single check runs at a time, an unreachable replica can take
+            # until the connection times out to fail
+            if self._lock.acquire(blocking=False):
+                self._checker = threading.Thread(
+                    target=self._check_and_release, daemon=True
+                )
+                self._checker.start()
+        healthy = [replica for replica in self.replicas if self._healthy.get(replica)]
+        if not healthy:
+            return self.primary
+        return healthy[next(self._counter) % len(healthy)]
@@ -0,0 +1,208 @@
+import hashlib
+import logging
+import math
+import threading
+import time
+from collections.abc import Iterator
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import ColumnElement
+from sqlalchemy.dialects.postgresql import insert
+from sqlmodel import Session, col, select
+
+from app import crud
+from app.core.config import settings
+from app.core.db import engine
+from app.models import RevokedToken, TokenPayload
+
+logger = logging.getLogger(__name__)
+
+sync_overlap = timedelta(minutes=1)
+
+
+class BloomFilter:
+    """
+    Fixed size Bloom filter of strings, membership checks can return false
+    positives at about `error_rate` once `capacity` keys are added, but never
+    false negatives.
+    """
+
+    def __init__(self, capacity: int, error_rate: float) -> None:
+        self.size = max(
+            8, math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2)
+        )
+        self.hash_count = max(1, round(self.size / capacity * math.log(2)))
+        self._bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, key: str) -> Iterator[int]:
+        # Double hashing, derive all the positions from two 64 bit hashes
+        digest = hashlib.blake2b(key.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        for i in range(self.hash_count):
+            yield (h1 + i * h2) % self.size
+
+    def add(self, key: str) -> None:
+        for position in self._positions(key):
+            self._bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, key: str) -> bool:
+        return all(
+            self._bits[position >> 3] & (1 << (position & 7))
+            for position in self._positions(key)
+        )
+
+
+class RevocationFilter:
+    """
+    Per-worker view of the revoked tokens.
+
+    Token ids not in the Bloom filter are known not to be revoked without a
+    query, only filter hits are confirmed against the database. The filter is
+    synced incrementally from the revokedtoken table every `sync_interval`
+    seconds and rebuilt from the unexpired rows every `rebuild_interval`.
+
+    Rebuilding hashes every unexpired token id, seconds of CPU with a million
+    of them, so it runs in a background thread and the new filter is swapped
+    in when it's complete. Until the first one is, every token id is checked
+    against the database.
+    """
+
+    def __init__(
+        self,
+        capacity: int,
+        error_rate: float,
+        sync_interval: float,
+        rebuild_interval: float,
+    ) -> None:
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.sync_interval = sync_interval
+        self.rebuild_interval = rebuild_interval
+        self._filter: BloomFilter | None = None
+        self._rebuilding: BloomFilter | None = None
+        self._lock = threading.Lock()
+        self._synced_at: float | None = None
+        self._rebuilt_at: float | None = None
+        self._synced_until = datetime.now(timezone.utc)
+
+    def _load(
+        self, session: Session, bloom: BloomFilter, where: ColumnElement[bool]
+    ) -> None:
+        statement = select(RevokedToken.jti).where(where)
+        for jti in session.exec(statement.execution_options(yield_per=10_000)):
+            bloom.add(jti)
+
+    def _purge_expired(self, session: Session) -> None:
+        # Expired tokens are rejected anyway, they are deleted in small
+        # batches, each in its own transaction
+        while True:
+            result = session.exec(
+                crud.purge_expired_tokens_statement,
+                params={"limit": settings.PURGE_BATCH_SIZE},
+            )
+            session.commit()
+            if not result.rowcount:
+                break
+
+    def rebuild(self) -> None:
+        """
+        Build a new filter from the unexpired revoked tokens and swap it in,
+        then delete the expired ones.
+        """
+        bloom = BloomFilter(self.capacity, self.error_rate)
+        self._rebuilding = bloom
+        try:
+            started_at = datetime.now(timezone.utc)
+            with Session(engine) as session:
+                self._load(session, bloom, col(RevokedToken.expires_at) > started_at)
+                # Catch up with the revocations made while it was built,
+                # holding off the incremental syncs of the current filter
+                with self._lock:
+                    synced_until = datetime.now(timezone.utc)
+                    self._load(
+                        session,
+                        bloom,
+                        col(RevokedToken.revoked_at) >= started_at - sync_overlap,
+                    )
+                    self._filter = bloom
+                    self._synced_until = synced_until
+                self._purge_expired(session)
+        except Exception:
+            logger.exception("Rebuilding the token revocation filter failed")
+            self._rebuilt_at = None
+        finally:
+            self._rebuilding = None
+
+    def sync(self, session: Session) -> None:
+        now = time.monotonic()
+        if self._rebuilt_at is None or now - self._rebuilt_at >= self.rebuild_interval:
+            self._rebuilt_at = now
+            threading.Thread(target=self.rebuild, daemon=True).start()
+        if self._filter is not None:
+            # Read back with some overlap, a revocation committed late can
+            # carry a revoked_at older than the last sync
+            synced_until = datetime.now(timezone.utc)
+            self._load(
+                session,
+                self._filter,
+                col(RevokedToken.revoked_at) >= self._synced_until - sync_overlap,
+            )
+            self._synced_until = synced_until
+        self._synced_at = now
+
+    def is_revoked(self, session: Session, jti: str) -> bool:
+        if (
+            self._synced_at is None
+            or time.monotonic() - self._synced_at >= self.sync_interval
+        ):
+            # A single thread syncs, the others keep using the current filter
+            if self._lock.acquire(blocking=False):
+                try:
+                    self.sync(session)
+                finally:
+                    self._lock.release()
+        bloom = self._filter
+        if bloom is not None and jti not in bloom:
+            return False
+        return session.get(RevokedToken, jti) is not None
+
+    def revoke(self, session: Session, token_data: TokenPayload) -> bool:
+        """
+        Revoke the token in the transaction of the session, the caller commits.
+
+        Returns False if the token was already revoked, or has expired. A
+        concurrent revocation of the same token waits on the primary key until
+        the first one commits, so a single caller gets True.
+        """
+        if not token_data.jti or not token_data.exp:
+            return False
+        now = datetime.now(timezone.utc)
+        expires_at = datetime.fromtimestamp(token_data.exp, timezone.utc)
+        if expires_at <= now:
+            return False
+        statement = (
+            insert(RevokedToken)
+            .values(jti=token_data.jti, expires_at=expires_at, revoked_at=now)
+            .on_conflict_do_nothing(index_elements=["jti"])
+            .returning(col(RevokedToken.jti))
+        )
+        if session.exec(statement).scalar_one_or_none() is None:
+            return False
+        # The filter being built may read the table before the commit. Adding
+        # the token before it commits, or if it is rolled back, only costs a
+        # lookup in the database
+        rebuilding = self._rebuilding
+        if self._filter is not None:
+            self._filter.add(token_data.jti)
+        if rebuilding is not None:
+            rebuilding.add(token_data.jti)
+        return True
+
+
+revocation_filter = RevocationFilter(
+    capacity=settings.TOKEN_REVOCATION_FILTER_CAPACITY,
+    error_rate=settings.TOKEN_REVOCATION_FILTER_ERROR_RATE,
+    sync_interval=settings.TOKEN_REVOCATION_SYNC_SECONDS,
+    rebuild_interval=settings.TOKEN_REVOCATION_REBUILD_SECONDS,
+)
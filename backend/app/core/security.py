@@ -1,27 +1,77 @@
+import time
+import uuid
 from datetime import datetime, timedelta, timezone
 from typing import Any
 
 import jwt
-from passlib.context import CryptContext
 
+from app.core.cache import token_cache
 from app.core.config import settings
+from app.core.hashing import hasher
+from app.models import TokenPayload
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+ALGORITHM = "HS256"
 
 
-ALGORITHM = "HS256"
+def create_access_token(
+    subject: str | Any,
+    expires_delta: timedelta,
+    claims: dict[str, Any] | None = None,
+) -> str:
+    expire = datetime.now(timezone.utc) + expires_delta
+    to_encode = {
+        **(claims or {}),
+        "exp": expire,
+        "sub": str(subject),
+        "jti": uuid.uuid4().hex,
+    }
+    encoded_jwt = jwt.encode(to_encode, settings.SECRET_KEY, algorithm=ALGORITHM)
+    return encoded_jwt
 
 
-def create_access_token(subject: str | Any, expires_delta: timedelta) -> str:
+def create_refresh_token(subject: str | Any, expires_delta: timedelta) -> str:
     expire = datetime.now(timezone.utc) + expires_delta
-    to_encode = {"exp": expire, "sub": str(subject)}
+    to_encode = {
+        "exp": expire,
+        "sub": str(subject),
+        "type": "refresh",
+        "jti": uuid.uuid4().hex,
+    }
     encoded_jwt = jwt.encode(to_encode, settings.SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
 
+def decode_token(token: str) -> TokenPayload:
+    """
+    Verify and parse a token, raising InvalidTokenError or ValidationError if
+    it's not valid.
+
+    Verified tokens are cached until their expiration.
+    """
+    key = (settings.SECRET_KEY, token)
+    token_data = token_cache.get(key)
+    if token_data is not None:
+        return token_data
+    payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[ALGORITHM])
+    token_data = TokenPayload(**payload)
+    if "exp" in payload:
+        token_cache.set(key, token_data, ttl=payload["exp"] - time.time())
+    return token_data
+
+
 def verify_password(plain_password: str, hashed_password: str) -> bool:
-    return pwd_context.verify(plain_password, hashed_password)
+    return hasher.verify(plain_password, hashed_password)
+
+
+def verify_and_update_password(
+    plain_password: str, hashed_password: str
+) -> tuple[bool, str | None]:
+    """
+    Verify a password, also returning a new hash if the stored one doesn't use
+    the current scheme and parameters.
+    """
+    return hasher.verify_and_update(plain_password, hashed_password)
 
 
 def get_password_hash(password: str) -> str:
-    return pwd_context.hash(password)
+    return hasher.hash(password)
@@ -0,0 +1,189 @@
+import hashlib
+import random
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy.dialects.postgresql import insert
+from sqlmodel import Session, col, delete
+
+from app.core.config import settings
+from app.core.db import engine
+from app.models import ThrottleBucket
+
+
+class ThrottleBackend(ABC):
+    """
+    Storage of token buckets, each bucket holds up to `capacity` tokens and
+    is refilled at `rate` tokens per second.
+    """
+
+    @abstractmethod
+    def take(self, key: str, capacity: float, rate: float) -> float:
+        """
+        Take a token from the bucket, returns 0 if one was available, or the
+        seconds to wait until there is one.
+        """
+
+    @abstractmethod
+    def give_back(self, key: str, capacity: float) -> None:
+        """
+        Return a token taken from the bucket.
+        """
+
+
+def _account_key(account: str) -> str:
+    # Accounts are whatever was typed as the username, hashed to fit the
+    # bucket keys whatever their length
+    digest = hashlib.sha256(account.lower().encode()).hexdigest()
+    return f"account:{digest}"
+
+
+def _refill(tokens: float, elapsed: float, capacity: float, rate: float) -> float:
+    return min(capacity, tokens + elapsed * rate)
+
+
+class MemoryThrottleBackend(ThrottleBackend):
+    """
+    Buckets kept in memory, they are not shared between worker processes.
+    """
+
+    def __init__(self, max_size: int = 100_000) -> None:
+        self.max_size = max_size
+        self._buckets: OrderedDict[str, tuple[float, float]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def take(self, key: str, capacity: float, rate: float) -> float:
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated_at = self._buckets.get(key, (capacity, now))
+            tokens = _refill(tokens, now - updated_at, capacity, rate)
+            retry_after = 0.0
+            if tokens >= 1:
+                tokens -= 1
+            else:
+                retry_after = (1 - tokens) / rate
+            self._buckets[key] = (tokens, now)
+            self._buckets.move_to_end(key)
+            while len(self._buckets) > self.max_size:
+                self._buckets.popitem(last=False)
+        return retry_after
+
+    def give_back(self, key: str, capacity: float) -> None:
+        with self._lock:
+            if key in self._buckets:
+                tokens, updated_at = self._buckets[key]
+                self._buckets[key] = (min(capacity, tokens + 1), updated_at)
+
+
+class DatabaseThrottleBackend(ThrottleBackend):
+    """
+    Buckets stored in the throttlebucket table, shared by all the workers.
+    """
+
+    # Fraction of calls that also delete the buckets that are full again
+    prune_probability = 0.01
+
+    def take(self, key: str, capacity: float, rate: float) -> float:
+        now = datetime.now(timezone.utc)
+        with Session(engine) as session:
+            statement = (
+                insert(ThrottleBucket)
+                .values(key=key, tokens=capacity, updated_at=now)
+                .on_conflict_do_nothing(index_elements=["key"])
+            )
+            session.exec(statement)
+            bucket = session.get(ThrottleBucket, key, with_for_update=True)
+            assert bucket
+            elapsed = (now - bucket.updated_at).total_seconds()
+            tokens = _refill(bucket.tokens, elapsed, capacity, rate)
+            retry_after = 0.0
+            if tokens >= 1:
+                tokens -= 1
+            else:
+                retry_after = (1 - tokens) / rate
+            bucket.tokens = tokens
+            bucket.updated_at = now
+            session.add(bucket)
+            if random.random() < self.prune_probability:
+                # A bucket untouched for the time it takes to refill is the
+                # same as a missing one
+                full_since = now - timedelta(seconds=capacity / rate)
+                session.exec(
+                    delete(ThrottleBucket).where(
+                        col(ThrottleBucket.updated_at) < full_since
+                    )
+                )
+            session.commit()
+        return retry_after
+
+    def give_back(self, key: str, capacity: float) -> None:
+        with Session(engine) as session:
+            bucket = session.get(ThrottleBucket, key, with_for_update=True)
+            if bucket:
+                bucket.tokens = min(capacity, bucket.tokens + 1)
+                session.add(bucket)
+                session.commit()
+
+
+class LoginThrottle:
+    """
+    Throttle login attempts per account and per client IP.
+
+    Attempts are checked before the password is verified, so a burst of
+    attempts is rejected without spending any hashing time. Successful
+    logins give the account token back, the account bucket only drains with
+    failed attempts.
+    """
+
+    def __init__(
+        self,
+        backend: ThrottleBackend | None,
+        account_burst: int,
+        account_per_minute: float,
+        ip_burst: int,
+        ip_per_minute: float,
+    ) -> None:
+        self.backend = backend
+        self.account_burst = account_burst
+        self.account_rate = account_per_minute / 60
+        self.ip_burst = ip_burst
+        self.ip_rate = ip_per_minute / 60
+
+    def attempt(self, *, account: str, ip: str | None) -> float:
+        """
+        Register an attempt, returns 0 if it's allowed or the seconds to wait
+        before trying again.
+        """
+        if not self.backend:
+            return 0
+        if ip:
+            retry_after = self.backend.take(f"ip:{ip}", self.ip_burst, self.ip_rate)
+            if retry_after:
+                return retry_after
+        return self.backend.take(
+            _account_key(account), self.account_burst, self.account_rate
+        )
+
+    def succeeded(self, *, account: str) -> None:
+        if self.backend:
+            self.backend.give_back(_account_key(account), self.account_burst)
+
+
+def get_throttle_backend() -> ThrottleBackend | None:
+    if settings.LOGIN_THROTTLE_BACKEND == "memory":
+        return MemoryThrottleBackend()
+    if settings.LOGIN_THROTTLE_BACKEND == "database":
+        return DatabaseThrottleBackend()
+    return None
+
+
+login_throttle = LoginThrottle(
+    backend=get_throttle_backend(),
+    account_burst=settings.LOGIN_THROTTLE_ACCOUNT_BURST,
+    account_per_minute=settings.LOGIN_THROTTLE_ACCOUNT_PER_MINUTE,
+    ip_burst=settings.LOGIN_THROTTLE_IP_BURST,
+    ip_per_minute=settings.LOGIN_THROTTLE_IP_PER_MINUTE,
+)
@@ -1,20 +1,368 @@
 import uuid
+from collections.abc import Mapping, Sequence
 from typing import Any
 
-from sqlmodel import Session, select
+from sqlalchemy import (
+    REAL,
+    BigInteger,
+    Boolean,
+    ColumnElement,
+    String,
+    Uuid,
+    and_,
+    case,
+    cast,
+    column,
+    event,
+    or_,
+    table,
+)
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.dialects.postgresql import ARRAY, REGCLASS, REGCONFIG
+from sqlalchemy.orm import ORMExecuteState, with_loader_criteria
+from sqlmodel import (
+    Session,
+    any_,
+    bindparam,
+    col,
+    delete,
+    func,
+    insert,
+    select,
+    update,
+)
+from sqlmodel.sql.expression import SelectOfScalar
 
-from app.core.security import get_password_hash, verify_password
-from app.models import Item, ItemCreate, User, UserCreate, UserUpdate
+from app.core.cache import principal_cache
+from app.core.config import settings
+from app.core.security import get_password_hash, verify_and_update_password
+from app.models import (
+    Item,
+    ItemBulkResult,
+    ItemBulkUpdate,
+    ItemCount,
+    ItemCreate,
+    ItemPublic,
+    ItemUpdate,
+    Principal,
+    RevokedToken,
+    User,
+    UserCreate,
+    UserPublic,
+    UserUpdate,
+    item_search_config,
+    item_search_vector,
+)
 
+# The user table itself rather than the User model, the criteria hiding the
+# soft deleted users must not apply to the lookup of the deleted owners
+deleted_users = table("user", column("id"), column("deleted_at")).alias("deleted_user")
 
-def create_user(*, session: Session, user_create: UserCreate) -> User:
+
+def owner_not_deleted(owner_id: Any) -> ColumnElement[bool]:
+    # The few soft deleted users are read by their partial index into a hashed
+    # set each row is checked against, the rows keep their index order
+    return col(owner_id).not_in(
+        select(deleted_users.c.id).where(deleted_users.c.deleted_at.is_not(None))
+    )
+
+
+# The items of a soft deleted user are hidden with the user, without having
+# to mark each of them deleted
+item_not_deleted = and_(
+    col(Item.deleted_at).is_(None), owner_not_deleted(col(Item.owner_id))
+)
+
+# Soft deleted users and items are hidden from all the ORM statements run by a
+# Session, including Session.get() and relationship loads, unless they are
+# run with the include_deleted execution option
+not_deleted = (
+    with_loader_criteria(User, col(User.deleted_at).is_(None), include_aliases=True),
+    with_loader_criteria(Item, item_not_deleted, include_aliases=True),
+)
+
+
+@event.listens_for(Session, "do_orm_execute")
+def hide_deleted(execute_state: ORMExecuteState) -> None:
+    if (
+        (execute_state.is_select or execute_state.is_update or execute_state.is_delete)
+        # Refreshing the attributes of a loaded object is left alone
+        and not execute_state.is_column_load
+        and not execute_state.execution_options.get("include_deleted", False)
+    ):
+        execute_state.statement = execute_state.statement.options(*not_deleted)
+
+
+# Statements run on most requests are built once, with bound parameters.
+# SQLAlchemy caches their compiled form, and psycopg prepares them on each
+# connection once they ran DB_PREPARE_THRESHOLD times
+user_by_email_statement = select(User).where(User.email == bindparam("email"))
+users_count_statement = select(func.count()).select_from(User)
+users_statement = (
+    select(User)
+    .order_by(col(User.id))
+    .offset(bindparam("skip"))
+    .limit(bindparam("limit"))
+)
+# Keyset pages start after the last id of the previous page, they are read
+# from the primary key index instead of scanning the skipped rows
+users_after_statement = (
+    select(User)
+    .where(col(User.id) > bindparam("after"))
+    .order_by(col(User.id))
+    .limit(bindparam("limit"))
+)
+items_count_statement = select(func.count()).select_from(Item)
+items_statement = (
+    select(Item)
+    .order_by(col(Item.id))
+    .offset(bindparam("skip"))
+    .limit(bindparam("limit"))
+)
+items_after_statement = (
+    select(Item)
+    .where(col(Item.id) > bindparam("after"))
+    .order_by(col(Item.id))
+    .limit(bindparam("limit"))
+)
+owner_items_count_statement = items_count_statement.where(
+    Item.owner_id == bindparam("owner_id")
+)
+owner_items_statement = items_statement.where(Item.owner_id == bindparam("owner_id"))
+owner_items_after_statement = items_after_statement.where(
+    Item.owner_id == bindparam("owner_id")
+)
+
+# Exports select the columns of the public models, their rows are written as
+# they are read, without loading ORM objects. They run on a connection, not a
+# Session, so they leave out the soft deleted rows themselves
+users_export_statement = (
+    select(*(col(getattr(User, field)) for field in UserPublic.model_fields))
+    .where(col(User.deleted_at).is_(None))
+    .order_by(col(User.id))
+)
+items_export_statement = (
+    select(*(col(getattr(Item, field)) for field in ItemPublic.model_fields))
+    .where(item_not_deleted)
+    .order_by(col(Item.id))
+)
+owner_items_export_statement = items_export_statement.where(
+    Item.owner_id == bindparam("owner_id")
+)
+
+# Search results, best ranked first. Keyset pages start after the rank and id
+# of the last result of the previous page
+search_query = func.websearch_to_tsquery(
+    cast(item_search_config, REGCONFIG), bindparam("q")
+)
+search_rank = func.ts_rank(item_search_vector, search_query, type_=REAL)
+items_search_statement = (
+    select(Item, search_rank)
+    .where(item_search_vector.bool_op("@@")(search_query))
+    .order_by(search_rank.desc(), col(Item.id))
+    .limit(bindparam("limit"))
+)
+items_search_after_statement = items_search_statement.where(
+    or_(
+        search_rank < bindparam("rank", type_=REAL),
+        and_(
+            search_rank == bindparam("rank", type_=REAL),
+            col(Item.id) > bindparam("after"),
+        ),
+    )
+)
+owner_items_search_statement = items_search_statement.where(
+    Item.owner_id == bindparam("owner_id")
+)
+owner_items_search_after_statement = items_search_after_statement.where(
+    Item.owner_id == bindparam("owner_id")
+)
+
+# User search, the pattern matches anywhere in the email or the name and is
+# served by their trigram indexes
+user_search_pattern = bindparam("pattern", type_=String)
+users_search_statement = (
+    select(User)
+    .where(
+        or_(
+            col(User.email).ilike(user_search_pattern),
+            col(User.full_name).ilike(user_search_pattern),
+        )
+    )
+    .order_by(col(User.email))
+    .limit(bindparam("limit"))
+)
+
+pg_class = table("pg_class", column("oid"), column("relkind"), column("reltuples"))
+pg_inherits = table("pg_inherits", column("inhrelid"), column("inhparent"))
+
+
+def estimated_count_statement(table_name: str) -> SelectOfScalar[int]:
+    # Planner estimate, -1 until the table is first vacuumed or analyzed. A
+    # partitioned table has no rows of its own, the estimates of its
+    # partitions are summed
+    relation = cast(table_name, REGCLASS)
+    partitions = select(pg_inherits.c.inhrelid).where(
+        pg_inherits.c.inhparent == relation
+    )
+    reltuples = pg_class.c.reltuples
+    estimate = case((func.min(reltuples) < 0, -1), else_=func.sum(reltuples))
+    return select(cast(func.coalesce(estimate, -1), BigInteger)).where(
+        or_(
+            and_(pg_class.c.oid == relation, pg_class.c.relkind != "p"),
+            col(pg_class.c.oid).in_(partitions),
+        )
+    )
+
+
+estimated_users_count_statement = estimated_count_statement("user")
+estimated_items_count_statement = estimated_count_statement("item")
+counted_items_statement = select(func.coalesce(func.sum(ItemCount.count), 0)).where(
+    owner_not_deleted(col(ItemCount.owner_id))
+)
+owner_counted_items_statement = select(ItemCount.count).where(
+    ItemCount.owner_id == bindparam("owner_id")
+)
+
+# Bulk statements take the ids as a single array parameter, their SQL is the
+# same for any number of items
+item_ids = bindparam("ids", type_=ARRAY(Uuid()))
+# Rows locked until the end of the bulk request, they can't be deleted
+# between the ownership check and the write
+item_owners_statement = (
+    select(Item.id, Item.owner_id)
+    .where(col(Item.id) == any_(item_ids))
+    .with_for_update()
+)
+delete_items_statement = delete(Item).where(col(Item.id) == any_(item_ids))
+# Executed with a parameter set per item, the updated columns are the other
+# keys of the parameters. The owner lets a partitioned table prune the UPDATE
+# to the partition of the item, so it's in the WHERE clause, not in the SET
+update_items_statement = (
+    update(Item)
+    .where(
+        col(Item.id) == bindparam("b_id"),
+        col(Item.owner_id) == bindparam("b_owner_id"),
+    )
+    .execution_options(dml_strategy="core_only")
+)
+
+# Creates are a single INSERT, the row comes back with RETURNING instead of a
+# SELECT after the commit. A taken email is skipped by the unique index, there
+# is no lookup before the insert for a concurrent signup to race with
+create_user_statement = (
+    postgresql.insert(User)
+    .on_conflict_do_nothing(
+        index_elements=[User.email], index_where=col(User.deleted_at).is_(None)
+    )
+    .returning(User)
+)
+create_item_statement = insert(Item).returning(Item)
+# The items of the user are deleted by the foreign key cascade
+delete_user_statement = delete(User).where(col(User.id) == bindparam("user_id"))
+
+# Single item statements check the ownership in SQL, they return no row for an
+# item that is missing or not owned, item_exists_statement tells them apart
+item_access = or_(
+    col(Item.owner_id) == bindparam("principal_id"),
+    bindparam("is_superuser", type_=Boolean),
+)
+# Not named after columns, an UPDATE reserves those for its SET clause
+item_id = col(Item.id) == bindparam("item_id")
+item_statement = select(Item).where(item_id, item_access)
+update_item_statement = update(Item).where(item_id, item_access).returning(Item)
+# Conditional update, only applied to the version of the item the client has
+update_item_version_statement = update_item_statement.where(
+    col(Item.version) == bindparam("item_version")
+)
+delete_item_statement = delete(Item).where(item_id, item_access).returning(col(Item.id))
+item_exists_statement = select(Item.id).where(item_id)
+
+# With SOFT_DELETE, deletes only mark the rows deleted, which is a single row
+# update whatever the number of items of a user. The purge deletes them later
+soft_delete_user_statement = (
+    update(User)
+    .where(col(User.id) == bindparam("user_id"))
+    .values(deleted_at=func.now())
+)
+soft_delete_item_statement = (
+    update(Item)
+    .where(item_id, item_access)
+    .values(deleted_at=func.now())
+    .returning(col(Item.id))
+)
+soft_delete_items_statement = (
+    update(Item).where(col(Item.id) == any_(item_ids)).values(deleted_at=func.now())
+)
+
+# Each purge statement deletes a batch of at most `limit` rows, found by the
+# partial indexes of the soft deleted rows. Rows locked by another purge are
+# skipped. The items of the deleted users are purged before the users, so the
+# cascade of a user delete has no item left to delete
+deleted_user_ids = select(User.id).where(col(User.deleted_at).is_not(None))
+purge_items_statement = (
+    delete(Item)
+    .where(
+        col(Item.id).in_(
+            select(Item.id)
+            .where(col(Item.deleted_at).is_not(None))
+            .limit(bindparam("limit"))
+            .with_for_update(skip_locked=True)
+        )
+    )
+    .execution_options(include_deleted=True)
+)
+purge_deleted_users_items_statement = (
+    delete(Item)
+    .where(
+        col(Item.id).in_(
+            select(Item.id)
+            .where(col(Item.owner_id).in_(deleted_user_ids))
+            .limit(bindparam("limit"))
+            .with_for_update(skip_locked=True)
+        )
+    )
+    .execution_options(include_deleted=True)
+)
+purge_users_statement = (
+    delete(User)
+    .where(
+        col(User.id).in_(
+            deleted_user_ids.limit(bindparam("limit")).with_for_update(skip_locked=True)
+        )
+    )
+    .execution_options(include_deleted=True)
+)
+purge_statements = [
+    purge_items_statement,
+    purge_deleted_users_items_statement,
+    purge_users_statement,
+]
+
+# Run by the periodic rebuilds of the revocation filter in every server
+# worker, the purge worker is only deployed along with SOFT_DELETE
+purge_expired_tokens_statement = delete(RevokedToken).where(
+    col(RevokedToken.jti).in_(
+        select(RevokedToken.jti)
+        .where(col(RevokedToken.expires_at) <= func.now())
+        .limit(bindparam("limit"))
+        .with_for_update(skip_locked=True)
+    )
+)
+
+
+def create_user(*, session: Session, user_create: UserCreate) -> User | None:
+    """
+    Create the user, or return None if its email is already taken.
+    """
     db_obj = User.model_validate(
         user_create, update={"hashed_password": get_password_hash(user_create.password)}
     )
-    session.add(db_obj)
+    user: User | None = session.exec(
+        create_user_statement, params=db_obj.model_dump()
+    ).scalar_one_or_none()
     session.commit()
-    session.refresh(db_obj)
-    return db_obj
+    return user
 
 
 def update_user(*, session: Session, db_user: User, user_in: UserUpdate) -> Any:
@@ -28,12 +376,32 @@ def update_user(*, session: Session, db_user: User, user_in: UserUpdate) -> Any:
     session.add(db_user)
     session.commit()
     session.refresh(db_user)
+    principal_cache.invalidate(db_user.id)
     return db_user
 
 
+def delete_user(*, session: Session, user_id: uuid.UUID) -> bool:
+    """
+    Whether the user existed and was deleted, with all their items.
+
+    With SOFT_DELETE the user is only marked deleted, and the purge deletes it
+    with its items later.
+    """
+    statement = (
+        soft_delete_user_statement if settings.SOFT_DELETE else delete_user_statement
+    )
+    result = session.exec(statement, params={"user_id": user_id})
+    session.commit()
+    if not result.rowcount:
+        return False
+    principal_cache.invalidate(user_id)
+    return True
+
+
 def get_user_by_email(*, session: Session, email: str) -> User | None:
-    statement = select(User).where(User.email == email)
-    session_user = session.exec(statement).first()
+    session_user = session.exec(
+        user_by_email_statement, params={"email": email}
+    ).first()
     return session_user
 
 
@@ -41,14 +409,240 @@ def authenticate(*, session: Session, email: str, password: str) -> User | None:
     db_user = get_user_by_email(session=session, email=email)
     if not db_user:
         return None
-    if not verify_password(password, db_user.hashed_password):
+    verified, updated_hash = verify_and_update_password(
+        password, db_user.hashed_password
+    )
+    if not verified:
         return None
+    if updated_hash:
+        db_user.hashed_password = updated_hash
+        session.add(db_user)
+        session.commit()
+        session.refresh(db_user)
     return db_user
 
 
 def create_item(*, session: Session, item_in: ItemCreate, owner_id: uuid.UUID) -> Item:
     db_item = Item.model_validate(item_in, update={"owner_id": owner_id})
-    session.add(db_item)
+    item: Item = session.exec(
+        create_item_statement, params=db_item.model_dump()
+    ).scalar_one()
+    session.commit()
+    return item
+
+
+def item_access_params(*, id: uuid.UUID, principal: Principal) -> dict[str, Any]:
+    return {
+        "item_id": id,
+        "principal_id": principal.id,
+        "is_superuser": principal.is_superuser,
+    }
+
+
+def get_item(*, session: Session, id: uuid.UUID, principal: Principal) -> Item | None:
+    """
+    The item, or None if it doesn't exist or the principal can't access it.
+    """
+    params = item_access_params(id=id, principal=principal)
+    return session.exec(item_statement, params=params).first()
+
+
+def update_item(
+    *,
+    session: Session,
+    id: uuid.UUID,
+    item_in: ItemUpdate,
+    principal: Principal,
+    version: int | None = None,
+) -> Item | None:
+    """
+    The updated item, or None if it doesn't exist, the principal can't
+    access it, or it's no longer at `version` when one is given.
+    """
+    update_dict = item_in.model_dump(exclude_unset=True)
+    if not update_dict:
+        return get_item(session=session, id=id, principal=principal)
+    params = item_access_params(id=id, principal=principal)
+    statement = update_item_statement
+    if version is not None:
+        statement = update_item_version_statement
+        params["item_version"] = version
+    item: Item | None = session.exec(
+        statement.values(update_dict), params=params
+    ).scalar_one_or_none()
+    session.commit()
+    return item
+
+
+def delete_item(*, session: Session, id: uuid.UUID, principal: Principal) -> bool:
+    """
+    Whether the item was deleted, it isn't if it doesn't exist or the
+    principal can't access it.
+    """
+    params = item_access_params(id=id, principal=principal)
+    statement = (
+        soft_delete_item_statement if settings.SOFT_DELETE else delete_item_statement
+    )
+    deleted = session.exec(statement, params=params).first() is not None
     session.commit()
-    session.refresh(db_item)
-    return db_item
+    return deleted
+
+
+def item_exists(*, session: Session, id: uuid.UUID) -> bool:
+    return (
+        session.exec(item_exists_statement, params={"item_id": id}).first() is not None
+    )
+
+
+def search_users(
+    *,
+    session: Session,
+    q: str,
+    is_active: bool | None = None,
+    is_superuser: bool | None = None,
+    limit: int,
+) -> Sequence[User]:
+    """
+    Users whose email or name contains `q`, ignoring case, by email.
+    """
+    # LIKE wildcards in the query are matched literally
+    escaped = q.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    params: dict[str, Any] = {"pattern": f"%{escaped}%", "limit": limit}
+    statement = users_search_statement
+    if is_active is not None:
+        statement = statement.where(User.is_active == bindparam("is_active"))
+        params["is_active"] = is_active
+    if is_superuser is not None:
+        statement = statement.where(User.is_superuser == bindparam("is_superuser"))
+        params["is_superuser"] = is_superuser
+    return session.exec(statement, params=params).all()
+
+
+def count_users(*, session: Session) -> int | None:
+    strategy = settings.LIST_COUNT_STRATEGY
+    if strategy == "none":
+        return None
+    if strategy == "estimated":
+        estimate = session.exec(estimated_users_count_statement).one()
+        if estimate >= 0:
+            return estimate
+    return session.exec(users_count_statement).one()
+
+
+def count_items(*, session: Session, owner_id: uuid.UUID | None = None) -> int | None:
+    strategy = settings.LIST_COUNT_STRATEGY
+    if strategy == "none":
+        return None
+    if owner_id is None:
+        if strategy == "estimated":
+            estimate = session.exec(estimated_items_count_statement).one()
+            if estimate >= 0:
+                return estimate
+        if strategy == "counter":
+            return session.exec(counted_items_statement).one()
+        return session.exec(items_count_statement).one()
+    params = {"owner_id": owner_id}
+    if strategy == "exact":
+        return session.exec(owner_items_count_statement, params=params).one()
+    # There is no planner estimate for a single owner, the counter is as cheap
+    return session.exec(owner_counted_items_statement, params=params).first() or 0
+
+
+def check_items_access(
+    *,
+    ids: Sequence[uuid.UUID],
+    owners: Mapping[uuid.UUID, uuid.UUID],
+    principal: Principal,
+) -> list[ItemBulkResult]:
+    """
+    Results of the ownership checks of a bulk request, from the owners of the
+    existing items among `ids`.
+    """
+    results = []
+    for id in ids:
+        owner_id = owners.get(id)
+        if not owner_id:
+            result = ItemBulkResult(id=id, status_code=404, detail="Item not found")
+        elif not principal.is_superuser and owner_id != principal.id:
+            result = ItemBulkResult(
+                id=id, status_code=400, detail="Not enough permissions"
+            )
+        else:
+            result = ItemBulkResult(id=id)
+        results.append(result)
+    return results
+
+
+def create_items(
+    *, session: Session, items_in: Sequence[ItemCreate], owner_id: uuid.UUID
+) -> list[ItemBulkResult]:
+    rows = [
+        Item.model_validate(item_in, update={"owner_id": owner_id}).model_dump()
+        for item_in in items_in
+    ]
+    if rows:
+        # Sent as multi-row INSERTs
+        session.exec(insert(Item), params=rows)
+        session.commit()
+    return [ItemBulkResult(id=row["id"]) for row in rows]
+
+
+def item_update_batches(
+    items_in: Sequence[ItemBulkUpdate],
+    *,
+    results: Sequence[ItemBulkResult],
+    owners: Mapping[uuid.UUID, uuid.UUID],
+) -> list[list[dict[str, Any]]]:
+    """
+    Parameters of update_items_statement for the allowed updates, batched by
+    the set of updated columns, as each batch is a single executemany.
+    """
+    batches: dict[frozenset[str], list[dict[str, Any]]] = {}
+    for item_in, result in zip(items_in, results, strict=True):
+        values = item_in.model_dump(exclude_unset=True, exclude={"id"})
+        if result.status_code != 200 or not values:
+            continue
+        params = {"b_id": item_in.id, "b_owner_id": owners[item_in.id], **values}
+        batches.setdefault(frozenset(values), []).append(params)
+    return list(batches.values())
+
+
+def update_items(
+    *, session: Session, items_in: Sequence[ItemBulkUpdate], principal: Principal
+) -> list[ItemBulkResult]:
+    ids = [item_in.id for item_in in items_in]
+    owners = dict(session.exec(item_owners_statement, params={"ids": ids}).all())
+    results = check_items_access(ids=ids, owners=owners, principal=principal)
+    for batch in item_update_batches(items_in, results=results, owners=owners):
+        session.exec(update_items_statement, params=batch)
+    session.commit()
+    return results
+
+
+def delete_items(
+    *, session: Session, ids: Sequence[uuid.UUID], principal: Principal
+) -> list[ItemBulkResult]:
+    owners = dict(session.exec(item_owners_statement, params={"ids": ids}).all())
+    results = check_items_access(ids=ids, owners=owners, principal=principal)
+    allowed = [result.id for result in results if result.status_code == 200]
+    statement = (
+        soft_delete_items_statement if settings.SOFT_DELETE else delete_items_statement
+    )
+    if allowed:
+        session.exec(statement, params={"ids": allowed})
+    session.commit()
+    return results
+
+
+def purge_deleted(*, session: Session, limit: int) -> int:
+    """
+    Delete a batch of at most `limit` soft deleted rows, in its own
+    transaction. Returns the number of rows deleted, 0 when there is nothing
+    left to purge.
+    """
+    for statement in purge_statements:
+        result = session.exec(statement, params={"limit": limit})
+        session.commit()
+        if result.rowcount:
+            return result.rowcount
+    return 0
@@ -0,0 +1,74 @@
+import csv
+import io
+import json
+from collections.abc import AsyncIterator, Iterator, Sequence
+from typing import Any, Literal
+
+from sqlalchemy import Engine, Executable, Row
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+ExportFormat = Literal["ndjson", "csv"]
+
+media_types: dict[ExportFormat, str] = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+}
+
+# Rows fetched at a time from the server-side cursor, and written per chunk
+batch_size = 1000
+
+
+def format_header(fields: Sequence[str], file_format: ExportFormat) -> str:
+    if file_format == "ndjson":
+        return ""
+    buffer = io.StringIO()
+    csv.writer(buffer).writerow(fields)
+    return buffer.getvalue()
+
+
+def format_rows(rows: Sequence[Row[Any]], file_format: ExportFormat) -> str:
+    buffer = io.StringIO()
+    if file_format == "ndjson":
+        for row in rows:
+            buffer.write(json.dumps(row._asdict(), default=str))
+            buffer.write("\n")
+    else:
+        csv.writer(buffer).writerows(rows)
+    return buffer.getvalue()
+
+
+def export_rows(
+    engine: Engine,
+    statement: Executable,
+    params: dict[str, Any],
+    file_format: ExportFormat,
+) -> Iterator[str]:
+    """
+    Stream the rows of the statement as NDJSON or CSV chunks.
+
+    The connection is opened by the generator, it's only used while the
+    response is streamed, and yield_per reads the rows from a server-side
+    cursor, so memory use doesn't depend on the number of rows.
+    """
+    with engine.connect() as connection:
+        result = connection.execute(
+            statement.execution_options(yield_per=batch_size), params
+        )
+        yield format_header(list(result.keys()), file_format)
+        for rows in result.partitions():
+            yield format_rows(rows, file_format)
+
+
+async def export_rows_async(
+    engine: AsyncEngine,
+    statement: Executable,
+    params: dict[str, Any],
+    file_format: ExportFormat,
+) -> AsyncIterator[str]:
+    async with engine.connect() as connection:
+        result = await connection.stream(
+            statement.execution_options(yield_per=batch_size), params
+        )
+        yield format_header(list(result.keys()), file_format)
+        async for rows in result.partitions():
+            yield format_rows(rows, file_format)
@@ -28,6 +28,8 @@ if settings.all_cors_origins:
         allow_credentials=True,
         allow_methods=["*"],
         allow_headers=["*"],
+        # Read by the frontend to send conditional requests
+        expose_headers=["ETag"],
     )
 
 app.include_router(api_router, prefix=settings.API_V1_STR)
@@ -1,12 +1,18 @@
 import uuid
+from datetime import datetime, timezone
+from typing import Literal
 
 from pydantic import EmailStr
+from sqlalchemy import Column, Computed, DateTime, FetchedValue, Index, text
+from sqlalchemy.dialects.postgresql import TSVECTOR
 from sqlmodel import Field, Relationship, SQLModel
 
+from app.core.config import settings
+
 
 # Shared properties
 class UserBase(SQLModel):
-    email: EmailStr = Field(unique=True, index=True, max_length=255)
+    email: EmailStr = Field(max_length=255)
     is_active: bool = True
     is_superuser: bool = False
     full_name: str | None = Field(default=None, max_length=255)
@@ -39,11 +45,74 @@ class UpdatePassword(SQLModel):
     new_password: str = Field(min_length=8, max_length=40)
 
 
+class UserProvisioningError(SQLModel):
+    line: int
+    detail: str
+
+
+# Outcome of a bulk user provisioning, users with an existing email are
+# skipped and listed in duplicates
+class UserProvisioningReport(SQLModel):
+    created: int = 0
+    duplicates: list[str] = []
+    errors: list[UserProvisioningError] = []
+    seconds: float = 0
+    rows_per_second: float = 0
+
+
 # Database model, database table inferred from class name
 class User(UserBase, table=True):
+    __table_args__ = (
+        # Emails are unique among the users not deleted, the email of a soft
+        # deleted user can be taken again before it's purged
+        Index(
+            "ix_user_email",
+            "email",
+            unique=True,
+            postgresql_where=text("deleted_at IS NULL"),
+        ),
+        # Holds the soft deleted users only, for the purge
+        Index(
+            "ix_user_deleted_at",
+            "deleted_at",
+            postgresql_where=text("deleted_at IS NOT NULL"),
+        ),
+        # Trigram indexes of the user search, they serve ILIKE patterns matching
+        # anywhere in the email or the name (requires the pg_trgm extension)
+        Index(
+            "ix_user_email_trgm",
+            "email",
+            postgresql_using="gin",
+            postgresql_ops={"email": "gin_trgm_ops"},
+        ),
+        Index(
+            "ix_user_full_name_trgm",
+            "full_name",
+            postgresql_using="gin",
+            postgresql_ops={"full_name": "gin_trgm_ops"},
+        ),
+    )
+
     id: uuid.UUID = Field(default_factory=uuid.uuid4, primary_key=True)
     hashed_password: str
-    items: list["Item"] = Relationship(back_populates="owner", cascade_delete=True)
+    # Set when the user is soft deleted, the user is then hidden from the ORM
+    # queries until the purge deletes it
+    deleted_at: datetime | None = Field(default=None, sa_type=DateTime(timezone=True))
+    # Bumped by a trigger on every update of the row, the ETags of the user
+    # are derived from it
+    version: int = Field(
+        default=1,
+        sa_column_kwargs={
+            "server_default": text("1"),
+            "server_onupdate": FetchedValue(),
+        },
+    )
+    # Items are deleted by the ON DELETE CASCADE of their foreign key, in the
+    # same statement as the user, without loading them. The purge of a soft
+    # deleted user deletes its items in batches first
+    items: list["Item"] = Relationship(
+        back_populates="owner", cascade_delete=True, passive_deletes=True
+    )
 
 
 # Properties to return via API, id is always required
@@ -53,7 +122,19 @@ class UserPublic(UserBase):
 
 class UsersPublic(SQLModel):
     data: list[UserPublic]
-    count: int
+    # None when settings.LIST_COUNT_STRATEGY is "none"
+    count: int | None
+    has_more: bool = False
+    # Pass it as `cursor` to get the next page, None on the last page
+    next_cursor: str | None = None
+
+
+# Properties of the authenticated user needed to authorize a request
+class Principal(SQLModel):
+    id: uuid.UUID
+    email: EmailStr
+    is_active: bool
+    is_superuser: bool
 
 
 # Shared properties
@@ -74,13 +155,72 @@ class ItemUpdate(ItemBase):
 
 # Database model, database table inferred from class name
 class Item(ItemBase, table=True):
+    __table_args__ = (
+        # Serves the owner-scoped listings in id order, their counts, and the
+        # deletes by owner, including the cascade from user
+        Index("ix_item_owner_id_id", "owner_id", "id"),
+        # Holds the soft deleted items only, for the purge
+        Index(
+            "ix_item_deleted_at",
+            "deleted_at",
+            postgresql_where=text("deleted_at IS NOT NULL"),
+        ),
+        {"postgresql_partition_by": "HASH (owner_id)"}
+        if settings.ITEM_HASH_PARTITIONS
+        else {},
+    )
+    # Items are identified by their id alone, whatever the primary key
+    __mapper_args__ = {"primary_key": ["id"]}
+
     id: uuid.UUID = Field(default_factory=uuid.uuid4, primary_key=True)
+    # The primary key of a partitioned table includes the partition key
     owner_id: uuid.UUID = Field(
-        foreign_key="user.id", nullable=False, ondelete="CASCADE"
+        foreign_key="user.id",
+        nullable=False,
+        ondelete="CASCADE",
+        primary_key=bool(settings.ITEM_HASH_PARTITIONS),
+    )
+    # Set when the item is soft deleted, the item is then hidden from the ORM
+    # queries until the purge deletes it
+    deleted_at: datetime | None = Field(default=None, sa_type=DateTime(timezone=True))
+    # Bumped by a trigger on every update of the row, like the user version
+    version: int = Field(
+        default=1,
+        sa_column_kwargs={
+            "server_default": text("1"),
+            "server_onupdate": FetchedValue(),
+        },
     )
     owner: User | None = Relationship(back_populates="items")
 
 
+# Text search configuration of the item search document and queries
+item_search_config = "english"
+# Search document of the items, generated by the database from their title
+# and description. It's not a field of the model, so the item reads and
+# writes don't carry it, only the search query uses it
+item_search_vector = Column(
+    "search_vector",
+    TSVECTOR,
+    Computed(
+        f"to_tsvector('{item_search_config}', "
+        "title || ' ' || coalesce(description, ''))",
+        persisted=True,
+    ),
+    nullable=False,
+)
+Item.__table__.append_column(item_search_vector)  # type: ignore[attr-defined]
+Index("ix_item_search_vector", item_search_vector, postgresql_using="gin")
+
+
+# Number of items of each owner, kept up to date by triggers on the item table
+class ItemCount(SQLModel, table=True):
+    owner_id: uuid.UUID = Field(
+        foreign_key="user.id", primary_key=True, ondelete="CASCADE"
+    )
+    count: int = 0
+
+
 # Properties to return via API, id is always required
 class ItemPublic(ItemBase):
     id: uuid.UUID
@@ -89,7 +229,28 @@ class ItemPublic(ItemBase):
 
 class ItemsPublic(SQLModel):
     data: list[ItemPublic]
-    count: int
+    # None when settings.LIST_COUNT_STRATEGY is "none"
+    count: int | None
+    has_more: bool = False
+    # Pass it as `cursor` to get the next page, None on the last page
+    next_cursor: str | None = None
+
+
+# Properties to receive on bulk item update
+class ItemBulkUpdate(ItemUpdate):
+    id: uuid.UUID
+
+
+# Outcome for each item of a bulk request, with the status code and error
+# detail the single item route would have returned
+class ItemBulkResult(SQLModel):
+    id: uuid.UUID
+    status_code: int = 200
+    detail: str | None = None
+
+
+class ItemsBulkResult(SQLModel):
+    data: list[ItemBulkResult]
 
 
 # Generic message
@@ -101,11 +262,41 @@ class Message(SQLModel):
 class Token(SQLModel):
     access_token: str
     token_type: str = "bearer"
+    refresh_token: str | None = None
 
 
 # Contents of JWT token
 class TokenPayload(SQLModel):
     sub: str | None = None
+    type: Literal["access", "refresh"] = "access"
+    jti: str | None = None
+    exp: int | None = None
+    # Authorization claims, only present in short-lived access tokens
+    email: EmailStr | None = None
+    is_active: bool | None = None
+    is_superuser: bool | None = None
+
+
+class RefreshToken(SQLModel):
+    refresh_token: str
+
+
+# Database model, tokens revoked before their expiration, by their jti claim
+class RevokedToken(SQLModel, table=True):
+    jti: str = Field(primary_key=True, max_length=32)
+    expires_at: datetime = Field(sa_type=DateTime(timezone=True), index=True)
+    revoked_at: datetime = Field(
+        default_factory=lambda: datetime.now(timezone.utc),
+        sa_type=DateTime(timezone=True),
+        index=True,
+    )
+
+
+# Database model, token buckets of the database login throttle backend
+class ThrottleBucket(SQLModel, table=True):
+    key: str = Field(primary_key=True, max_length=255)
+    tokens: float
+    updated_at: datetime = Field(sa_type=DateTime(timezone=True))
 
 
 class NewPassword(SQLModel):
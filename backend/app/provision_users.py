@@ -0,0 +1,52 @@
+import argparse
+import logging
+from pathlib import Path
+
+from app.core.config import settings
+from app.models import UserCreate
+from app.provisioning import log_report, provision_users_file, send_new_account_emails
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Create users from a CSV or JSON Lines file of user records"
+    )
+    parser.add_argument("file", type=Path)
+    parser.add_argument(
+        "--format",
+        choices=["csv", "jsonl"],
+        help="Format of the file, guessed from its extension by default",
+    )
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument(
+        "--send-emails", action="store_true", help="Email the new account details"
+    )
+    args = parser.parse_args()
+
+    file_format = args.format
+    if not file_format:
+        file_format = "jsonl" if args.file.suffix in (".jsonl", ".ndjson") else "csv"
+    send_emails = args.send_emails and settings.emails_enabled
+    if args.send_emails and not send_emails:
+        logger.warning("Emails are not configured, no email will be sent")
+
+    def on_created(users: list[UserCreate]) -> None:
+        logger.info(f"Created {len(users)} users")
+        if send_emails:
+            send_new_account_emails(users)
+
+    logger.info(f"Provisioning users from {args.file}")
+    report = provision_users_file(
+        args.file,
+        file_format,
+        batch_size=args.batch_size,
+        on_created=on_created,
+    )
+    log_report(report)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,229 @@
+import csv
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from collections.abc import Callable, Iterable, Iterator
+from itertools import islice
+from pathlib import Path
+from typing import Any, Literal
+
+from pydantic import ValidationError
+from sqlmodel import Session
+
+from app.core.db import engine
+from app.core.hashing import PasswordHasher
+from app.models import UserCreate, UserProvisioningError, UserProvisioningReport
+from app.utils import generate_new_account_email, send_email
+
+logger = logging.getLogger(__name__)
+
+FileFormat = Literal["csv", "jsonl"]
+
+copy_columns = "id, email, is_active, is_superuser, full_name, hashed_password"
+
+
+def read_records(
+    file: Iterable[str], file_format: FileFormat
+) -> Iterator[tuple[int, dict[str, Any] | str]]:
+    """
+    Line number and record of each row of the file, or the error message of
+    the rows that can't be parsed. The lines must keep their line endings.
+    """
+    if file_format == "csv":
+        reader = csv.DictReader(file)
+        for row in reader:
+            # Empty cells are missing values, not empty strings
+            yield reader.line_num, {k: v for k, v in row.items() if k and v}
+        return
+    for line_num, line in enumerate(file, start=1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except json.JSONDecodeError as e:
+            yield line_num, f"Invalid JSON: {e.msg}"
+            continue
+        if not isinstance(record, dict):
+            yield line_num, "Invalid JSON: expected an object"
+            continue
+        yield line_num, record
+
+
+def validation_detail(e: ValidationError) -> str:
+    return "; ".join(
+        f"{'.'.join(str(loc) for loc in error['loc'])}: {error['msg']}"
+        for error in e.errors()
+    )
+
+
+def copy_users(session: Session, rows: list[tuple[Any, ...]]) -> set[str]:
+    """
+    Insert the rows with COPY, skipping the emails already taken, returns the
+    emails of the created users.
+    """
+    # COPY can't skip conflicting rows, so it fills a temporary table that is
+    # then inserted with ON CONFLICT
+    connection = session.connection().connection.driver_connection
+    assert connection
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "CREATE TEMP TABLE IF NOT EXISTS user_import "
+            '(LIKE "user" INCLUDING DEFAULTS) ON COMMIT DELETE ROWS'
+        )
+        with cursor.copy(f"COPY user_import ({copy_columns}) FROM STDIN") as copy:
+            for row in rows:
+                copy.write_row(row)
+        cursor.execute(
+            f'INSERT INTO "user" ({copy_columns}) '
+            f"SELECT {copy_columns} FROM user_import "
+            "ON CONFLICT (email) WHERE deleted_at IS NULL DO NOTHING "
+            "RETURNING email"
+        )
+        return {email for (email,) in cursor.fetchall()}
+
+
+def send_new_account_emails(users: list[UserCreate]) -> None:
+    for user in users:
+        email_data = generate_new_account_email(
+            email_to=user.email, username=user.email, password=user.password
+        )
+        send_email(
+            email_to=user.email,
+            subject=email_data.subject,
+            html_content=email_data.html_content,
+        )
+
+
+def provision_users(
+    *,
+    session: Session,
+    file: Iterable[str],
+    file_format: FileFormat,
+    hasher: PasswordHasher,
+    batch_size: int = 1000,
+    on_created: Callable[[list[UserCreate]], None] | None = None,
+) -> UserProvisioningReport:
+    """
+    Create the users of a CSV or JSON Lines file of UserCreate records.
+
+    Records are processed and committed in batches, the passwords of a batch
+    are hashed in parallel on `hasher`. `on_created` is called with the users
+    created by each batch.
+    """
+    report = UserProvisioningReport()
+    start = time.perf_counter()
+    rows_read = 0
+    records = read_records(file, file_format)
+    while batch := list(islice(records, batch_size)):
+        rows_read += len(batch)
+        users_in = []
+        for line, record in batch:
+            if isinstance(record, str):
+                report.errors.append(UserProvisioningError(line=line, detail=record))
+                continue
+            try:
+                users_in.append(UserCreate.model_validate(record))
+            except ValidationError as e:
+                report.errors.append(
+                    UserProvisioningError(line=line, detail=validation_detail(e))
+                )
+        if not users_in:
+            continue
+        hashed_passwords = hasher.hash_many([user.password for user in users_in])
+        rows = [
+            (
+                uuid.uuid4(),
+                user.email,
+                user.is_active,
+                user.is_superuser,
+                user.full_name,
+                hashed_password,
+            )
+            for user, hashed_password in zip(users_in, hashed_passwords, strict=True)
+        ]
+        created_emails = copy_users(session, rows)
+        session.commit()
+        created = []
+        for user in users_in:
+            if user.email in created_emails:
+                created.append(user)
+                # A later duplicate within the file is reported as such
+                created_emails.discard(user.email)
+            else:
+                report.duplicates.append(user.email)
+        report.created += len(created)
+        if on_created and created:
+            on_created(created)
+    report.seconds = time.perf_counter() - start
+    if report.seconds:
+        report.rows_per_second = rows_read / report.seconds
+    return report
+
+
+def provision_users_file(
+    path: Path,
+    file_format: FileFormat,
+    *,
+    batch_size: int = 1000,
+    on_created: Callable[[list[UserCreate]], None] | None = None,
+) -> UserProvisioningReport:
+    """
+    Create the users of a file with a session and a hashing pool of its own.
+
+    The pool has a process per CPU for the duration of the job, the hashing
+    pool of the logins is left alone so they aren't queued behind the file.
+    """
+    provisioning_hasher = PasswordHasher(os.cpu_count() or 1)
+    try:
+        with (
+            path.open(newline="", encoding="utf-8") as file,
+            Session(engine) as session,
+        ):
+            return provision_users(
+                session=session,
+                file=file,
+                file_format=file_format,
+                hasher=provisioning_hasher,
+                batch_size=batch_size,
+                on_created=on_created,
+            )
+    finally:
+        provisioning_hasher.shutdown()
+
+
+def log_report(report: UserProvisioningReport) -> None:
+    for error in report.errors:
+        logger.error(f"Line {error.line}: {error.detail}")
+    logger.info(
+        f"{report.created} users created, {len(report.duplicates)} duplicates, "
+        f"{len(report.errors)} errors in {report.seconds:.1f}s "
+        f"({report.rows_per_second:.0f} rows/s)"
+    )
+
+
+# Held by the upload being provisioned, each of them takes all the CPUs
+upload_lock = threading.Lock()
+
+
+def provision_uploaded_users(
+    path: Path, file_format: FileFormat, *, send_emails: bool
+) -> None:
+    """
+    Background task of an upload, `upload_lock` is released and the uploaded
+    file removed once it is done.
+    """
+    try:
+        report = provision_users_file(
+            path,
+            file_format,
+            on_created=send_new_account_emails if send_emails else None,
+        )
+        log_report(report)
+    except Exception:
+        logger.exception(f"Provisioning users from {path} failed")
+    finally:
+        path.unlink(missing_ok=True)
+        upload_lock.release()
@@ -0,0 +1,45 @@
+import argparse
+import logging
+import time
+
+from sqlmodel import Session
+
+from app import crud
+from app.core.config import settings
+from app.core.db import engine
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Delete the soft deleted users and items for good"
+    )
+    parser.add_argument("--batch-size", type=int, default=settings.PURGE_BATCH_SIZE)
+    parser.add_argument(
+        "--once", action="store_true", help="Exit when there is nothing left to purge"
+    )
+    args = parser.parse_args()
+
+    logger.info("Purging soft deleted users and items")
+    purged = 0
+    while True:
+        with Session(engine) as session:
+            count = crud.purge_deleted(session=session, limit=args.batch_size)
+        if count:
+            purged += count
+            # Small batches paced apart keep the locks short, and let vacuum
+            # and the replicas keep up with the deletes
+            time.sleep(settings.PURGE_BATCH_DELAY_SECONDS)
+            continue
+        if purged:
+            logger.info(f"Purged {purged} rows")
+            purged = 0
+        if args.once:
+            break
+        time.sleep(settings.PURGE_IDLE_SECONDS)
+
+
+if __name__ == "__main__":
+    main()
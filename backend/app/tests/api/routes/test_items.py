@@ -1,10 +1,19 @@
+import csv
+import io
+import json
 import uuid
+from typing import Any
+from unittest.mock import patch
 
 from fastapi.testclient import TestClient
-from sqlmodel import Session
+from sqlmodel import Session, select
 
+from app import crud
 from app.core.config import settings
+from app.models import Item
 from app.tests.utils.item import create_random_item
+from app.tests.utils.utils import random_lower_string
+from app.utils import encode_cursor
 
 
 def test_create_item(
@@ -79,6 +88,206 @@ def test_read_items(
     assert len(content["data"]) >= 2
 
 
+def test_read_items_cursor(
+    client: TestClient, superuser_token_headers: dict[str, str], db: Session
+) -> None:
+    for _ in range(3):
+        create_random_item(db)
+    response = client.get(
+        f"{settings.API_V1_STR}/items/",
+        headers=superuser_token_headers,
+        params={"limit": 2},
+    )
+    assert response.status_code == 200
+    first_page = response.json()
+    assert len(first_page["data"]) == 2
+    assert first_page["next_cursor"]
+    response = client.get(
+        f"{settings.API_V1_STR}/items/",
+        headers=superuser_token_headers,
+        params={"limit": 2, "cursor": first_page["next_cursor"]},
+    )
+    assert response.status_code == 200
+    second_page = response.json()
+    assert second_page["data"]
+    # Same pages as with skip, keyset pages follow the same order
+    response = client.get(
+        f"{settings.API_V1_STR}/items/",
+        headers=superuser_token_headers,
+        params={"limit": 2, "skip": 2},
+    )
+    assert response.json()["data"] == second_page["data"]
+    first_ids = {item["id"] for item in first_page["data"]}
+    assert not first_ids & {item["id"] for item in second_page["data"]}
+
+
+def test_read_items_count_strategies(
+    client: TestClient,
+    superuser_token_headers: dict[str, str],
+    normal_user_token_headers: dict[str, str],
+) -> None:
+    url = f"{settings.API_V1_STR}/items/"
+    ids = []
+    for _ in range(3):
+        data = {"title": "Foo", "description": "Fighters"}
+        response = client.post(url, headers=normal_user_token_headers, json=data)
+        ids.append(response.json()["id"])
+    client.delete(f"{url}{ids[0]}", headers=normal_user_token_headers)
+
+    def count(headers: dict[str, str], strategy: str) -> Any:
+        with patch.object(settings, "LIST_COUNT_STRATEGY", strategy):
+            response = client.get(url, headers=headers, params={"limit": 1})
+        assert response.status_code == 200
+        content = response.json()
+        assert content["has_more"] is (content["next_cursor"] is not None)
+        return content["count"]
+
+    exact = count(normal_user_token_headers, "exact")
+    assert exact >= 2
+    assert count(normal_user_token_headers, "counter") == exact
+    assert count(normal_user_token_headers, "estimated") == exact
+    assert count(normal_user_token_headers, "none") is None
+
+    exact = count(superuser_token_headers, "exact")
+    assert count(superuser_token_headers, "counter") == exact
+    assert count(superuser_token_headers, "estimated") >= 0
+    assert count(superuser_token_headers, "none") is None
+
+
+def test_read_items_invalid_cursor(
+    client: TestClient, superuser_token_headers: dict[str, str]
+) -> None:
+    response = client.get(
+        f"{settings.API_V1_STR}/items/",
+        headers=superuser_token_headers,
+        params={"cursor": "not a cursor"},
+    )
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Invalid cursor"
+
+
+def test_read_items_etag(
+    client: TestClient, normal_user_token_headers: dict[str, str]
+) -> None:
+    url = f"{settings.API_V1_STR}/items/"
+    response = client.get(url, headers=normal_user_token_headers)
+    assert response.status_code == 200
+    etag = response.headers["ETag"]
+    headers = {**normal_user_token_headers, "If-None-Match": etag}
+    response = client.get(url, headers=headers)
+    assert response.status_code == 304
+
+    response = client.post(
+        url, headers=normal_user_token_headers, json={"title": "Foo"}
+    )
+    assert response.status_code == 200
+    response = client.get(url, headers=headers)
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
+
+
+def test_export_items(
+    client: TestClient,
+    superuser_token_headers: dict[str, str],
+    normal_user_token_headers: dict[str, str],
+    db: Session,
+) -> None:
+    url = f"{settings.API_V1_STR}/items/"
+    data = {"title": "Foo", "description": "Fighters"}
+    response = client.post(url, headers=normal_user_token_headers, json=data)
+    own_item = response.json()
+    other_item = create_random_item(db)
+
+    response = client.get(f"{url}export", headers=normal_user_token_headers)
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/x-ndjson"
+    items = [json.loads(line) for line in response.text.splitlines()]
+    assert own_item in items
+    # Same ownership rules as the listing
+    assert {item["owner_id"] for item in items} == {own_item["owner_id"]}
+    ids = [item["id"] for item in items]
+    assert ids == sorted(ids)
+
+    response = client.get(
+        f"{url}export",
+        headers=superuser_token_headers,
+        params={"file_format": "csv"},
+    )
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/csv")
+    rows = list(csv.DictReader(io.StringIO(response.text)))
+    assert {"id", "title", "description", "owner_id"} == set(rows[0])
+    assert str(other_item.id) in {row["id"] for row in rows}
+    assert own_item["id"] in {row["id"] for row in rows}
+
+
+def test_search_items(
+    client: TestClient,
+    superuser_token_headers: dict[str, str],
+    normal_user_token_headers: dict[str, str],
+    db: Session,
+) -> None:
+    url = f"{settings.API_V1_STR}/items/"
+    word = random_lower_string()
+    for data in [
+        {"title": f"{word} {word}", "description": word},
+        {"title": word, "description": "Fighters"},
+        {"title": "Foo", "description": f"{word} fighters"},
+    ]:
+        response = client.post(url, headers=normal_user_token_headers, json=data)
+        assert response.status_code == 200
+    other_item = create_random_item(db)
+    other_item.title = word
+    db.add(other_item)
+    db.commit()
+
+    response = client.get(
+        f"{url}search", headers=normal_user_token_headers, params={"q": word}
+    )
+    assert response.status_code == 200
+    content = response.json()
+    # Same ownership rules as the listing, best matches first
+    titles = [item["title"] for item in content["data"]]
+    assert titles[0] == f"{word} {word}"
+    assert sorted(titles[1:]) == sorted([word, "Foo"])
+    assert content["count"] is None
+    assert not content["has_more"]
+
+    response = client.get(
+        f"{url}search", headers=superuser_token_headers, params={"q": word}
+    )
+    assert len(response.json()["data"]) == 4
+
+    titles = []
+    cursor = None
+    while True:
+        params: dict[str, Any] = {"q": f"{word} -fighters", "limit": 1}
+        if cursor:
+            params["cursor"] = cursor
+        response = client.get(
+            f"{url}search", headers=superuser_token_headers, params=params
+        )
+        assert response.status_code == 200
+        page = response.json()
+        titles += [item["title"] for item in page["data"]]
+        cursor = page["next_cursor"]
+        if not cursor:
+            break
+    assert sorted(titles) == sorted([f"{word} {word}", word])
+
+
+def test_search_items_invalid_cursor(
+    client: TestClient, superuser_token_headers: dict[str, str]
+) -> None:
+    response = client.get(
+        f"{settings.API_V1_STR}/items/search",
+        headers=superuser_token_headers,
+        params={"q": "foo", "cursor": encode_cursor(uuid.uuid4())},
+    )
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Invalid cursor"
+
+
 def test_update_item(
     client: TestClient, superuser_token_headers: dict[str, str], db: Session
 ) -> None:
@@ -126,6 +335,57 @@ def test_update_item_not_enough_permissions(
     assert content["detail"] == "Not enough permissions"
 
 
+def test_read_item_etag(
+    client: TestClient, superuser_token_headers: dict[str, str], db: Session
+) -> None:
+    item = create_random_item(db)
+    url = f"{settings.API_V1_STR}/items/{item.id}"
+    response = client.get(url, headers=superuser_token_headers)
+    assert response.status_code == 200
+    etag = response.headers["ETag"]
+
+    headers = {**superuser_token_headers, "If-None-Match": etag}
+    response = client.get(url, headers=headers)
+    assert response.status_code == 304
+    assert response.headers["ETag"] == etag
+    assert not response.content
+
+    response = client.put(url, headers=superuser_token_headers, json={"title": "Foo"})
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
+    response = client.get(url, headers=headers)
+    assert response.status_code == 200
+    assert response.json()["title"] == "Foo"
+
+
+def test_update_item_if_match(
+    client: TestClient, superuser_token_headers: dict[str, str], db: Session
+) -> None:
+    item = create_random_item(db)
+    url = f"{settings.API_V1_STR}/items/{item.id}"
+    etag = client.get(url, headers=superuser_token_headers).headers["ETag"]
+    headers = {**superuser_token_headers, "If-Match": etag}
+
+    response = client.put(url, headers=headers, json={"title": "Foo"})
+    assert response.status_code == 200
+    assert response.json()["title"] == "Foo"
+    new_etag = client.get(url, headers=superuser_token_headers).headers["ETag"]
+    assert response.headers["ETag"] == new_etag
+    # The ETag is now stale
+    response = client.put(url, headers=headers, json={"title": "Bar"})
+    assert response.status_code == 412
+    assert response.json()["detail"] == "Item was modified"
+    # If-Match only matches strong ETags
+    etag = client.get(url, headers=superuser_token_headers).headers["ETag"]
+    headers["If-Match"] = f"W/{etag}"
+    response = client.put(url, headers=headers, json={"title": "Bar"})
+    assert response.status_code == 412
+    headers["If-Match"] = "*"
+    response = client.put(url, headers=headers, json={"title": "Bar"})
+    assert response.status_code == 200
+    assert response.json()["title"] == "Bar"
+
+
 def test_delete_item(
     client: TestClient, superuser_token_headers: dict[str, str], db: Session
 ) -> None:
@@ -139,6 +399,93 @@ def test_delete_item(
     assert content["message"] == "Item deleted successfully"
 
 
+def test_delete_item_soft(
+    client: TestClient, superuser_token_headers: dict[str, str], db: Session
+) -> None:
+    item = create_random_item(db)
+    url = f"{settings.API_V1_STR}/items/{item.id}"
+    with patch.object(settings, "SOFT_DELETE", True):
+        response = client.delete(url, headers=superuser_token_headers)
+        assert response.status_code == 200
+        response = client.delete(url, headers=superuser_token_headers)
+        assert response.status_code == 404
+    response = client.get(url, headers=superuser_token_headers)
+    assert response.status_code == 404
+    statement = (
+        select(Item.deleted_at)
+        .where(Item.id == item.id)
+        .execution_options(include_deleted=True)
+    )
+    assert db.exec(statement).one()
+
+    while crud.purge_deleted(session=db, limit=10):
+        pass
+    assert db.exec(statement).first() is None
+
+
+def create_soft_deleted_owner_item(db: Session) -> Item:
+    item = create_random_item(db)
+    with patch.object(settings, "SOFT_DELETE", True):
+        assert crud.delete_user(session=db, user_id=item.owner_id)
+    return item
+
+
+def test_read_item_soft_deleted_owner(
+    client: TestClient, superuser_token_headers: dict[str, str], db: Session
+) -> None:
+    item = create_soft_deleted_owner_item(db)
+    response = client.get(
+        f"{settings.API_V1_STR}/items/{item.id}", headers=superuser_token_headers
+    )
+    assert response.status_code == 404
+
+
+def test_search_items_soft_deleted_owner(
+    client: TestClient, superuser_token_headers: dict[str, str], db: Session
+) -> None:
+    item = create_soft_deleted_owner_item(db)
+    response = client.get(
+        f"{settings.API_V1_STR}/items/search",
+        headers=superuser_token_headers,
+        params={"q": item.title},
+    )
+    assert response.status_code == 200
+    assert response.json()["data"] == []
+
+
+def test_export_items_soft_deleted_owner(
+    client: TestClient, superuser_token_headers: dict[str, str], db: Session
+) -> None:
+    item = create_soft_deleted_owner_item(db)
+    response = client.get(
+        f"{settings.API_V1_STR}/items/export", headers=superuser_token_headers
+    )
+    assert response.status_code == 200
+    ids = {json.loads(line)["id"] for line in response.text.splitlines()}
+    assert str(item.id) not in ids
+
+
+def test_read_items_count_soft_deleted_owner(
+    client: TestClient, superuser_token_headers: dict[str, str], db: Session
+) -> None:
+    def count(strategy: str) -> Any:
+        with patch.object(settings, "LIST_COUNT_STRATEGY", strategy):
+            response = client.get(
+                f"{settings.API_V1_STR}/items/",
+                headers=superuser_token_headers,
+                params={"limit": 1},
+            )
+        assert response.status_code == 200
+        return response.json()["count"]
+
+    create_random_item(db)
+    exact = count("exact")
+    assert count("counter") == exact
+    create_soft_deleted_owner_item(db)
+    assert count("exact") == exact
+    assert count("counter") == exact
+
+
 def test_delete_item_not_found(
     client: TestClient, superuser_token_headers: dict[str, str]
 ) -> None:
@@ -162,3 +509,68 @@ def test_delete_item_not_enough_permissions(
     assert response.status_code == 400
     content = response.json()
     assert content["detail"] == "Not enough permissions"
+
+
+def test_bulk_items(
+    client: TestClient, normal_user_token_headers: dict[str, str], db: Session
+) -> None:
+    url = f"{settings.API_V1_STR}/items/bulk"
+    data = [{"title": f"Item {i}", "description": "Bulk"} for i in range(3)]
+    response = client.post(url, headers=normal_user_token_headers, json=data)
+    assert response.status_code == 200
+    created = response.json()["data"]
+    assert [result["status_code"] for result in created] == [200, 200, 200]
+    ids = [result["id"] for result in created]
+    other_item = create_random_item(db)
+    missing_id = str(uuid.uuid4())
+
+    data = [
+        {"id": ids[0], "title": "Updated"},
+        {"id": ids[1], "description": "Updated"},
+        {"id": str(other_item.id), "title": "Updated"},
+        {"id": missing_id, "title": "Updated"},
+    ]
+    response = client.put(url, headers=normal_user_token_headers, json=data)
+    assert response.status_code == 200
+    results = response.json()["data"]
+    assert [result["status_code"] for result in results] == [200, 200, 400, 404]
+    assert results[2]["detail"] == "Not enough permissions"
+    assert results[3]["detail"] == "Item not found"
+    response = client.get(
+        f"{settings.API_V1_STR}/items/{ids[0]}", headers=normal_user_token_headers
+    )
+    assert response.json()["title"] == "Updated"
+    assert response.json()["description"] == "Bulk"
+    response = client.get(
+        f"{settings.API_V1_STR}/items/{ids[1]}", headers=normal_user_token_headers
+    )
+    assert response.json()["title"] == "Item 1"
+    assert response.json()["description"] == "Updated"
+
+    delete_ids = [ids[0], ids[1], str(other_item.id), missing_id]
+    response = client.request(
+        "DELETE", url, headers=normal_user_token_headers, json=delete_ids
+    )
+    assert response.status_code == 200
+    results = response.json()["data"]
+    assert [result["status_code"] for result in results] == [200, 200, 400, 404]
+    response = client.get(
+        f"{settings.API_V1_STR}/items/{ids[0]}", headers=normal_user_token_headers
+    )
+    assert response.status_code == 404
+    response = client.get(
+        f"{settings.API_V1_STR}/items/{ids[2]}", headers=normal_user_token_headers
+    )
+    assert response.status_code == 200
+
+
+def test_bulk_items_too_many(
+    client: TestClient, normal_user_token_headers: dict[str, str]
+) -> None:
+    data = [{"title": "Foo"}] * (settings.ITEMS_BULK_MAX_SIZE + 1)
+    response = client.post(
+        f"{settings.API_V1_STR}/items/bulk",
+        headers=normal_user_token_headers,
+        json=data,
+    )
+    assert response.status_code == 422
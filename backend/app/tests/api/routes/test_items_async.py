@@ -0,0 +1,259 @@
+import csv
+import io
+import json
+import uuid
+from collections.abc import Generator
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlmodel import Session
+
+from app.api.routes import items_async
+from app.core.config import settings
+from app.tests.utils.item import create_random_item
+
+
+@pytest.fixture(scope="module")
+def async_client() -> Generator[TestClient, None, None]:
+    app = FastAPI()
+    app.include_router(items_async.router, prefix=settings.API_V1_STR)
+    with TestClient(app) as c:
+        yield c
+
+
+def test_create_item(
+    async_client: TestClient, superuser_token_headers: dict[str, str]
+) -> None:
+    data = {"title": "Foo", "description": "Fighters"}
+    response = async_client.post(
+        f"{settings.API_V1_STR}/items/",
+        headers=superuser_token_headers,
+        json=data,
+    )
+    assert response.status_code == 200
+    content = response.json()
+    assert content["title"] == data["title"]
+    assert content["description"] == data["description"]
+    assert "id" in content
+    assert "owner_id" in content
+
+
+def test_read_item(
+    async_client: TestClient, superuser_token_headers: dict[str, str], db: Session
+) -> None:
+    item = create_random_item(db)
+    response = async_client.get(
+        f"{settings.API_V1_STR}/items/{item.id}",
+        headers=superuser_token_headers,
+    )
+    assert response.status_code == 200
+    content = response.json()
+    assert content["title"] == item.title
+    assert content["id"] == str(item.id)
+
+
+def test_read_item_not_enough_permissions(
+    async_client: TestClient, normal_user_token_headers: dict[str, str], db: Session
+) -> None:
+    item = create_random_item(db)
+    response = async_client.get(
+        f"{settings.API_V1_STR}/items/{item.id}",
+        headers=normal_user_token_headers,
+    )
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Not enough permissions"
+
+
+def test_read_items(
+    async_client: TestClient, superuser_token_headers: dict[str, str], db: Session
+) -> None:
+    create_random_item(db)
+    create_random_item(db)
+    response = async_client.get(
+        f"{settings.API_V1_STR}/items/",
+        headers=superuser_token_headers,
+    )
+    assert response.status_code == 200
+    content = response.json()
+    assert len(content["data"]) >= 2
+
+
+def test_export_items(
+    async_client: TestClient, superuser_token_headers: dict[str, str], db: Session
+) -> None:
+    item = create_random_item(db)
+    response = async_client.get(
+        f"{settings.API_V1_STR}/items/export",
+        headers=superuser_token_headers,
+        params={"file_format": "csv"},
+    )
+    assert response.status_code == 200
+    rows = list(csv.DictReader(io.StringIO(response.text)))
+    assert str(item.id) in {row["id"] for row in rows}
+    response = async_client.get(
+        f"{settings.API_V1_STR}/items/export", headers=superuser_token_headers
+    )
+    assert response.status_code == 200
+    items = [json.loads(line) for line in response.text.splitlines()]
+    assert str(item.id) in {item["id"] for item in items}
+
+
+def test_search_items(
+    async_client: TestClient, superuser_token_headers: dict[str, str], db: Session
+) -> None:
+    item = create_random_item(db)
+    response = async_client.get(
+        f"{settings.API_V1_STR}/items/search",
+        headers=superuser_token_headers,
+        params={"q": item.title, "limit": 1},
+    )
+    assert response.status_code == 200
+    content = response.json()
+    assert [found["id"] for found in content["data"]] == [str(item.id)]
+    assert not content["has_more"]
+
+
+def test_update_item(
+    async_client: TestClient, superuser_token_headers: dict[str, str], db: Session
+) -> None:
+    item = create_random_item(db)
+    data = {"title": "Updated title", "description": "Updated description"}
+    response = async_client.put(
+        f"{settings.API_V1_STR}/items/{item.id}",
+        headers=superuser_token_headers,
+        json=data,
+    )
+    assert response.status_code == 200
+    content = response.json()
+    assert content["title"] == data["title"]
+    assert content["description"] == data["description"]
+
+
+def test_read_item_etag(
+    async_client: TestClient, superuser_token_headers: dict[str, str], db: Session
+) -> None:
+    item = create_random_item(db)
+    url = f"{settings.API_V1_STR}/items/{item.id}"
+    response = async_client.get(url, headers=superuser_token_headers)
+    assert response.status_code == 200
+    etag = response.headers["ETag"]
+
+    headers = {**superuser_token_headers, "If-None-Match": etag}
+    response = async_client.get(url, headers=headers)
+    assert response.status_code == 304
+    assert response.headers["ETag"] == etag
+    assert not response.content
+
+    response = async_client.put(
+        url, headers=superuser_token_headers, json={"title": "Foo"}
+    )
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
+    response = async_client.get(url, headers=headers)
+    assert response.status_code == 200
+    assert response.json()["title"] == "Foo"
+
+
+def test_update_item_if_match(
+    async_client: TestClient, superuser_token_headers: dict[str, str], db: Session
+) -> None:
+    item = create_random_item(db)
+    url = f"{settings.API_V1_STR}/items/{item.id}"
+    etag = async_client.get(url, headers=superuser_token_headers).headers["ETag"]
+    headers = {**superuser_token_headers, "If-Match": etag}
+
+    response = async_client.put(url, headers=headers, json={"title": "Foo"})
+    assert response.status_code == 200
+    assert response.json()["title"] == "Foo"
+    new_etag = async_client.get(url, headers=superuser_token_headers).headers["ETag"]
+    assert response.headers["ETag"] == new_etag
+    # The ETag is now stale
+    response = async_client.put(url, headers=headers, json={"title": "Bar"})
+    assert response.status_code == 412
+    assert response.json()["detail"] == "Item was modified"
+    # If-Match only matches strong ETags
+    etag = async_client.get(url, headers=superuser_token_headers).headers["ETag"]
+    headers["If-Match"] = f"W/{etag}"
+    response = async_client.put(url, headers=headers, json={"title": "Bar"})
+    assert response.status_code == 412
+    headers["If-Match"] = "*"
+    response = async_client.put(url, headers=headers, json={"title": "Bar"})
+    assert response.status_code == 200
+    assert response.json()["title"] == "Bar"
+
+
+def test_delete_item(
+    async_client: TestClient, superuser_token_headers: dict[str, str], db: Session
+) -> None:
+    item = create_random_item(db)
+    response = async_client.delete(
+        f"{settings.API_V1_STR}/items/{item.id}",
+        headers=superuser_token_headers,
+    )
+    assert response.status_code == 200
+    assert response.json()["message"] == "Item deleted successfully"
+
+
+def test_delete_item_not_found(
+    async_client: TestClient, superuser_token_headers: dict[str, str]
+) -> None:
+    response = async_client.delete(
+        f"{settings.API_V1_STR}/items/{uuid.uuid4()}",
+        headers=superuser_token_headers,
+    )
+    assert response.status_code == 404
+    assert response.json()["detail"] == "Item not found"
+
+
+def test_bulk_items(
+    async_client: TestClient, normal_user_token_headers: dict[str, str], db: Session
+) -> None:
+    url = f"{settings.API_V1_STR}/items/bulk"
+    data = [{"title": f"Item {i}", "description": "Bulk"} for i in range(3)]
+    response = async_client.post(url, headers=normal_user_token_headers, json=data)
+    assert response.status_code == 200
+    created = response.json()["data"]
+    assert [result["status_code"] for result in created] == [200, 200, 200]
+    ids = [result["id"] for result in created]
+    other_item = create_random_item(db)
+    missing_id = str(uuid.uuid4())
+
+    data = [
+        {"id": ids[0], "title": "Updated"},
+        {"id": ids[1], "description": "Updated"},
+        {"id": str(other_item.id), "title": "Updated"},
+        {"id": missing_id, "title": "Updated"},
+    ]
+    response = async_client.put(url, headers=normal_user_token_headers, json=data)
+    assert response.status_code == 200
+    results = response.json()["data"]
+    assert [result["status_code"] for result in results] == [200, 200, 400, 404]
+    assert results[2]["detail"] == "Not enough permissions"
+    assert results[3]["detail"] == "Item not found"
+    response = async_client.get(
+        f"{settings.API_V1_STR}/items/{ids[0]}", headers=normal_user_token_headers
+    )
+    assert response.json()["title"] == "Updated"
+    assert response.json()["description"] == "Bulk"
+    response = async_client.get(
+        f"{settings.API_V1_STR}/items/{ids[1]}", headers=normal_user_token_headers
+    )
+    assert response.json()["title"] == "Item 1"
+    assert response.json()["description"] == "Updated"
+
+    delete_ids = [ids[0], ids[1], str(other_item.id), missing_id]
+    response = async_client.request(
+        "DELETE", url, headers=normal_user_token_headers, json=delete_ids
+    )
+    assert response.status_code == 200
+    results = response.json()["data"]
+    assert [result["status_code"] for result in results] == [200, 200, 400, 404]
+    response = async_client.get(
+        f"{settings.API_V1_STR}/items/{ids[0]}", headers=normal_user_token_headers
+    )
+    assert response.status_code == 404
+    response = async_client.get(
+        f"{settings.API_V1_STR}/items/{ids[2]}", headers=normal_user_token_headers
+    )
+    assert response.status_code == 200
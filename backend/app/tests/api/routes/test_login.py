@@ -4,7 +4,9 @@ from fastapi.testclient import TestClient
 from sqlmodel import Session
 
 from app.core.config import settings
+from app.core.hashing import build_pwd_context, hasher
 from app.core.security import verify_password
+from app.core.throttle import LoginThrottle, MemoryThrottleBackend
 from app.crud import create_user
 from app.models import UserCreate
 from app.tests.utils.user import user_authentication_headers
@@ -33,6 +35,182 @@ def test_get_access_token_incorrect_password(client: TestClient) -> None:
     assert r.status_code == 400
 
 
+def test_get_access_token_rehashes_outdated_hash(
+    client: TestClient, db: Session
+) -> None:
+    email = random_email()
+    password = random_lower_string()
+    user = create_user(
+        session=db, user_create=UserCreate(email=email, password=password)
+    )
+    assert user
+    outdated_hash = build_pwd_context(bcrypt_rounds=4).hash(password)
+    user.hashed_password = outdated_hash
+    db.add(user)
+    db.commit()
+    login_data = {"username": email, "password": password}
+    r = client.post(f"{settings.API_V1_STR}/login/access-token", data=login_data)
+    assert r.status_code == 200
+    db.refresh(user)
+    assert user.hashed_password != outdated_hash
+    assert verify_password(password, user.hashed_password)
+
+
+def test_get_access_token_rehashes_to_argon2(client: TestClient, db: Session) -> None:
+    email = random_email()
+    password = random_lower_string()
+    user = create_user(
+        session=db, user_create=UserCreate(email=email, password=password)
+    )
+    assert user
+    assert user.hashed_password.startswith("$2b$")
+    # The pool's worker processes build their context at import, hash inline
+    # so the patched argon2 context is the one used
+    with (
+        patch.object(hasher, "max_workers", 0),
+        patch("app.core.hashing.pwd_context", build_pwd_context(scheme="argon2")),
+    ):
+        login_data = {"username": email, "password": password}
+        r = client.post(f"{settings.API_V1_STR}/login/access-token", data=login_data)
+    assert r.status_code == 200
+    db.refresh(user)
+    assert user.hashed_password.startswith("$argon2id$")
+    assert verify_password(password, user.hashed_password)
+
+
+def test_get_access_token_with_claims(client: TestClient) -> None:
+    login_data = {
+        "username": settings.FIRST_SUPERUSER,
+        "password": settings.FIRST_SUPERUSER_PASSWORD,
+    }
+    with patch("app.core.config.settings.ACCESS_TOKEN_CLAIMS", True):
+        r = client.post(f"{settings.API_V1_STR}/login/access-token", data=login_data)
+    tokens = r.json()
+    assert r.status_code == 200
+    assert tokens["refresh_token"]
+    headers = {"Authorization": f"Bearer {tokens['access_token']}"}
+    r = client.get(f"{settings.API_V1_STR}/users/", headers=headers)
+    assert r.status_code == 200
+
+
+def test_refresh_access_token(client: TestClient) -> None:
+    login_data = {
+        "username": settings.FIRST_SUPERUSER,
+        "password": settings.FIRST_SUPERUSER_PASSWORD,
+    }
+    with patch("app.core.config.settings.ACCESS_TOKEN_CLAIMS", True):
+        r = client.post(f"{settings.API_V1_STR}/login/access-token", data=login_data)
+        refresh_token = r.json()["refresh_token"]
+        r = client.post(
+            f"{settings.API_V1_STR}/login/refresh-token",
+            json={"refresh_token": refresh_token},
+        )
+    tokens = r.json()
+    assert r.status_code == 200
+    assert tokens["refresh_token"]
+    assert tokens["refresh_token"] != refresh_token
+    headers = {"Authorization": f"Bearer {tokens['access_token']}"}
+    r = client.post(f"{settings.API_V1_STR}/login/test-token", headers=headers)
+    assert r.status_code == 200
+    assert r.json()["email"] == settings.FIRST_SUPERUSER
+
+
+def test_refresh_access_token_with_access_token(
+    client: TestClient, superuser_token_headers: dict[str, str]
+) -> None:
+    access_token = superuser_token_headers["Authorization"].removeprefix("Bearer ")
+    r = client.post(
+        f"{settings.API_V1_STR}/login/refresh-token",
+        json={"refresh_token": access_token},
+    )
+    assert r.status_code == 403
+
+
+def test_use_refresh_token_as_access_token(client: TestClient) -> None:
+    login_data = {
+        "username": settings.FIRST_SUPERUSER,
+        "password": settings.FIRST_SUPERUSER_PASSWORD,
+    }
+    with patch("app.core.config.settings.ACCESS_TOKEN_CLAIMS", True):
+        r = client.post(f"{settings.API_V1_STR}/login/access-token", data=login_data)
+    headers = {"Authorization": f"Bearer {r.json()['refresh_token']}"}
+    r = client.post(f"{settings.API_V1_STR}/login/test-token", headers=headers)
+    assert r.status_code == 403
+
+
+def test_logout(client: TestClient) -> None:
+    login_data = {
+        "username": settings.FIRST_SUPERUSER,
+        "password": settings.FIRST_SUPERUSER_PASSWORD,
+    }
+    r = client.post(f"{settings.API_V1_STR}/login/access-token", data=login_data)
+    headers = {"Authorization": f"Bearer {r.json()['access_token']}"}
+    r = client.post(f"{settings.API_V1_STR}/logout", headers=headers)
+    assert r.status_code == 200
+    assert r.json() == {"message": "Logged out successfully"}
+    r = client.post(f"{settings.API_V1_STR}/login/test-token", headers=headers)
+    assert r.status_code == 403
+
+
+def test_logout_invalid_refresh_token(client: TestClient) -> None:
+    login_data = {
+        "username": settings.FIRST_SUPERUSER,
+        "password": settings.FIRST_SUPERUSER_PASSWORD,
+    }
+    r = client.post(f"{settings.API_V1_STR}/login/access-token", data=login_data)
+    access_token = r.json()["access_token"]
+    headers = {"Authorization": f"Bearer {access_token}"}
+    r = client.post(
+        f"{settings.API_V1_STR}/logout",
+        headers=headers,
+        json={"refresh_token": access_token},
+    )
+    assert r.status_code == 400
+    # Nothing is revoked when the request is rejected
+    r = client.post(f"{settings.API_V1_STR}/login/test-token", headers=headers)
+    assert r.status_code == 200
+
+
+def test_refresh_token_is_rotated(client: TestClient) -> None:
+    login_data = {
+        "username": settings.FIRST_SUPERUSER,
+        "password": settings.FIRST_SUPERUSER_PASSWORD,
+    }
+    with patch("app.core.config.settings.ACCESS_TOKEN_CLAIMS", True):
+        r = client.post(f"{settings.API_V1_STR}/login/access-token", data=login_data)
+        refresh_token = r.json()["refresh_token"]
+        r = client.post(
+            f"{settings.API_V1_STR}/login/refresh-token",
+            json={"refresh_token": refresh_token},
+        )
+        assert r.status_code == 200
+        r = client.post(
+            f"{settings.API_V1_STR}/login/refresh-token",
+            json={"refresh_token": refresh_token},
+        )
+    assert r.status_code == 403
+
+
+def test_get_access_token_throttled(client: TestClient) -> None:
+    throttle = LoginThrottle(
+        backend=MemoryThrottleBackend(),
+        account_burst=1,
+        account_per_minute=1,
+        ip_burst=10,
+        ip_per_minute=10,
+    )
+    login_data = {
+        "username": settings.FIRST_SUPERUSER,
+        "password": "incorrect",
+    }
+    with patch("app.api.routes.login.login_throttle", throttle):
+        r = client.post(f"{settings.API_V1_STR}/login/access-token", data=login_data)
+        assert r.status_code == 400
+        r = client.post(f"{settings.API_V1_STR}/login/access-token", data=login_data)
+    assert r.status_code == 429
+    assert int(r.headers["Retry-After"]) > 0
+
+
 def test_use_access_token(
     client: TestClient, superuser_token_headers: dict[str, str]
 ) -> None:
@@ -85,6 +263,7 @@ def test_reset_password(client: TestClient, db: Session) -> None:
         is_superuser=False,
     )
     user = create_user(session=db, user_create=user_create)
+    assert user
     token = generate_password_reset_token(email=email)
     headers = user_authentication_headers(client=client, email=email, password=password)
     data = {"new_password": new_password, "token": token}
@@ -0,0 +1,64 @@
+from collections.abc import Generator
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlmodel import Session
+
+from app.api.routes import login_async
+from app.core.config import settings
+from app.core.hashing import build_pwd_context
+from app.core.security import verify_password
+from app.crud import create_user
+from app.models import UserCreate
+from app.tests.utils.utils import random_email, random_lower_string
+
+
+@pytest.fixture(scope="module")
+def async_client() -> Generator[TestClient, None, None]:
+    app = FastAPI()
+    app.include_router(login_async.router, prefix=settings.API_V1_STR)
+    with TestClient(app) as c:
+        yield c
+
+
+def test_get_access_token(async_client: TestClient) -> None:
+    login_data = {
+        "username": settings.FIRST_SUPERUSER,
+        "password": settings.FIRST_SUPERUSER_PASSWORD,
+    }
+    r = async_client.post(f"{settings.API_V1_STR}/login/access-token", data=login_data)
+    tokens = r.json()
+    assert r.status_code == 200
+    assert "access_token" in tokens
+    assert tokens["access_token"]
+
+
+def test_get_access_token_incorrect_password(async_client: TestClient) -> None:
+    login_data = {
+        "username": settings.FIRST_SUPERUSER,
+        "password": "incorrect",
+    }
+    r = async_client.post(f"{settings.API_V1_STR}/login/access-token", data=login_data)
+    assert r.status_code == 400
+
+
+def test_get_access_token_rehashes_outdated_hash(
+    async_client: TestClient, db: Session
+) -> None:
+    email = random_email()
+    password = random_lower_string()
+    user = create_user(
+        session=db, user_create=UserCreate(email=email, password=password)
+    )
+    assert user
+    outdated_hash = build_pwd_context(bcrypt_rounds=4).hash(password)
+    user.hashed_password = outdated_hash
+    db.add(user)
+    db.commit()
+    login_data = {"username": email, "password": password}
+    r = async_client.post(f"{settings.API_V1_STR}/login/access-token", data=login_data)
+    assert r.status_code == 200
+    db.refresh(user)
+    assert user.hashed_password != outdated_hash
+    assert verify_password(password, user.hashed_password)
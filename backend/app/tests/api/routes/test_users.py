@@ -1,13 +1,20 @@
+import csv
+import io
+import json
 import uuid
+from typing import Any
 from unittest.mock import patch
 
 from fastapi.testclient import TestClient
-from sqlmodel import Session, select
+from sqlalchemy import event
+from sqlmodel import Session, func, select
 
-from app import crud
+from app import crud, provisioning
 from app.core.config import settings
+from app.core.db import engine
 from app.core.security import verify_password
-from app.models import User, UserCreate
+from app.models import Item, ItemCreate, User, UserCreate
+from app.tests.utils.user import user_authentication_headers
 from app.tests.utils.utils import random_email, random_lower_string
 
 
@@ -22,6 +29,26 @@ def test_get_users_superuser_me(
     assert current_user["email"] == settings.FIRST_SUPERUSER
 
 
+def test_get_users_me_etag(
+    client: TestClient, normal_user_token_headers: dict[str, str]
+) -> None:
+    url = f"{settings.API_V1_STR}/users/me"
+    response = client.get(url, headers=normal_user_token_headers)
+    etag = response.headers["ETag"]
+    headers = {**normal_user_token_headers, "If-None-Match": f'W/{etag}, "other"'}
+    response = client.get(url, headers=headers)
+    assert response.status_code == 304
+
+    full_name = random_lower_string()
+    response = client.patch(
+        url, headers=normal_user_token_headers, json={"full_name": full_name}
+    )
+    assert response.status_code == 200
+    response = client.get(url, headers=headers)
+    assert response.status_code == 200
+    assert response.json()["full_name"] == full_name
+
+
 def test_get_users_normal_user_me(
     client: TestClient, normal_user_token_headers: dict[str, str]
 ) -> None:
@@ -63,6 +90,7 @@ def test_get_existing_user(
     password = random_lower_string()
     user_in = UserCreate(email=username, password=password)
     user = crud.create_user(session=db, user_create=user_in)
+    assert user
     user_id = user.id
     r = client.get(
         f"{settings.API_V1_STR}/users/{user_id}",
@@ -80,6 +108,7 @@ def test_get_existing_user_current_user(client: TestClient, db: Session) -> None
     password = random_lower_string()
     user_in = UserCreate(email=username, password=password)
     user = crud.create_user(session=db, user_create=user_in)
+    assert user
     user_id = user.id
 
     login_data = {
@@ -168,6 +197,127 @@ def test_retrieve_users(
         assert "email" in item
 
 
+def test_retrieve_users_cursor(
+    client: TestClient, superuser_token_headers: dict[str, str], db: Session
+) -> None:
+    for _ in range(2):
+        user_in = UserCreate(email=random_email(), password=random_lower_string())
+        crud.create_user(session=db, user_create=user_in)
+
+    emails = []
+    cursor = None
+    while True:
+        params: dict[str, Any] = {"limit": 1}
+        if cursor:
+            params["cursor"] = cursor
+        r = client.get(
+            f"{settings.API_V1_STR}/users/",
+            headers=superuser_token_headers,
+            params=params,
+        )
+        assert r.status_code == 200
+        page = r.json()
+        emails += [user["email"] for user in page["data"]]
+        cursor = page["next_cursor"]
+        if not cursor:
+            break
+    assert len(emails) == len(set(emails)) == page["count"]
+
+
+def test_export_users(
+    client: TestClient, superuser_token_headers: dict[str, str], db: Session
+) -> None:
+    user_in = UserCreate(email=random_email(), password=random_lower_string())
+    user = crud.create_user(session=db, user_create=user_in)
+    assert user
+
+    r = client.get(
+        f"{settings.API_V1_STR}/users/export", headers=superuser_token_headers
+    )
+    assert r.status_code == 200
+    users = [json.loads(line) for line in r.text.splitlines()]
+    assert user.email in {u["email"] for u in users}
+    assert all("hashed_password" not in u for u in users)
+
+    r = client.get(
+        f"{settings.API_V1_STR}/users/export",
+        headers=superuser_token_headers,
+        params={"file_format": "csv"},
+    )
+    assert r.status_code == 200
+    rows = list(csv.DictReader(io.StringIO(r.text)))
+    assert [row["email"] for row in rows] == [u["email"] for u in users]
+
+
+def test_export_users_normal_user(
+    client: TestClient, normal_user_token_headers: dict[str, str]
+) -> None:
+    r = client.get(
+        f"{settings.API_V1_STR}/users/export", headers=normal_user_token_headers
+    )
+    assert r.status_code == 403
+
+
+def test_search_users(
+    client: TestClient, superuser_token_headers: dict[str, str], db: Session
+) -> None:
+    word = random_lower_string()[:12]
+    users_in = [
+        UserCreate(email=f"{word}@example.com", password=random_lower_string()),
+        UserCreate(
+            email=random_email(),
+            password=random_lower_string(),
+            full_name=f"Name {word.upper()}",
+            is_active=False,
+        ),
+        UserCreate(
+            email=f"a_{word}@example.com",
+            password=random_lower_string(),
+            is_superuser=True,
+        ),
+    ]
+    for user_in in users_in:
+        assert crud.create_user(session=db, user_create=user_in)
+    url = f"{settings.API_V1_STR}/users/search"
+
+    def search(**params: Any) -> list[str]:
+        r = client.get(url, headers=superuser_token_headers, params=params)
+        assert r.status_code == 200
+        return [user["email"] for user in r.json()["data"]]
+
+    # Anywhere in the email or the name, ignoring case, ordered by email
+    assert search(q=word) == sorted(user_in.email for user_in in users_in)
+    assert search(q=word, is_active=False) == [users_in[1].email]
+    assert search(q=word, is_superuser=True) == [users_in[2].email]
+    assert search(q=word, is_active=True, is_superuser=False) == [users_in[0].email]
+    # LIKE wildcards are matched literally
+    assert search(q=f"a_{word}") == [users_in[2].email]
+    assert search(q=f"%{word}") == []
+
+    r = client.get(url, headers=superuser_token_headers, params={"q": word, "limit": 2})
+    content = r.json()
+    assert len(content["data"]) == 2
+    assert content["has_more"]
+
+
+def test_search_users_bounds(
+    client: TestClient,
+    superuser_token_headers: dict[str, str],
+    normal_user_token_headers: dict[str, str],
+) -> None:
+    url = f"{settings.API_V1_STR}/users/search"
+    r = client.get(url, headers=superuser_token_headers, params={"q": "ab"})
+    assert r.status_code == 422
+    r = client.get(
+        url,
+        headers=superuser_token_headers,
+        params={"q": "example", "limit": settings.USERS_SEARCH_MAX_LIMIT + 1},
+    )
+    assert r.status_code == 422
+    r = client.get(url, headers=normal_user_token_headers, params={"q": "example"})
+    assert r.status_code == 403
+
+
 def test_update_user_me(
     client: TestClient, normal_user_token_headers: dict[str, str], db: Session
 ) -> None:
@@ -252,6 +402,7 @@ def test_update_user_me_email_exists(
     password = random_lower_string()
     user_in = UserCreate(email=username, password=password)
     user = crud.create_user(session=db, user_create=user_in)
+    assert user
 
     data = {"email": user.email}
     r = client.patch(
@@ -327,6 +478,7 @@ def test_update_user(
     password = random_lower_string()
     user_in = UserCreate(email=username, password=password)
     user = crud.create_user(session=db, user_create=user_in)
+    assert user
 
     data = {"full_name": "Updated_full_name"}
     r = client.patch(
@@ -346,6 +498,32 @@ def test_update_user(
     assert user_db.full_name == "Updated_full_name"
 
 
+def test_update_user_deactivated_is_rejected(
+    client: TestClient, superuser_token_headers: dict[str, str], db: Session
+) -> None:
+    username = random_email()
+    password = random_lower_string()
+    user_in = UserCreate(email=username, password=password)
+    user = crud.create_user(session=db, user_create=user_in)
+    assert user
+    headers = user_authentication_headers(
+        client=client, email=username, password=password
+    )
+    r = client.get(f"{settings.API_V1_STR}/users/me", headers=headers)
+    assert r.status_code == 200
+
+    r = client.patch(
+        f"{settings.API_V1_STR}/users/{user.id}",
+        headers=superuser_token_headers,
+        json={"is_active": False},
+    )
+    assert r.status_code == 200
+
+    r = client.get(f"{settings.API_V1_STR}/users/me", headers=headers)
+    assert r.status_code == 400
+    assert r.json()["detail"] == "Inactive user"
+
+
 def test_update_user_not_exists(
     client: TestClient, superuser_token_headers: dict[str, str]
 ) -> None:
@@ -366,11 +544,13 @@ def test_update_user_email_exists(
     password = random_lower_string()
     user_in = UserCreate(email=username, password=password)
     user = crud.create_user(session=db, user_create=user_in)
+    assert user
 
     username2 = random_email()
     password2 = random_lower_string()
     user_in2 = UserCreate(email=username2, password=password2)
     user2 = crud.create_user(session=db, user_create=user_in2)
+    assert user2
 
     data = {"email": user2.email}
     r = client.patch(
@@ -387,6 +567,7 @@ def test_delete_user_me(client: TestClient, db: Session) -> None:
     password = random_lower_string()
     user_in = UserCreate(email=username, password=password)
     user = crud.create_user(session=db, user_create=user_in)
+    assert user
     user_id = user.id
 
     login_data = {
@@ -432,6 +613,7 @@ def test_delete_user_super_user(
     password = random_lower_string()
     user_in = UserCreate(email=username, password=password)
     user = crud.create_user(session=db, user_create=user_in)
+    assert user
     user_id = user.id
     r = client.delete(
         f"{settings.API_V1_STR}/users/{user_id}",
@@ -444,6 +626,81 @@ def test_delete_user_super_user(
     assert result is None
 
 
+def test_delete_user_with_items(client: TestClient, db: Session) -> None:
+    username = random_email()
+    password = random_lower_string()
+    user_in = UserCreate(email=username, password=password)
+    user = crud.create_user(session=db, user_create=user_in)
+    assert user
+    user_id = user.id
+    items_in = [ItemCreate(title=random_lower_string()) for _ in range(50)]
+    crud.create_items(session=db, items_in=items_in, owner_id=user_id)
+    headers = user_authentication_headers(
+        client=client, email=username, password=password
+    )
+
+    statements = []
+
+    def record(*args: Any) -> None:
+        statements.append(args[2])
+
+    event.listen(engine, "before_cursor_execute", record)
+    try:
+        r = client.delete(f"{settings.API_V1_STR}/users/me", headers=headers)
+    finally:
+        event.remove(engine, "before_cursor_execute", record)
+    assert r.status_code == 200
+    # Items are deleted by the foreign key cascade, they are never loaded
+    assert not [s for s in statements if "FROM item" in s]
+    statement = select(func.count()).select_from(Item).where(Item.owner_id == user_id)
+    assert db.exec(statement).one() == 0
+
+
+def test_delete_user_soft(client: TestClient, db: Session) -> None:
+    username = random_email()
+    password = random_lower_string()
+    user_in = UserCreate(email=username, password=password)
+    user = crud.create_user(session=db, user_create=user_in)
+    assert user
+    user_id = user.id
+    items_in = [ItemCreate(title=random_lower_string()) for _ in range(25)]
+    crud.create_items(session=db, items_in=items_in, owner_id=user_id)
+    headers = user_authentication_headers(
+        client=client, email=username, password=password
+    )
+
+    with patch.object(settings, "SOFT_DELETE", True):
+        r = client.delete(f"{settings.API_V1_STR}/users/me", headers=headers)
+    assert r.status_code == 200
+    assert crud.get_user_by_email(session=db, email=username) is None
+    login_data = {"username": username, "password": password}
+    r = client.post(f"{settings.API_V1_STR}/login/access-token", data=login_data)
+    assert r.status_code == 400
+    # The email of the deleted user can be taken again before the purge
+    new_user = crud.create_user(session=db, user_create=user_in)
+    assert new_user
+    assert new_user.id != user_id
+
+    user_statement = (
+        select(User.deleted_at)
+        .where(User.id == user_id)
+        .execution_options(include_deleted=True)
+    )
+    items_statement = (
+        select(func.count())
+        .select_from(Item)
+        .where(Item.owner_id == user_id)
+        .execution_options(include_deleted=True)
+    )
+    assert db.exec(user_statement).one()
+    assert db.exec(items_statement).one() == 25
+
+    while crud.purge_deleted(session=db, limit=10):
+        pass
+    assert db.exec(user_statement).first() is None
+    assert db.exec(items_statement).one() == 0
+
+
 def test_delete_user_not_found(
     client: TestClient, superuser_token_headers: dict[str, str]
 ) -> None:
@@ -477,6 +734,7 @@ def test_delete_user_without_privileges(
     password = random_lower_string()
     user_in = UserCreate(email=username, password=password)
     user = crud.create_user(session=db, user_create=user_in)
+    assert user
 
     r = client.delete(
         f"{settings.API_V1_STR}/users/{user.id}",
@@ -484,3 +742,111 @@ def test_delete_user_without_privileges(
     )
     assert r.status_code == 403
     assert r.json()["detail"] == "The user doesn't have enough privileges"
+
+
+def test_provision_users_csv(
+    client: TestClient, superuser_token_headers: dict[str, str], db: Session
+) -> None:
+    existing_email = random_email()
+    crud.create_user(
+        session=db,
+        user_create=UserCreate(email=existing_email, password=random_lower_string()),
+    )
+    email_1 = random_email()
+    email_2 = random_email()
+    invalid_email = random_email()
+    password = random_lower_string()
+    content = "\n".join(
+        [
+            "email,password,full_name,is_superuser",
+            f"{email_1},{password},User One,",
+            f"{email_2},{password},,false",
+            f"{existing_email},{password},,",
+            f"{email_1},{password},,",
+            f"{invalid_email},short,,",
+        ]
+    )
+    r = client.post(
+        f"{settings.API_V1_STR}/users/bulk",
+        headers=superuser_token_headers,
+        files={"file": ("users.csv", content, "text/csv")},
+    )
+    # The test client runs the background task before returning
+    assert r.status_code == 202
+    assert not provisioning.upload_lock.locked()
+
+    user = crud.get_user_by_email(session=db, email=email_1)
+    assert user
+    assert user.full_name == "User One"
+    assert verify_password(password, user.hashed_password)
+    user = crud.get_user_by_email(session=db, email=email_2)
+    assert user
+    assert user.full_name is None
+    assert not user.is_superuser
+    assert not crud.get_user_by_email(session=db, email=invalid_email)
+
+
+def test_provision_users_jsonl(
+    client: TestClient, superuser_token_headers: dict[str, str], db: Session
+) -> None:
+    email = random_email()
+    content = "\n".join(
+        [
+            f'{{"email": "{email}", "password": "{random_lower_string()}"}}',
+            "",
+            "not json",
+            "[]",
+        ]
+    )
+    r = client.post(
+        f"{settings.API_V1_STR}/users/bulk",
+        headers=superuser_token_headers,
+        params={"file_format": "jsonl"},
+        files={"file": ("users.jsonl", content, "application/x-ndjson")},
+    )
+    assert r.status_code == 202
+    assert crud.get_user_by_email(session=db, email=email)
+
+
+def test_provision_users_large_file(
+    client: TestClient, superuser_token_headers: dict[str, str], db: Session
+) -> None:
+    # Over the 1MB kept in memory, the upload is read back from disk. The
+    # padding rows have no password, they are reported without hashing any
+    email = random_email()
+    padding = [f"{random_email()},,{'Zoë Ångström ' * 15}" for _ in range(5000)]
+    rows = [*padding, f"{email},{random_lower_string()},Zoë Ångström"]
+    content = "\r\n".join(["email,password,full_name", *rows]).encode()
+    assert len(content) > 1024 * 1024
+    r = client.post(
+        f"{settings.API_V1_STR}/users/bulk",
+        headers=superuser_token_headers,
+        files={"file": ("users.csv", content, "text/csv")},
+    )
+    assert r.status_code == 202
+    user = crud.get_user_by_email(session=db, email=email)
+    assert user
+    assert user.full_name == "Zoë Ångström"
+
+
+def test_provision_users_upload_in_progress(
+    client: TestClient, superuser_token_headers: dict[str, str]
+) -> None:
+    with provisioning.upload_lock:
+        r = client.post(
+            f"{settings.API_V1_STR}/users/bulk",
+            headers=superuser_token_headers,
+            files={"file": ("users.csv", "email,password\n", "text/csv")},
+        )
+    assert r.status_code == 409
+
+
+def test_provision_users_normal_user(
+    client: TestClient, normal_user_token_headers: dict[str, str]
+) -> None:
+    r = client.post(
+        f"{settings.API_V1_STR}/users/bulk",
+        headers=normal_user_token_headers,
+        files={"file": ("users.csv", "email,password\n", "text/csv")},
+    )
+    assert r.status_code == 403
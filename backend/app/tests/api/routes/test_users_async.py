@@ -0,0 +1,68 @@
+from collections.abc import Generator
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlmodel import Session
+
+from app import crud
+from app.api.routes import users_async
+from app.core.config import settings
+from app.core.security import verify_password
+from app.tests.utils.user import user_authentication_headers
+from app.tests.utils.utils import random_email, random_lower_string
+
+
+@pytest.fixture(scope="module")
+def async_client() -> Generator[TestClient, None, None]:
+    app = FastAPI()
+    app.include_router(users_async.router, prefix=settings.API_V1_STR)
+    with TestClient(app) as c:
+        yield c
+
+
+def test_register_and_update_user(
+    async_client: TestClient, client: TestClient, db: Session
+) -> None:
+    email = random_email()
+    password = random_lower_string()
+    data = {"email": email, "password": password, "full_name": "Async User"}
+    r = async_client.post(f"{settings.API_V1_STR}/users/signup", json=data)
+    assert r.status_code == 200
+    assert r.json()["email"] == email
+    r = async_client.post(f"{settings.API_V1_STR}/users/signup", json=data)
+    assert r.status_code == 400
+
+    headers = user_authentication_headers(client=client, email=email, password=password)
+    new_email = random_email()
+    r = async_client.patch(
+        f"{settings.API_V1_STR}/users/me",
+        headers=headers,
+        json={"email": new_email, "full_name": "Renamed"},
+    )
+    assert r.status_code == 200
+    assert r.json()["email"] == new_email
+    assert r.json()["full_name"] == "Renamed"
+    r = async_client.patch(
+        f"{settings.API_V1_STR}/users/me",
+        headers=headers,
+        json={"email": settings.FIRST_SUPERUSER},
+    )
+    assert r.status_code == 409
+
+    new_password = random_lower_string()
+    r = async_client.patch(
+        f"{settings.API_V1_STR}/users/me/password",
+        headers=headers,
+        json={"current_password": "incorrect", "new_password": new_password},
+    )
+    assert r.status_code == 400
+    r = async_client.patch(
+        f"{settings.API_V1_STR}/users/me/password",
+        headers=headers,
+        json={"current_password": password, "new_password": new_password},
+    )
+    assert r.status_code == 200
+    user = crud.get_user_by_email(session=db, email=new_email)
+    assert user
+    assert verify_password(new_password, user.hashed_password)
@@ -0,0 +1,25 @@
+from fastapi.testclient import TestClient
+
+from app.core.config import settings
+
+
+def test_diagnostics(
+    client: TestClient, superuser_token_headers: dict[str, str]
+) -> None:
+    r = client.get(
+        f"{settings.API_V1_STR}/utils/diagnostics/", headers=superuser_token_headers
+    )
+    assert r.status_code == 200
+    content = r.json()
+    assert "checked_out" in content["database_pools"]["sync"]
+    assert "pending" in content["password_hashing"]
+    assert "hits" in content["caches"]["principal"]
+
+
+def test_diagnostics_normal_user(
+    client: TestClient, normal_user_token_headers: dict[str, str]
+) -> None:
+    r = client.get(
+        f"{settings.API_V1_STR}/utils/diagnostics/", headers=normal_user_token_headers
+    )
+    assert r.status_code == 403
@@ -17,9 +17,9 @@ def db() -> Generator[Session, None, None]:
     with Session(engine) as session:
         init_db(session)
         yield session
-        statement = delete(Item)
+        statement = delete(Item).execution_options(include_deleted=True)
         session.execute(statement)
-        statement = delete(User)
+        statement = delete(User).execution_options(include_deleted=True)
         session.execute(statement)
         session.commit()
 
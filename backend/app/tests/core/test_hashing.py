@@ -0,0 +1,55 @@
+import asyncio
+
+from app.core.hashing import PasswordHasher
+from app.tests.utils.utils import random_lower_string
+
+
+def test_hash_and_verify_in_pool() -> None:
+    hasher = PasswordHasher(max_workers=1)
+    try:
+        password = random_lower_string()
+        hashed_password = hasher.hash(password)
+        assert hashed_password != password
+        assert hasher.verify(password, hashed_password)
+        assert not hasher.verify(random_lower_string(), hashed_password)
+        stats = hasher.stats()
+        assert stats.workers == 1
+        assert stats.pending == 0
+        assert stats.completed == 3
+        assert stats.peak_pending >= 1
+    finally:
+        hasher.shutdown()
+
+
+def test_hash_and_verify_async_in_pool() -> None:
+    hasher = PasswordHasher(max_workers=1)
+    try:
+        password = random_lower_string()
+
+        async def hash_and_verify() -> bool:
+            hashed_password = await hasher.hash_password(password)
+            return await hasher.verify_password(password, hashed_password)
+
+        assert asyncio.run(hash_and_verify())
+    finally:
+        hasher.shutdown()
+
+
+def test_hash_many_in_pool() -> None:
+    hasher = PasswordHasher(max_workers=2)
+    try:
+        passwords = [random_lower_string() for _ in range(4)]
+        hashed_passwords = hasher.hash_many(passwords)
+        assert len(hashed_passwords) == 4
+        for password, hashed_password in zip(passwords, hashed_passwords, strict=True):
+            assert hasher.verify(password, hashed_password)
+    finally:
+        hasher.shutdown()
+
+
+def test_hash_inline() -> None:
+    hasher = PasswordHasher(max_workers=0)
+    password = random_lower_string()
+    hashed_password = hasher.hash(password)
+    assert hasher.verify(password, hashed_password)
+    assert hasher.stats().completed == 0
@@ -0,0 +1,31 @@
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy import exc as sa_exc
+from sqlalchemy.pool import QueuePool
+
+from app.core.pool import PoolMetrics, instrumented_pool_class
+
+
+def test_pool_metrics() -> None:
+    metrics = PoolMetrics()
+    engine = create_engine(
+        "sqlite://",
+        poolclass=instrumented_pool_class(QueuePool, metrics),
+        pool_size=1,
+        max_overflow=0,
+        pool_timeout=0.01,
+    )
+    metrics.listen(engine)
+    with engine.connect() as connection:
+        connection.execute(text("SELECT 1"))
+        stats = metrics.stats()
+        assert stats.checked_out == 1
+        assert stats.checkouts == 1
+        assert stats.connects == 1
+        with pytest.raises(sa_exc.TimeoutError):
+            engine.connect()
+    stats = metrics.stats()
+    assert stats.checked_out == 0
+    assert stats.idle == 1
+    assert stats.timeouts == 1
+    assert stats.wait_seconds_max >= 0.01
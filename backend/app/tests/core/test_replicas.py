@@ -0,0 +1,204 @@
+import math
+import threading
+import time
+import uuid
+from collections.abc import Callable
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from sqlalchemy import Engine, create_engine, text
+from sqlmodel import Session, col, delete
+
+from app.core.db import engine, replica_engines
+from app.core.replicas import ReplicaRouter
+from app.models import RevokedToken
+
+# Run with a real replica of the database, see docker-compose.replica.yml
+requires_replica = pytest.mark.skipif(
+    not replica_engines, reason="POSTGRES_REPLICA_SERVERS is not set"
+)
+
+
+class FakeLagRouter(ReplicaRouter):
+    def __init__(
+        self,
+        primary: Engine,
+        lags: dict[Engine, float | None],
+        max_lag: float,
+        check_interval: float,
+    ) -> None:
+        super().__init__(primary, list(lags), max_lag, check_interval)
+        self.lags = lags
+        self.checks = 0
+        self.responding = threading.Event()
+        self.responding.set()
+
+    def lag(self, engine: Engine) -> float:
+        self.responding.wait()
+        self.checks += 1
+        lag = self.lags[engine]
+        if lag is None:
+            raise ConnectionError("connection refused")
+        return lag
+
+    def get_engine_checked(self) -> Engine:
+        # Run a health check in the background and wait for it
+        if self._checker:
+            self._checker.join()
+        self._checked_at = None
+        self.get_engine()
+        assert self._checker
+        self._checker.join()
+        return self.get_engine()
+
+
+def test_no_replicas_reads_from_primary() -> None:
+    primary = create_engine("sqlite://")
+    router = ReplicaRouter(primary, [], max_lag=10, check_interval=5)
+    assert router.get_engine() is primary
+
+
+def test_reads_spread_over_healthy_replicas() -> None:
+    primary = create_engine("sqlite://")
+    replica_1 = create_engine("sqlite://")
+    replica_2 = create_engine("sqlite://")
+    router = FakeLagRouter(
+        primary,
+        {replica_1: 0.0, replica_2: 1.0},
+        max_lag=10,
+        check_interval=60,
+    )
+    router.get_engine_checked()
+    engines = {router.get_engine() for _ in range(4)}
+    assert engines == {replica_1, replica_2}
+    assert router.checks == 2
+
+
+def test_down_or_lagging_replicas_are_skipped() -> None:
+    primary = create_engine("sqlite://")
+    down = create_engine("sqlite://")
+    lagging = create_engine("sqlite://")
+    healthy = create_engine("sqlite://")
+    router = FakeLagRouter(
+        primary,
+        {down: None, lagging: 30.0, healthy: 0.0},
+        max_lag=10,
+        check_interval=60,
+    )
+    router.get_engine_checked()
+    assert {router.get_engine() for _ in range(3)} == {healthy}
+
+
+def test_fallback_to_primary_and_recovery() -> None:
+    primary = create_engine("sqlite://")
+    replica = create_engine("sqlite://")
+    router = FakeLagRouter(primary, {replica: None}, max_lag=10, check_interval=0)
+    assert router.get_engine_checked() is primary
+    router.lags[replica] = 30.0
+    assert router.get_engine_checked() is primary
+    router.lags[replica] = 5.0
+    assert router.get_engine_checked() is replica
+
+
+def test_check_does_not_block_reads() -> None:
+    primary = create_engine("sqlite://")
+    replica = create_engine("sqlite://")
+    router = FakeLagRouter(primary, {replica: 0.0}, max_lag=10, check_interval=60)
+    router.responding.clear()
+    # Nothing is known about the replica until the first check completes
+    assert router.get_engine() is primary
+    assert router.get_engine() is primary
+    router.responding.set()
+    assert router._checker
+    router._checker.join()
+    assert router.get_engine() is replica
+    assert router.checks == 1
+
+
+def test_primary_is_not_a_streaming_replica() -> None:
+    router = ReplicaRouter(engine, [], max_lag=10, check_interval=5)
+    assert router.lag(engine) == math.inf
+
+
+def wait_until(condition: Callable[[], bool], timeout: float = 10) -> bool:
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.05)
+    return True
+
+
+def revoke_on_primary(jti: str, *, wait_for_replicas: bool = True) -> None:
+    with Session(engine) as session:
+        if not wait_for_replicas:
+            # Don't wait for the replicas to apply the commit, with
+            # synchronous_commit=remote_apply
+            session.execute(text("SET LOCAL synchronous_commit = local"))
+        session.add(
+            RevokedToken(
+                jti=jti, expires_at=datetime.now(timezone.utc) + timedelta(hours=1)
+            )
+        )
+        session.commit()
+
+
+def delete_on_primary(jti: str) -> None:
+    with Session(engine) as session:
+        session.execute(delete(RevokedToken).where(col(RevokedToken.jti) == jti))
+        session.commit()
+
+
+@requires_replica
+def test_reads_are_routed_to_the_replica() -> None:
+    router = ReplicaRouter(engine, replica_engines, max_lag=10, check_interval=60)
+    router.check()
+    replica = router.get_engine()
+    assert replica in replica_engines
+    jti = uuid.uuid4().hex
+    revoke_on_primary(jti)
+    try:
+
+        def replicated() -> bool:
+            with Session(replica) as session:
+                return session.get(RevokedToken, jti) is not None
+
+        assert wait_until(replicated)
+    finally:
+        delete_on_primary(jti)
+
+
+@requires_replica
+def test_down_replica_is_skipped() -> None:
+    down = create_engine(replica_engines[0].url.set(port=1))
+    router = ReplicaRouter(
+        engine, [down, *replica_engines], max_lag=10, check_interval=60
+    )
+    router.check()
+    assert {router.get_engine() for _ in range(4)} == set(replica_engines)
+
+
+@requires_replica
+def test_lagging_replica_falls_back_to_primary() -> None:
+    replica = replica_engines[0]
+    router = ReplicaRouter(engine, [replica], max_lag=0.5, check_interval=60)
+    router.check()
+    assert router.get_engine() is replica
+    with replica.connect() as connection:
+        connection.execute(text("SELECT pg_wal_replay_pause()"))
+        connection.commit()
+    jti = uuid.uuid4().hex
+    try:
+        # The replica receives the write but doesn't apply it
+        revoke_on_primary(jti, wait_for_replicas=False)
+        assert wait_until(lambda: router.lag(replica) > router.max_lag)
+        router.check()
+        assert router.get_engine() is engine
+    finally:
+        with replica.connect() as connection:
+            connection.execute(text("SELECT pg_wal_replay_resume()"))
+            connection.commit()
+        delete_on_primary(jti)
+    assert wait_until(lambda: router.lag(replica) <= router.max_lag)
+    router.check()
+    assert router.get_engine() is replica
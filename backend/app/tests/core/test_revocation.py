@@ -0,0 +1,95 @@
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+
+from sqlmodel import Session
+
+from app.core.db import engine
+from app.core.revocation import BloomFilter, RevocationFilter
+from app.models import RevokedToken, TokenPayload
+
+
+def test_bloom_filter_has_no_false_negatives() -> None:
+    bloom = BloomFilter(capacity=1000, error_rate=0.01)
+    keys = [uuid.uuid4().hex for _ in range(1000)]
+    for key in keys:
+        bloom.add(key)
+    assert all(key in bloom for key in keys)
+
+
+def test_bloom_filter_false_positive_rate() -> None:
+    bloom = BloomFilter(capacity=1000, error_rate=0.01)
+    for _ in range(1000):
+        bloom.add(uuid.uuid4().hex)
+    false_positives = sum(uuid.uuid4().hex in bloom for _ in range(10_000))
+    assert false_positives < 300
+
+
+def revoked_token_data() -> TokenPayload:
+    expires_at = datetime.now(timezone.utc) + timedelta(minutes=5)
+    return TokenPayload(
+        sub=str(uuid.uuid4()), jti=uuid.uuid4().hex, exp=int(expires_at.timestamp())
+    )
+
+
+def test_revocation_filter_rebuild(db: Session) -> None:
+    revocations = RevocationFilter(
+        capacity=1000, error_rate=0.01, sync_interval=60, rebuild_interval=3600
+    )
+    token_data = revoked_token_data()
+    assert token_data.jti
+    assert revocations.revoke(db, token_data)
+    db.commit()
+    # Checked against the database until the first filter is built
+    assert revocations.is_revoked(db, token_data.jti)
+    assert not revocations.is_revoked(db, uuid.uuid4().hex)
+    revocations.rebuild()
+    assert revocations._filter is not None
+    assert token_data.jti in revocations._filter
+    assert revocations.is_revoked(db, token_data.jti)
+
+
+def test_revocation_filter_revoke_twice(db: Session) -> None:
+    revocations = RevocationFilter(
+        capacity=1000, error_rate=0.01, sync_interval=60, rebuild_interval=3600
+    )
+    token_data = revoked_token_data()
+    assert token_data.jti
+    assert revocations.revoke(db, token_data)
+    db.commit()
+    assert not revocations.revoke(db, token_data)
+    db.commit()
+    assert db.get(RevokedToken, token_data.jti)
+
+
+def test_revocation_filter_revoke_concurrently(db: Session) -> None:
+    revocations = RevocationFilter(
+        capacity=1000, error_rate=0.01, sync_interval=60, rebuild_interval=3600
+    )
+    token_data = revoked_token_data()
+    assert revocations.revoke(db, token_data)
+    # The second revocation waits for the first transaction to end
+    with ThreadPoolExecutor(1) as executor, Session(engine) as session:
+        second = executor.submit(revocations.revoke, session, token_data)
+        time.sleep(0.2)
+        assert not second.done()
+        db.commit()
+        assert not second.result(timeout=5)
+        session.commit()
+
+
+def test_revocation_filter_rebuild_purges_expired(db: Session) -> None:
+    revocations = RevocationFilter(
+        capacity=1000, error_rate=0.01, sync_interval=60, rebuild_interval=3600
+    )
+    expired_jti = uuid.uuid4().hex
+    expires_at = datetime.now(timezone.utc) - timedelta(seconds=1)
+    db.add(RevokedToken(jti=expired_jti, expires_at=expires_at))
+    token_data = revoked_token_data()
+    assert revocations.revoke(db, token_data)
+    db.commit()
+    revocations.rebuild()
+    db.expire_all()
+    assert not db.get(RevokedToken, expired_jti)
+    assert db.get(RevokedToken, token_data.jti)
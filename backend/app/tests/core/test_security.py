@@ -0,0 +1,29 @@
+from datetime import timedelta
+from unittest.mock import patch
+
+import jwt
+import pytest
+
+from app.core.security import create_access_token, decode_token
+
+
+def test_decode_token_is_cached() -> None:
+    token = create_access_token("subject", expires_delta=timedelta(minutes=5))
+    assert decode_token(token).sub == "subject"
+    with patch("app.core.security.jwt.decode") as decode:
+        assert decode_token(token).sub == "subject"
+        decode.assert_not_called()
+
+
+def test_decode_token_cache_does_not_outlive_secret() -> None:
+    token = create_access_token("subject", expires_delta=timedelta(minutes=5))
+    assert decode_token(token).sub == "subject"
+    with patch("app.core.config.settings.SECRET_KEY", "another-secret-key"):
+        with pytest.raises(jwt.InvalidTokenError):
+            decode_token(token)
+
+
+def test_decode_token_expired() -> None:
+    token = create_access_token("subject", expires_delta=timedelta(seconds=-1))
+    with pytest.raises(jwt.ExpiredSignatureError):
+        decode_token(token)
@@ -0,0 +1,65 @@
+from app.core.throttle import (
+    DatabaseThrottleBackend,
+    LoginThrottle,
+    MemoryThrottleBackend,
+)
+from app.tests.utils.utils import random_lower_string
+
+
+def test_memory_backend_take() -> None:
+    backend = MemoryThrottleBackend()
+    assert backend.take("key", capacity=2, rate=1 / 60) == 0
+    assert backend.take("key", capacity=2, rate=1 / 60) == 0
+    retry_after = backend.take("key", capacity=2, rate=1 / 60)
+    assert 0 < retry_after <= 60
+    assert backend.take("other", capacity=2, rate=1 / 60) == 0
+
+
+def test_memory_backend_give_back() -> None:
+    backend = MemoryThrottleBackend()
+    assert backend.take("key", capacity=1, rate=1 / 60) == 0
+    backend.give_back("key", capacity=1)
+    assert backend.take("key", capacity=1, rate=1 / 60) == 0
+
+
+def test_login_throttle_per_account() -> None:
+    throttle = LoginThrottle(
+        backend=MemoryThrottleBackend(),
+        account_burst=1,
+        account_per_minute=1,
+        ip_burst=10,
+        ip_per_minute=10,
+    )
+    assert throttle.attempt(account="user@example.com", ip="10.0.0.1") == 0
+    assert throttle.attempt(account="USER@example.com", ip="10.0.0.2") > 0
+    throttle.succeeded(account="user@example.com")
+    assert throttle.attempt(account="user@example.com", ip="10.0.0.1") == 0
+
+
+def test_login_throttle_per_ip() -> None:
+    throttle = LoginThrottle(
+        backend=MemoryThrottleBackend(),
+        account_burst=10,
+        account_per_minute=10,
+        ip_burst=1,
+        ip_per_minute=1,
+    )
+    assert throttle.attempt(account="a@example.com", ip="10.0.0.1") == 0
+    assert throttle.attempt(account="b@example.com", ip="10.0.0.1") > 0
+    assert throttle.attempt(account="b@example.com", ip="10.0.0.2") == 0
+
+
+def test_login_throttle_long_account() -> None:
+    throttle = LoginThrottle(
+        backend=DatabaseThrottleBackend(),
+        account_burst=1,
+        account_per_minute=1,
+        ip_burst=10,
+        ip_per_minute=10,
+    )
+    # Longer than the bucket key column, and new to the database on every run
+    account = random_lower_string() * 10 + "@example.com"
+    assert throttle.attempt(account=account, ip=None) == 0
+    assert throttle.attempt(account=account, ip=None) > 0
+    throttle.succeeded(account=account)
+    assert throttle.attempt(account=account, ip=None) == 0
@@ -0,0 +1,28 @@
+from sqlmodel import Session, text
+
+from app import crud
+
+
+def test_estimated_count_of_partitioned_table(db: Session) -> None:
+    connection = db.connection()
+    connection.execute(text("CREATE TABLE estimated (id int) PARTITION BY HASH (id)"))
+    for remainder in range(2):
+        connection.execute(
+            text(
+                f"CREATE TABLE estimated_p{remainder} PARTITION OF estimated "
+                f"FOR VALUES WITH (MODULUS 2, REMAINDER {remainder})"
+            )
+        )
+    statement = crud.estimated_count_statement("estimated")
+    try:
+        # Unknown until all the partitions are analyzed
+        assert db.exec(statement).one() == -1
+        connection.execute(
+            text("INSERT INTO estimated SELECT generate_series(1, 1000)")
+        )
+        connection.execute(text("ANALYZE estimated_p0"))
+        assert db.exec(statement).one() == -1
+        connection.execute(text("ANALYZE estimated_p1"))
+        assert db.exec(statement).one() == 1000
+    finally:
+        db.rollback()
@@ -0,0 +1,260 @@
+"""
+Plans of the queries issued by the routes.
+
+Sequential scans are disabled, as they are the cheapest plan for the small
+tables of the tests, so a sequential scan in a plan means no index can serve
+the query. Queries reading a whole table, like the exact total counts, are
+not checked.
+"""
+
+import uuid
+from collections.abc import Iterator, Sequence
+from datetime import datetime, timezone
+from typing import Any
+
+import pytest
+from sqlalchemy import ClauseElement, Executable
+from sqlmodel import Session, bindparam, col, delete, select
+
+from app import crud
+from app.core.db import engine
+from app.core.throttle import _account_key
+from app.models import Item, RevokedToken, ThrottleBucket, User
+from app.tests.utils.utils import random_lower_string
+
+now = datetime.now(timezone.utc)
+owners = [uuid.uuid4() for _ in range(200)]
+owner_id = owners[0]
+# Keyset pages followed by most of the rows, the ones that must not be sorted
+after = uuid.UUID("08000000-0000-4000-8000-000000000000")
+
+# Query, parameters, index the plan must use, or any of a set of indexes
+plans: dict[str, tuple[ClauseElement, dict[str, Any], str | frozenset[str]]] = {
+    "user by email": (
+        crud.user_by_email_statement,
+        {"email": "user@example.com"},
+        "ix_user_email",
+    ),
+    "user by id": (
+        select(User).where(User.id == bindparam("id")),
+        {"id": owner_id},
+        "user_pkey",
+    ),
+    "users page": (crud.users_statement, {"skip": 10, "limit": 11}, "user_pkey"),
+    "users keyset page": (
+        crud.users_after_statement,
+        {"after": after, "limit": 11},
+        "user_pkey",
+    ),
+    "item by id": (
+        select(Item).where(Item.id == bindparam("id")),
+        {"id": owner_id},
+        "item_pkey",
+    ),
+    # Both indexes find the single row of the id and owner
+    "owned item": (
+        crud.item_statement,
+        {"item_id": owner_id, "principal_id": owner_id, "is_superuser": False},
+        frozenset({"item_pkey", "ix_item_owner_id_id"}),
+    ),
+    "item as superuser": (
+        crud.item_statement,
+        {"item_id": owner_id, "principal_id": owner_id, "is_superuser": True},
+        "item_pkey",
+    ),
+    "delete owned item": (
+        crud.delete_item_statement,
+        {"item_id": owner_id, "principal_id": owner_id, "is_superuser": False},
+        frozenset({"item_pkey", "ix_item_owner_id_id"}),
+    ),
+    "items page": (crud.items_statement, {"skip": 10, "limit": 11}, "item_pkey"),
+    "items keyset page": (
+        crud.items_after_statement,
+        {"after": after, "limit": 11},
+        "item_pkey",
+    ),
+    "owner items page": (
+        crud.owner_items_statement,
+        {"owner_id": owner_id, "skip": 10, "limit": 11},
+        "ix_item_owner_id_id",
+    ),
+    "owner items keyset page": (
+        crud.owner_items_after_statement,
+        {"owner_id": owner_id, "after": after, "limit": 11},
+        "ix_item_owner_id_id",
+    ),
+    "owner items count": (
+        crud.owner_items_count_statement,
+        {"owner_id": owner_id},
+        "ix_item_owner_id_id",
+    ),
+    "owner items counter": (
+        crud.owner_counted_items_statement,
+        {"owner_id": owner_id},
+        "itemcount_pkey",
+    ),
+    "items search": (
+        crud.items_search_statement,
+        {"q": "foo", "limit": 11},
+        "ix_item_search_vector",
+    ),
+    # The matches are read from the search index, or from the items of the owner
+    "owner items search keyset page": (
+        crud.owner_items_search_after_statement,
+        {"q": "foo", "owner_id": owner_id, "rank": 0.1, "after": after, "limit": 11},
+        frozenset({"ix_item_search_vector", "ix_item_owner_id_id"}),
+    ),
+    "bulk item owners": (
+        crud.item_owners_statement,
+        {"ids": [owner_id, after]},
+        "item_pkey",
+    ),
+    "bulk delete items": (
+        crud.delete_items_statement,
+        {"ids": [owner_id, after]},
+        "item_pkey",
+    ),
+    # Both indexes find the single row of the id and owner
+    "bulk update items": (
+        crud.update_items_statement,
+        {"b_id": owner_id, "b_owner_id": owner_id, "title": "foo"},
+        frozenset({"item_pkey", "ix_item_owner_id_id"}),
+    ),
+    "delete owner items": (
+        delete(Item).where(col(Item.owner_id) == bindparam("owner_id")),
+        {"owner_id": owner_id},
+        "ix_item_owner_id_id",
+    ),
+    "purge items": (crud.purge_items_statement, {"limit": 500}, "ix_item_deleted_at"),
+    "purge deleted users items": (
+        crud.purge_deleted_users_items_statement,
+        {"limit": 500},
+        "ix_user_deleted_at",
+    ),
+    "purge users": (crud.purge_users_statement, {"limit": 500}, "ix_user_deleted_at"),
+    "revoked token": (
+        select(RevokedToken).where(RevokedToken.jti == bindparam("jti")),
+        {"jti": uuid.uuid4().hex},
+        "revokedtoken_pkey",
+    ),
+    "unexpired revoked tokens": (
+        select(RevokedToken.jti).where(RevokedToken.expires_at > bindparam("now")),
+        {"now": now},
+        "ix_revokedtoken_expires_at",
+    ),
+    "recently revoked tokens": (
+        select(RevokedToken.jti).where(RevokedToken.revoked_at >= bindparam("now")),
+        {"now": now},
+        "ix_revokedtoken_revoked_at",
+    ),
+    "purge expired revoked tokens": (
+        crud.purge_expired_tokens_statement,
+        {"limit": 500},
+        "ix_revokedtoken_expires_at",
+    ),
+    "throttle bucket": (
+        select(ThrottleBucket).where(ThrottleBucket.key == bindparam("key")),
+        {"key": _account_key("user@example.com")},
+        "throttlebucket_pkey",
+    ),
+}
+
+# Search results are ordered by their rank, which is only computed for the
+# rows the index matched, so those are sorted
+ranked_plans = {"items search", "owner items search keyset page"}
+
+
+def plan_nodes(plan: dict[str, Any]) -> Iterator[dict[str, Any]]:
+    yield plan
+    for child in plan.get("Plans", []):
+        yield from plan_nodes(child)
+
+
+def explain(
+    statement: ClauseElement, params: dict[str, Any], setup: Sequence[str] = ()
+) -> list[dict[str, Any]]:
+    # Plans of the statements as a Session runs them, without the soft deleted
+    # rows unless they run as Core statements. The setup statements run first,
+    # in the same transaction
+    options = (
+        statement.get_execution_options() if isinstance(statement, Executable) else {}
+    )
+    if (
+        isinstance(statement, Executable)
+        and not options.get("include_deleted")
+        and options.get("dml_strategy") != "core_only"
+    ):
+        statement = statement.options(*crud.not_deleted)
+    with Session(engine) as session:
+        connection = session.connection()
+        connection.exec_driver_sql("SET LOCAL enable_seqscan = off")
+        for sql in setup:
+            connection.exec_driver_sql(sql)
+        # The parameters of an UPDATE without values are its SET columns
+        compiled = statement.compile(connection, column_keys=list(params))
+        result = connection.exec_driver_sql(
+            f"EXPLAIN (FORMAT JSON) {compiled}", compiled.construct_params(params)
+        )
+        plan = result.scalar_one()[0]["Plan"]
+        session.rollback()
+    return list(plan_nodes(plan))
+
+
+@pytest.fixture(scope="module", autouse=True)
+def seeded_tables(db: Session) -> Iterator[None]:
+    # Enough rows for the planner estimates to tell the indexes apart
+    for id in owners:
+        db.add(User(id=id, email=f"{id}@example.com", hashed_password="-"))
+    db.flush()
+    for id in owners:
+        # The owner of the checked queries has many more items than a page
+        count = 500 if id == owner_id else 10
+        db.add_all(Item(title=random_lower_string(), owner_id=id) for _ in range(count))
+    db.commit()
+    db.connection().exec_driver_sql("ANALYZE")
+    db.commit()
+    yield
+    db.exec(delete(User).where(col(User.id).in_(owners)))
+    db.commit()
+
+
+@pytest.mark.parametrize("name", plans)
+def test_query_plan(name: str) -> None:
+    statement, params, index = plans[name]
+    nodes = explain(statement, params)
+    node_types = [node["Node Type"] for node in nodes]
+    assert "Seq Scan" not in node_types, node_types
+    # Pages are read in index order, they are never sorted
+    if name not in ranked_plans:
+        assert "Sort" not in node_types, node_types
+    indexes = {index} if isinstance(index, str) else index
+    assert indexes & {node.get("Index Name") for node in nodes}, nodes
+
+
+def test_bulk_item_update_prunes_partitions() -> None:
+    # A hash partitioned copy of the item table, found first on the search path
+    setup = [
+        "CREATE SCHEMA partitioned",
+        "CREATE TABLE partitioned.item (LIKE public.item INCLUDING DEFAULTS "
+        "INCLUDING GENERATED, PRIMARY KEY (id, owner_id)) "
+        "PARTITION BY HASH (owner_id)",
+        *(
+            f"CREATE TABLE partitioned.item_p{remainder} PARTITION OF "
+            "partitioned.item "
+            f"FOR VALUES WITH (MODULUS 4, REMAINDER {remainder})"
+            for remainder in range(4)
+        ),
+        "SET LOCAL search_path = partitioned, public",
+    ]
+    params = {"b_id": owner_id, "b_owner_id": owner_id, "title": "foo"}
+    nodes = explain(crud.update_items_statement, params, setup)
+    # Only the partition of the owner is scanned, by its primary key
+    relations = {
+        node["Relation Name"]
+        for node in nodes
+        if "Relation Name" in node and node["Node Type"] != "ModifyTable"
+    }
+    assert len(relations) == 1, relations
+    assert {node.get("Index Name") for node in nodes} & {
+        f"item_p{remainder}_pkey" for remainder in range(4)
+    }, nodes
@@ -2,6 +2,7 @@ from fastapi.encoders import jsonable_encoder
 from sqlmodel import Session
 
 from app import crud
+from app.core.hashing import build_pwd_context
 from app.core.security import verify_password
 from app.models import User, UserCreate, UserUpdate
 from app.tests.utils.utils import random_email, random_lower_string
@@ -12,20 +13,50 @@ def test_create_user(db: Session) -> None:
     password = random_lower_string()
     user_in = UserCreate(email=email, password=password)
     user = crud.create_user(session=db, user_create=user_in)
+    assert user
     assert user.email == email
     assert hasattr(user, "hashed_password")
 
 
+def test_create_user_existing_email(db: Session) -> None:
+    email = random_email()
+    user_in = UserCreate(email=email, password=random_lower_string())
+    user = crud.create_user(session=db, user_create=user_in)
+    assert user
+    user_in = UserCreate(email=email, password=random_lower_string())
+    assert crud.create_user(session=db, user_create=user_in) is None
+    db_user = crud.get_user_by_email(session=db, email=email)
+    assert db_user
+    assert db_user.id == user.id
+
+
 def test_authenticate_user(db: Session) -> None:
     email = random_email()
     password = random_lower_string()
     user_in = UserCreate(email=email, password=password)
     user = crud.create_user(session=db, user_create=user_in)
+    assert user
     authenticated_user = crud.authenticate(session=db, email=email, password=password)
     assert authenticated_user
     assert user.email == authenticated_user.email
 
 
+def test_authenticate_user_rehashes_outdated_hash(db: Session) -> None:
+    email = random_email()
+    password = random_lower_string()
+    user_in = UserCreate(email=email, password=password)
+    user = crud.create_user(session=db, user_create=user_in)
+    assert user
+    outdated_hash = build_pwd_context(bcrypt_rounds=4).hash(password)
+    user.hashed_password = outdated_hash
+    db.add(user)
+    db.commit()
+    authenticated_user = crud.authenticate(session=db, email=email, password=password)
+    assert authenticated_user
+    assert authenticated_user.hashed_password != outdated_hash
+    assert verify_password(password, authenticated_user.hashed_password)
+
+
 def test_not_authenticate_user(db: Session) -> None:
     email = random_email()
     password = random_lower_string()
@@ -38,6 +69,7 @@ def test_check_if_user_is_active(db: Session) -> None:
     password = random_lower_string()
     user_in = UserCreate(email=email, password=password)
     user = crud.create_user(session=db, user_create=user_in)
+    assert user
     assert user.is_active is True
 
 
@@ -46,6 +78,7 @@ def test_check_if_user_is_active_inactive(db: Session) -> None:
     password = random_lower_string()
     user_in = UserCreate(email=email, password=password, disabled=True)
     user = crud.create_user(session=db, user_create=user_in)
+    assert user
     assert user.is_active
 
 
@@ -54,6 +87,7 @@ def test_check_if_user_is_superuser(db: Session) -> None:
     password = random_lower_string()
     user_in = UserCreate(email=email, password=password, is_superuser=True)
     user = crud.create_user(session=db, user_create=user_in)
+    assert user
     assert user.is_superuser is True
 
 
@@ -62,6 +96,7 @@ def test_check_if_user_is_superuser_normal_user(db: Session) -> None:
     password = random_lower_string()
     user_in = UserCreate(email=username, password=password)
     user = crud.create_user(session=db, user_create=user_in)
+    assert user
     assert user.is_superuser is False
 
 
@@ -70,6 +105,7 @@ def test_get_user(db: Session) -> None:
     username = random_email()
     user_in = UserCreate(email=username, password=password, is_superuser=True)
     user = crud.create_user(session=db, user_create=user_in)
+    assert user
     user_2 = db.get(User, user.id)
     assert user_2
     assert user.email == user_2.email
@@ -81,6 +117,7 @@ def test_update_user(db: Session) -> None:
     email = random_email()
     user_in = UserCreate(email=email, password=password, is_superuser=True)
     user = crud.create_user(session=db, user_create=user_in)
+    assert user
     new_password = random_lower_string()
     user_in_update = UserUpdate(password=new_password, is_superuser=True)
     if user.id is not None:
@@ -0,0 +1,45 @@
+from pathlib import Path
+from unittest.mock import patch
+
+from sqlmodel import Session
+
+from app import crud
+from app.core.hashing import hasher
+from app.models import UserCreate
+from app.provisioning import provision_users_file
+from app.tests.utils.utils import random_email, random_lower_string
+
+
+def test_provision_users_file(db: Session, tmp_path: Path) -> None:
+    existing_email = random_email()
+    crud.create_user(
+        session=db,
+        user_create=UserCreate(email=existing_email, password=random_lower_string()),
+    )
+    email = random_email()
+    password = random_lower_string()
+    path = tmp_path / "users.csv"
+    path.write_text(
+        "\n".join(
+            [
+                "email,password,full_name",
+                f"{email},{password},Zoë",
+                f"{existing_email},{password},",
+                f"{email},{password},",
+                f"{random_email()},short,",
+            ]
+        ),
+        encoding="utf-8",
+    )
+    created: list[UserCreate] = []
+    # The file is hashed in a pool of its own, not in the pool of the logins
+    with patch.object(hasher, "hash_many", side_effect=AssertionError):
+        report = provision_users_file(path, "csv", on_created=created.extend)
+    assert report.created == 1
+    assert [user.email for user in created] == [email]
+    assert report.duplicates == [existing_email, email]
+    assert [error.line for error in report.errors] == [5]
+    assert report.errors[0].detail.startswith("password:")
+    user = crud.get_user_by_email(session=db, email=email)
+    assert user
+    assert user.full_name == "Zoë"
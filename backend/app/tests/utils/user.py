@@ -24,6 +24,7 @@ def create_random_user(db: Session) -> User:
     password = random_lower_string()
     user_in = UserCreate(email=email, password=password)
     user = crud.create_user(session=db, user_create=user_in)
+    assert user
     return user
 
 
@@ -40,6 +41,7 @@ def authentication_token_from_email(
     if not user:
         user_in_create = UserCreate(email=email, password=password)
         user = crud.create_user(session=db, user_create=user_in_create)
+        assert user
     else:
         user_in_update = UserUpdate(password=password)
         if not user.id:
@@ -1,4 +1,8 @@
+import base64
+import hashlib
 import logging
+import struct
+import uuid
 from dataclasses import dataclass
 from datetime import datetime, timedelta, timezone
 from pathlib import Path
@@ -11,6 +15,7 @@ from jwt.exceptions import InvalidTokenError
 
 from app.core import security
 from app.core.config import settings
+from app.models import Token, User
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -100,6 +105,33 @@ def generate_new_account_email(
     return EmailData(html_content=html_content, subject=subject)
 
 
+def generate_login_token(user: User) -> Token:
+    if not settings.ACCESS_TOKEN_CLAIMS:
+        access_token_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
+        return Token(
+            access_token=security.create_access_token(
+                user.id, expires_delta=access_token_expires
+            )
+        )
+    access_token_expires = timedelta(
+        minutes=settings.CLAIMS_ACCESS_TOKEN_EXPIRE_MINUTES
+    )
+    refresh_token_expires = timedelta(minutes=settings.REFRESH_TOKEN_EXPIRE_MINUTES)
+    claims = {
+        "email": user.email,
+        "is_active": user.is_active,
+        "is_superuser": user.is_superuser,
+    }
+    return Token(
+        access_token=security.create_access_token(
+            user.id, expires_delta=access_token_expires, claims=claims
+        ),
+        refresh_token=security.create_refresh_token(
+            user.id, expires_delta=refresh_token_expires
+        ),
+    )
+
+
 def generate_password_reset_token(email: str) -> str:
     delta = timedelta(hours=settings.EMAIL_RESET_TOKEN_EXPIRE_HOURS)
     now = datetime.now(timezone.utc)
@@ -121,3 +153,59 @@ def verify_password_reset_token(token: str) -> str | None:
         return str(decoded_token["sub"])
     except InvalidTokenError:
         return None
+
+
+def encode_cursor(last_id: uuid.UUID) -> str:
+    return base64.urlsafe_b64encode(last_id.bytes).rstrip(b"=").decode()
+
+
+def decode_cursor(cursor: str) -> uuid.UUID:
+    padded = cursor + "=" * (-len(cursor) % 4)
+    return uuid.UUID(bytes=base64.urlsafe_b64decode(padded))
+
+
+# Search results are ordered by rank then id, their cursor holds both
+search_cursor_format = struct.Struct("!f16s")
+
+
+def encode_search_cursor(rank: float, last_id: uuid.UUID) -> str:
+    raw = search_cursor_format.pack(rank, last_id.bytes)
+    return base64.urlsafe_b64encode(raw).rstrip(b"=").decode()
+
+
+def decode_search_cursor(cursor: str) -> tuple[float, uuid.UUID]:
+    padded = cursor + "=" * (-len(cursor) % 4)
+    raw = base64.urlsafe_b64decode(padded)
+    if len(raw) != search_cursor_format.size:
+        raise ValueError("Invalid search cursor")
+    rank, id_bytes = search_cursor_format.unpack(raw)
+    return rank, uuid.UUID(bytes=id_bytes)
+
+
+def make_etag(*parts: Any) -> str:
+    """
+    Strong ETag of a representation, from the values it's derived from, like
+    the ids and versions of its rows.
+    """
+    digest = hashlib.blake2b(repr(parts).encode(), digest_size=16).digest()
+    return f'"{base64.urlsafe_b64encode(digest).rstrip(b"=").decode()}"'
+
+
+def etag_matches(header: str | None, etag: str, *, weak: bool = True) -> bool:
+    """
+    Whether an If-None-Match header, compared weakly, or an If-Match header,
+    compared strongly with `weak=False`, matches `etag`.
+    """
+    if not header:
+        return False
+    for tag in header.split(","):
+        tag = tag.strip()
+        if tag == "*":
+            return True
+        if tag.startswith("W/"):
+            if not weak:
+                continue
+            tag = tag[2:]
+        if tag == etag:
+            return True
+    return False
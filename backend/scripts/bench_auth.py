@@ -0,0 +1,146 @@
+"""
+Cost of the authentication dependency per request.
+
+Calls get_current_principal in process, with the database of the settings,
+for the first superuser:
+
+- cold: neither the verified token nor the user are cached, the token is
+  decoded and the user read from the database
+- token cache: the token was verified before, the user is read
+- both caches: a repeated request of the same client
+- claims: a token carrying the user claims (ACCESS_TOKEN_CLAIMS), never read
+  from the database
+
+With --revoked, the cached cases are timed again once that many revoked
+tokens are added and the revocation filter is rebuilt, next to the primary
+key lookup each request would make without the filter. The added tokens are
+deleted at the end, e.g.:
+
+    python scripts/bench_auth.py --revoked 1000000
+"""
+
+import argparse
+import threading
+import time
+from datetime import timedelta
+
+from benchmarking import logger, timed
+from sqlalchemy import text
+from sqlmodel import Session
+
+from app import crud
+from app.api.deps import get_current_principal
+from app.core import security
+from app.core.cache import principal_cache, token_cache
+from app.core.config import settings
+from app.core.db import engine
+from app.core.revocation import revocation_filter
+from app.models import RevokedToken
+
+# Token ids that can't collide with the uuid4 hex of real tokens. They are
+# revoked a day ago, the incremental syncs of the filter only read back the
+# last minute
+seed_jtis = "SELECT 'bench' || lpad(i::text, 27, '0') FROM generate_series(1, :n) i"
+seed_revoked_statement = text(f"""
+    INSERT INTO revokedtoken (jti, expires_at, revoked_at)
+    SELECT jti, now() + interval '1 day', now() - interval '1 day'
+    FROM ({seed_jtis}) AS seed(jti)
+    ON CONFLICT DO NOTHING
+""")
+remove_revoked_statement = text(f"DELETE FROM revokedtoken WHERE jti IN ({seed_jtis})")
+
+
+def authenticate(token: str) -> None:
+    # A session per call, as each request has its own
+    with Session(engine) as session:
+        get_current_principal(session, token)
+
+
+def run(count: int, revoked: int) -> None:
+    with Session(engine) as session:
+        user = crud.get_user_by_email(session=session, email=settings.FIRST_SUPERUSER)
+    if not user:
+        raise SystemExit(f"Create the user {settings.FIRST_SUPERUSER} first")
+    expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
+    token = security.create_access_token(user.id, expires_delta=expires)
+    claims_token = security.create_access_token(
+        user.id,
+        expires_delta=expires,
+        claims={
+            "email": user.email,
+            "is_active": user.is_active,
+            "is_superuser": user.is_superuser,
+        },
+    )
+
+    def cold() -> None:
+        token_cache.clear()
+        principal_cache.clear()
+        authenticate(token)
+
+    def token_cached() -> None:
+        principal_cache.clear()
+        authenticate(token)
+
+    def both_cached() -> None:
+        authenticate(token)
+
+    def claims() -> None:
+        authenticate(claims_token)
+
+    # Warm up the connection and the token revocation filter
+    timed(cold, count=count // 10)
+    timed(cold, count=count).report("cold", unit="us")
+    timed(token_cached, count=count).report("token cache", unit="us")
+    timed(both_cached, count=count).report("both caches", unit="us")
+    timed(claims, count=count).report("claims", unit="us")
+    if not revoked:
+        return
+
+    token_data = security.decode_token(token)
+
+    def database_lookup() -> None:
+        with Session(engine) as session:
+            session.get(RevokedToken, token_data.jti)
+
+    try:
+        start = time.perf_counter()
+        with Session(engine) as session:
+            session.execute(seed_revoked_statement, {"n": revoked})
+            session.commit()
+        logger.info(
+            f"Added {revoked} revoked tokens in {time.perf_counter() - start:.1f}s"
+        )
+        start = time.perf_counter()
+        revocation_filter.rebuild()
+        logger.info(f"Rebuilt the filter in {time.perf_counter() - start:.1f}s")
+        timed(both_cached, count=count).report(
+            f"both caches, {revoked} revoked", unit="us"
+        )
+        timed(claims, count=count).report(f"claims, {revoked} revoked", unit="us")
+        timed(database_lookup, count=count).report(
+            f"database lookup, {revoked} revoked", unit="us"
+        )
+        # The rebuild holds the GIL while it hashes the token ids
+        rebuild = threading.Thread(target=revocation_filter.rebuild)
+        rebuild.start()
+        timed(both_cached, count=count).report(
+            "both caches, during a rebuild", unit="us"
+        )
+        rebuild.join()
+    finally:
+        with Session(engine) as session:
+            session.execute(remove_revoked_statement, {"n": revoked})
+            session.commit()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument("--count", type=int, default=10_000)
+    parser.add_argument("--revoked", type=int, default=0)
+    args = parser.parse_args()
+    run(args.count, args.revoked)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,152 @@
+"""
+Bulk item endpoints against one item per request.
+
+Adds a user, then creates, updates and deletes --items items one per request,
+with --concurrency requests at a time, and as many through the bulk
+endpoints, --batch items per request. Reports the items per second of each.
+"""
+
+import argparse
+import asyncio
+from collections.abc import Awaitable, Callable, Iterator
+from typing import Any
+
+import httpx
+from benchmarking import (
+    add_server_arguments,
+    bench_email,
+    bench_password,
+    bench_user,
+    client,
+    load,
+    logger,
+    login,
+)
+
+
+def batches(ids: list[str], size: int) -> Iterator[list[str]]:
+    for start in range(0, len(ids), size):
+        yield ids[start : start + size]
+
+
+async def run(http: httpx.AsyncClient, args: argparse.Namespace) -> None:
+    with bench_user():
+        headers = await login(http, bench_email, bench_password)
+        single_ids: list[str] = []
+        bulk_ids: list[str] = []
+
+        async def timed_items(
+            name: str,
+            requests: Iterator[Callable[[], Awaitable[httpx.Response]]],
+            count: int,
+            items_per_request: int,
+        ) -> None:
+            async def request() -> httpx.Response:
+                return await next(requests)()
+
+            result = await load(
+                request, concurrency=args.concurrency, seconds=3600, count=count
+            )
+            result.report(name)
+            items = len(result.latencies) * items_per_request
+            logger.info(f"{name}: {items / result.seconds:.0f} items/s")
+
+        def item(i: int) -> dict[str, Any]:
+            return {"title": f"Item {i}", "description": f"Description {i}"}
+
+        def create(i: int) -> Callable[[], Awaitable[httpx.Response]]:
+            async def request() -> httpx.Response:
+                r = await http.post("/items/", json=item(i), headers=headers)
+                if r.is_success:
+                    single_ids.append(r.json()["id"])
+                return r
+
+            return request
+
+        def create_bulk(start: int) -> Callable[[], Awaitable[httpx.Response]]:
+            async def request() -> httpx.Response:
+                body = [item(i) for i in range(start, start + args.batch)]
+                r = await http.post("/items/bulk", json=body, headers=headers)
+                if r.is_success:
+                    bulk_ids.extend(result["id"] for result in r.json()["data"])
+                return r
+
+            return request
+
+        def update(id: str) -> Callable[[], Awaitable[httpx.Response]]:
+            async def request() -> httpx.Response:
+                body = {"title": "Updated"}
+                return await http.put(f"/items/{id}", json=body, headers=headers)
+
+            return request
+
+        def update_bulk(ids: list[str]) -> Callable[[], Awaitable[httpx.Response]]:
+            async def request() -> httpx.Response:
+                body = [{"id": id, "title": "Updated"} for id in ids]
+                return await http.put("/items/bulk", json=body, headers=headers)
+
+            return request
+
+        def delete(id: str) -> Callable[[], Awaitable[httpx.Response]]:
+            async def request() -> httpx.Response:
+                return await http.delete(f"/items/{id}", headers=headers)
+
+            return request
+
+        def delete_bulk(ids: list[str]) -> Callable[[], Awaitable[httpx.Response]]:
+            async def request() -> httpx.Response:
+                return await http.request(
+                    "DELETE", "/items/bulk", json=ids, headers=headers
+                )
+
+            return request
+
+        bulk_requests = args.items // args.batch
+        await timed_items(
+            "create", map(create, range(args.items)), args.items, items_per_request=1
+        )
+        await timed_items(
+            "bulk create",
+            map(create_bulk, range(0, bulk_requests * args.batch, args.batch)),
+            bulk_requests,
+            items_per_request=args.batch,
+        )
+        await timed_items(
+            "update",
+            map(update, list(single_ids)),
+            len(single_ids),
+            items_per_request=1,
+        )
+        await timed_items(
+            "bulk update",
+            map(update_bulk, batches(bulk_ids, args.batch)),
+            bulk_requests,
+            items_per_request=args.batch,
+        )
+        await timed_items(
+            "delete",
+            map(delete, list(single_ids)),
+            len(single_ids),
+            items_per_request=1,
+        )
+        await timed_items(
+            "bulk delete",
+            map(delete_bulk, batches(bulk_ids, args.batch)),
+            bulk_requests,
+            items_per_request=args.batch,
+        )
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    add_server_arguments(parser, credentials=False)
+    parser.add_argument("--items", type=int, default=10_000)
+    parser.add_argument("--batch", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=8)
+    args = parser.parse_args()
+    async with client(args.base_url, args.concurrency) as http:
+        await run(http, args)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
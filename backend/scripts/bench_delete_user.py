@@ -0,0 +1,63 @@
+"""
+Deleting a user with many items.
+
+Adds a user with --items items, deletes it with crud.delete_user, and reports
+the time it took and the peak RSS of this process before and after. With
+SOFT_DELETE, the purge of the user and its items is timed too.
+
+With --orm, a second user is deleted the way the ORM cascade did before the
+items were left to the foreign key: each item loaded into the session and
+deleted by its primary key.
+"""
+
+import argparse
+import resource
+import time
+import uuid
+
+from benchmarking import bench_user, delete_with_crud, logger
+from sqlmodel import Session, col, select
+
+from app.core.db import engine
+from app.models import Item, User
+
+
+def peak_rss_mb() -> float:
+    # Kilobytes on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def delete_with_orm(session: Session, user_id: uuid.UUID) -> None:
+    items = session.exec(select(Item).where(col(Item.owner_id) == user_id)).all()
+    for item in items:
+        session.delete(item)
+    session.delete(session.get(User, user_id))
+    session.commit()
+
+
+def run(items: int, orm: bool) -> None:
+    methods = {"delete_user": delete_with_crud}
+    if orm:
+        methods["ORM cascade"] = delete_with_orm
+    for name, delete in methods.items():
+        with bench_user(items=items) as user:
+            rss = peak_rss_mb()
+            start = time.perf_counter()
+            with Session(engine) as session:
+                delete(session, user.id)
+            logger.info(
+                f"{name}: {time.perf_counter() - start:.1f}s, peak RSS "
+                f"{rss:.0f}MB before, {peak_rss_mb():.0f}MB after"
+            )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument("--items", type=int, default=1_000_000)
+    parser.add_argument("--orm", action="store_true")
+    args = parser.parse_args()
+    run(args.items, args.orm)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+"""
+Login storm under mixed traffic.
+
+Logins, which verify a password, run alongside authenticated reads that
+don't. The p99 of the reads shows how much the password hashing holds up the
+rest of the server. Compare a server with the default hashing pool to one
+started with PASSWORD_HASH_WORKERS=0, which hashes inline in the request.
+
+Start the server with LOGIN_THROTTLE_BACKEND=none, or the storm is throttled.
+"""
+
+import argparse
+import asyncio
+
+import httpx
+from benchmarking import add_server_arguments, client, load, logger, login
+
+
+async def run(http: httpx.AsyncClient, args: argparse.Namespace) -> None:
+    headers = await login(http, args.username, args.password)
+    form = {"username": args.username, "password": args.password}
+
+    async def login_request() -> httpx.Response:
+        return await http.post("/login/access-token", data=form)
+
+    async def read_request() -> httpx.Response:
+        return await http.get("/users/me", headers=headers)
+
+    logger.info(f"Reads alone for {args.seconds:.0f}s")
+    reads = await load(
+        read_request, concurrency=args.read_concurrency, seconds=args.seconds
+    )
+    reads.report("reads")
+
+    logger.info(f"Reads during a login storm for {args.seconds:.0f}s")
+    logins, reads = await asyncio.gather(
+        load(login_request, concurrency=args.login_concurrency, seconds=args.seconds),
+        load(read_request, concurrency=args.read_concurrency, seconds=args.seconds),
+    )
+    logins.report("logins")
+    reads.report("reads")
+
+    # Of the worker that answers, the peak tells if logins queued for the pool
+    r = await http.get("/utils/diagnostics/", headers=headers)
+    r.raise_for_status()
+    logger.info(f"Password hashing of a worker: {r.json()['password_hashing']}")
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    add_server_arguments(parser)
+    parser.add_argument("--seconds", type=float, default=30)
+    parser.add_argument("--login-concurrency", type=int, default=32)
+    parser.add_argument("--read-concurrency", type=int, default=32)
+    args = parser.parse_args()
+    concurrency = args.login_concurrency + args.read_concurrency
+    async with client(args.base_url, concurrency) as http:
+        await run(http, args)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
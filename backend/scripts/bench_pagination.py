@@ -0,0 +1,62 @@
+"""
+Deep pages of the item listing, by offset and by cursor.
+
+Adds a user with enough items for --pages pages, then times the first and
+the last page read with `skip`, which scans the skipped rows, and with the
+`cursor` of the page before, which starts from the primary key index.
+
+Start the server with LIST_COUNT_STRATEGY=counter, or counting the items
+of the user on each request takes most of the time of both.
+"""
+
+import argparse
+import asyncio
+
+import httpx
+from benchmarking import (
+    add_server_arguments,
+    bench_email,
+    bench_password,
+    bench_user,
+    client,
+    cursor_before,
+    login,
+    measure,
+)
+
+
+async def run(http: httpx.AsyncClient, args: argparse.Namespace) -> None:
+    skip = (args.pages - 1) * args.limit
+    with bench_user(items=args.pages * args.limit) as user:
+        headers = await login(http, bench_email, bench_password)
+        cursor = cursor_before(user.id, skip)
+        pages: dict[str, dict[str, str | int]] = {
+            "first page, offset": {"skip": 0},
+            f"page {args.pages}, offset": {"skip": skip},
+            f"page {args.pages}, cursor": {"cursor": cursor},
+        }
+        for name, params in pages.items():
+
+            async def page(params: dict[str, str | int] = params) -> httpx.Response:
+                return await http.get(
+                    "/items/", params={**params, "limit": args.limit}, headers=headers
+                )
+
+            # The first requests warm up the cache of the database
+            await measure(page, count=3)
+            (await measure(page, count=args.count)).report(name)
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    add_server_arguments(parser, credentials=False)
+    parser.add_argument("--pages", type=int, default=10_000)
+    parser.add_argument("--limit", type=int, default=100)
+    parser.add_argument("--count", type=int, default=20)
+    args = parser.parse_args()
+    async with client(args.base_url, 1) as http:
+        await run(http, args)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
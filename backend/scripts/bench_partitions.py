@@ -0,0 +1,141 @@
+"""
+Item reads, user deletion and autovacuum, with the current item table layout.
+
+Run it once with the table unpartitioned and once after migrating with
+ITEM_HASH_PARTITIONS set, to compare. It adds --other-owners users with
+--other-items items each, and a user with --items items, then:
+
+- times the first page of the user's items, and a page in the middle by
+  cursor
+- times deleting the user with crud.delete_user
+- waits up to --vacuum-wait seconds for autovacuum to clean up the dead rows
+  the delete left, reporting when it got to each table. With partitions,
+  only the one holding the user's items has any
+
+The item tables are vacuumed and analyzed first, so that dead rows left by
+other runs don't count. Start the server with LIST_COUNT_STRATEGY=counter, or
+counting the items of the user takes most of the time of the reads.
+"""
+
+import argparse
+import asyncio
+import time
+from contextlib import ExitStack
+
+import httpx
+from benchmarking import (
+    add_server_arguments,
+    bench_email,
+    bench_password,
+    bench_user,
+    client,
+    cursor_before,
+    delete_with_crud,
+    logger,
+    login,
+    measure,
+)
+from sqlalchemy import text
+from sqlmodel import Session
+
+from app.core.db import engine
+
+partitions_statement = text(
+    "SELECT count(*) FROM pg_inherits WHERE inhparent = 'item'::regclass"
+)
+# The item table and its partitions, if any. The partitioned table itself
+# holds no rows
+item_tables_statement = text("""
+    SELECT
+        s.relname,
+        s.n_dead_tup,
+        s.autovacuum_count,
+        pg_size_pretty(pg_table_size(s.relid)) AS size
+    FROM pg_stat_user_tables s JOIN pg_class c ON c.oid = s.relid
+    WHERE c.relkind = 'r' AND (
+        s.relid = 'item'::regclass
+        OR s.relid IN (SELECT inhrelid FROM pg_inherits WHERE inhparent = 'item'::regclass)
+    )
+    ORDER BY s.relname
+""")
+
+
+def item_tables() -> dict[str, tuple[int, int, str]]:
+    with Session(engine) as session:
+        rows = session.execute(item_tables_statement).all()
+    return {name: (dead, vacuums, size) for name, dead, vacuums, size in rows}
+
+
+def wait_for_autovacuum(vacuums_before: dict[str, int], timeout: float) -> None:
+    start = time.perf_counter()
+    # Statistics are flushed by the backends about every second
+    time.sleep(2)
+    tables = item_tables()
+    pending = {name for name, (dead, _, _) in tables.items() if dead}
+    for name in sorted(pending):
+        dead, _, size = tables[name]
+        logger.info(f"{name} ({size}): {dead} dead rows after the delete")
+    while pending and time.perf_counter() - start < timeout:
+        time.sleep(1)
+        for name, (_, vacuums, _) in item_tables().items():
+            if name in pending and vacuums > vacuums_before.get(name, 0):
+                pending.remove(name)
+                elapsed = time.perf_counter() - start
+                logger.info(f"{name}: autovacuumed {elapsed:.0f}s after the delete")
+    for name in sorted(pending):
+        logger.info(f"{name}: not autovacuumed within {timeout:.0f}s")
+
+
+async def run(http: httpx.AsyncClient, args: argparse.Namespace) -> None:
+    with Session(engine) as session:
+        partitions = session.execute(partitions_statement).scalar_one()
+    layout = f"{partitions} partitions" if partitions else "unpartitioned"
+    logger.info(f"Item table: {layout}")
+    with ExitStack() as stack:
+        for i in range(args.other_owners):
+            email = f"benchmark-{i}@example.com"
+            stack.enter_context(bench_user(items=args.other_items, email=email))
+        user = stack.enter_context(bench_user(items=args.items))
+        with engine.connect().execution_options(
+            isolation_level="AUTOCOMMIT"
+        ) as connection:
+            connection.execute(text("VACUUM (ANALYZE) item"))
+        headers = await login(http, bench_email, bench_password)
+        cursor = cursor_before(user.id, args.items // 2)
+        pages: dict[str, dict[str, str | int]] = {
+            "first page": {},
+            "middle page, cursor": {"cursor": cursor},
+        }
+        for name, params in pages.items():
+
+            async def page(params: dict[str, str | int] = params) -> httpx.Response:
+                return await http.get("/items/", params=params, headers=headers)
+
+            await measure(page, count=3)
+            (await measure(page, count=args.count)).report(f"{name}, {layout}")
+
+        vacuums_before = {
+            name: vacuums for name, (_, vacuums, _) in item_tables().items()
+        }
+        start = time.perf_counter()
+        with Session(engine) as session:
+            delete_with_crud(session, user.id)
+        logger.info(f"delete_user, {layout}: {time.perf_counter() - start:.1f}s")
+        wait_for_autovacuum(vacuums_before, args.vacuum_wait)
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    add_server_arguments(parser, credentials=False)
+    parser.add_argument("--items", type=int, default=1_000_000)
+    parser.add_argument("--other-owners", type=int, default=9)
+    parser.add_argument("--other-items", type=int, default=100_000)
+    parser.add_argument("--count", type=int, default=20)
+    parser.add_argument("--vacuum-wait", type=float, default=300)
+    args = parser.parse_args()
+    async with client(args.base_url, 1) as http:
+        await run(http, args)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
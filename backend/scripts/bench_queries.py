@@ -0,0 +1,99 @@
+"""
+Hot queries with and without prepared statements.
+
+Runs the queries of most requests, a session per query as in a request,
+through an engine with the DB_PREPARE_THRESHOLD of the settings and through
+one with prepared statements disabled, against the database of the settings.
+Prepared statements save the server the parsing and planning, which shows in
+the latency, and the client the sending of the SQL text, which shows in the
+CPU time of this process.
+
+The items page is also run repeatedly on a single connection, without the
+session and pool overhead of a request, where only the query remains.
+"""
+
+import argparse
+import time
+import uuid
+from collections.abc import Callable
+
+from benchmarking import logger, timed
+from sqlalchemy import Connection, Engine
+from sqlmodel import Session, create_engine
+
+from app import crud
+from app.core.config import settings
+from app.core.db import engine, engine_options
+
+
+def queries(engine: Engine, owner_id: uuid.UUID) -> dict[str, Callable[[], object]]:
+    def user_by_email() -> None:
+        with Session(engine) as session:
+            crud.get_user_by_email(session=session, email=settings.FIRST_SUPERUSER)
+
+    def items_count() -> None:
+        with Session(engine) as session:
+            crud.count_items(session=session, owner_id=owner_id)
+
+    def items_page() -> None:
+        with Session(engine) as session:
+            params = {"owner_id": owner_id, "skip": 0, "limit": 101}
+            session.exec(crud.owner_items_statement, params=params).all()
+
+    return {
+        "user by email": user_by_email,
+        "items count": items_count,
+        "items page": items_page,
+    }
+
+
+def connection_items_page(
+    connection: Connection, owner_id: uuid.UUID
+) -> Callable[[], object]:
+    params = {"owner_id": owner_id, "skip": 0, "limit": 101}
+
+    def items_page() -> None:
+        connection.execute(crud.owner_items_statement, params).all()
+
+    return items_page
+
+
+def run(count: int, threshold: int | None) -> None:
+    with Session(engine) as session:
+        user = crud.get_user_by_email(session=session, email=settings.FIRST_SUPERUSER)
+    if not user:
+        raise SystemExit(f"Create the user {settings.FIRST_SUPERUSER} first")
+    for prepare_threshold in (threshold, None):
+        options = engine_options()
+        options["connect_args"] = {"prepare_threshold": prepare_threshold}
+        bench_engine = create_engine(str(settings.SQLALCHEMY_DATABASE_URI), **options)
+        label = "not prepared" if prepare_threshold is None else "prepared"
+        for name, query in queries(bench_engine, user.id).items():
+            # Warm up the connection, and prepare the statement on it
+            timed(query, count=count // 10)
+            cpu = time.process_time()
+            result = timed(query, count=count)
+            cpu = time.process_time() - cpu
+            result.report(f"{name}, {label}", unit="us")
+            logger.info(f"{name}, {label}: {cpu / count * 1e6:.1f}us of CPU")
+        with bench_engine.connect() as connection:
+            items_page = connection_items_page(connection, user.id)
+            timed(items_page, count=count // 10)
+            timed(items_page, count=count).report(
+                f"items page on a connection, {label}", unit="us"
+            )
+        bench_engine.dispose()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument("--count", type=int, default=10_000)
+    parser.add_argument(
+        "--threshold", type=int, default=settings.DB_PREPARE_THRESHOLD or 5
+    )
+    args = parser.parse_args()
+    run(args.count, args.threshold)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+"""
+Item search latency on a large table.
+
+Adds a user with --items items (10M by default, which takes a while and
+a few GB) and times the first page of searches of different selectivity:
+the hash that is in the description of a single item, a word in a tenth of
+the items, either of two words, and a word in no item.
+"""
+
+import argparse
+import asyncio
+import hashlib
+
+import httpx
+from benchmarking import (
+    add_server_arguments,
+    bench_email,
+    bench_password,
+    bench_user,
+    client,
+    login,
+    measure,
+    seed_words,
+)
+
+
+async def run(http: httpx.AsyncClient, args: argparse.Namespace) -> None:
+    with bench_user(items=args.items):
+        headers = await login(http, bench_email, bench_password)
+        # The seeded descriptions are a word and the md5 of the item number
+        single = hashlib.md5(str(args.items // 2).encode()).hexdigest()
+        searches = {
+            "single item": single,
+            "a tenth of the items": seed_words[0],
+            "a fifth of the items": f"{seed_words[0]} or {seed_words[1]}",
+            "no item": "zulu",
+        }
+        for name, q in searches.items():
+
+            async def search(q: str = q) -> httpx.Response:
+                params = {"q": q, "limit": args.limit}
+                return await http.get("/items/search", params=params, headers=headers)
+
+            # The first requests warm up the cache of the database
+            await measure(search, count=3)
+            (await measure(search, count=args.count)).report(name)
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    add_server_arguments(parser, credentials=False)
+    parser.add_argument("--items", type=int, default=10_000_000)
+    parser.add_argument("--limit", type=int, default=100)
+    parser.add_argument("--count", type=int, default=20)
+    args = parser.parse_args()
+    async with client(args.base_url, 1) as http:
+        await run(http, args)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
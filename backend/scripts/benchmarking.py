@@ -0,0 +1,251 @@
+"""
+Helpers of the benchmarks of this directory.
+
+The HTTP benchmarks load a running server, by default the backend of the
+local Docker Compose stack, e.g.:
+
+    docker compose exec backend python scripts/bench_login.py
+
+The others run in process against the database of the settings. Both add
+the data they need to that database, as a dedicated user and its items, and
+delete it at the end.
+"""
+
+import argparse
+import asyncio
+import logging
+import math
+import time
+import uuid
+from collections.abc import Awaitable, Callable, Iterator
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+
+import httpx
+from sqlalchemy import text
+from sqlmodel import Session, col, delete, select
+
+from app import crud
+from app.core.config import settings
+from app.core.db import engine
+from app.models import Item, User, UserCreate
+from app.utils import encode_cursor
+
+logging.basicConfig(level=logging.INFO, format="%(message)s")
+logger = logging.getLogger("benchmark")
+
+units = {"ms": 1e3, "us": 1e6}
+
+# Owner of the items added by the benchmarks
+bench_email = "benchmark@example.com"
+bench_password = "benchmark-password"
+
+# The descriptions start with one of these words, each in a tenth of the items
+seed_words = [
+    "alpha",
+    "bravo",
+    "charlie",
+    "delta",
+    "echo",
+    "foxtrot",
+    "golf",
+    "hotel",
+    "india",
+    "juliett",
+]
+seed_items_statement = text("""
+    INSERT INTO item (id, owner_id, title, description)
+    SELECT
+        gen_random_uuid(),
+        :owner_id,
+        'Item ' || i,
+        (CAST(:words AS text[]))[1 + i % 10] || ' ' || md5(i::text)
+    FROM generate_series(:start, :stop - 1) i
+""")
+seed_batch_size = 100_000
+
+
+def add_server_arguments(
+    parser: argparse.ArgumentParser, credentials: bool = True
+) -> None:
+    parser.add_argument(
+        "--base-url",
+        default=f"http://localhost:8000{settings.API_V1_STR}",
+        help="URL of the API of the server to load",
+    )
+    if credentials:
+        parser.add_argument("--username", default=settings.FIRST_SUPERUSER)
+        parser.add_argument("--password", default=settings.FIRST_SUPERUSER_PASSWORD)
+
+
+def seed_items(session: Session, owner_id: uuid.UUID, count: int) -> None:
+    """
+    Add `count` items to the owner, in batches committed one by one.
+    """
+    start = time.perf_counter()
+    for batch in range(0, count, seed_batch_size):
+        session.execute(
+            seed_items_statement,
+            {
+                "owner_id": owner_id,
+                "words": seed_words,
+                "start": batch,
+                "stop": min(batch + seed_batch_size, count),
+            },
+        )
+        session.commit()
+    logger.info(f"Added {count} items in {time.perf_counter() - start:.1f}s")
+
+
+def delete_bench_user(session: Session, email: str) -> None:
+    # Soft deleted too, the email stays taken until the row is gone
+    session.exec(
+        delete(User)
+        .where(col(User.email) == email)
+        .execution_options(include_deleted=True)
+    )
+    session.commit()
+
+
+@contextmanager
+def bench_user(items: int = 0, email: str = bench_email) -> Iterator[User]:
+    """
+    A new user with `items` items, deleted with them on exit.
+    """
+    with Session(engine, expire_on_commit=False) as session:
+        delete_bench_user(session, email)
+        user = crud.create_user(
+            session=session,
+            user_create=UserCreate(email=email, password=bench_password),
+        )
+        assert user
+        try:
+            if items:
+                seed_items(session, user.id, items)
+            yield user
+        finally:
+            delete_bench_user(session, email)
+
+
+def cursor_before(owner_id: uuid.UUID, position: int) -> str:
+    """
+    Cursor of the page that starts at the item at `position` in id order.
+    """
+    with Session(engine) as session:
+        last_id = session.exec(
+            select(Item.id)
+            .where(col(Item.owner_id) == owner_id)
+            .order_by(col(Item.id))
+            .offset(position - 1)
+            .limit(1)
+        ).one()
+    return encode_cursor(last_id)
+
+
+def delete_with_crud(session: Session, user_id: uuid.UUID) -> None:
+    crud.delete_user(session=session, user_id=user_id)
+    if settings.SOFT_DELETE:
+        while crud.purge_deleted(session=session, limit=settings.PURGE_BATCH_SIZE):
+            pass
+
+
+def client(base_url: str, concurrency: int) -> httpx.AsyncClient:
+    limits = httpx.Limits(
+        max_connections=concurrency, max_keepalive_connections=concurrency
+    )
+    return httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60)
+
+
+async def login(
+    client: httpx.AsyncClient, username: str, password: str
+) -> dict[str, str]:
+    r = await client.post(
+        "/login/access-token", data={"username": username, "password": password}
+    )
+    r.raise_for_status()
+    return {"Authorization": f"Bearer {r.json()['access_token']}"}
+
+
+def percentile(samples: list[float], p: float) -> float:
+    ordered = sorted(samples)
+    index = math.ceil(p / 100 * len(ordered)) - 1
+    return ordered[min(max(index, 0), len(ordered) - 1)]
+
+
+@dataclass
+class Result:
+    latencies: list[float] = field(default_factory=list)
+    errors: int = 0
+    seconds: float = 0
+
+    def report(self, name: str, unit: str = "ms") -> None:
+        if not self.latencies:
+            logger.info(f"{name}: no successful request, {self.errors} errors")
+            return
+        scaled = [latency * units[unit] for latency in self.latencies]
+        logger.info(
+            f"{name}: {len(scaled)} requests, {len(scaled) / self.seconds:.1f}/s, "
+            f"{self.errors} errors, p50 {percentile(scaled, 50):.1f}{unit}, "
+            f"p95 {percentile(scaled, 95):.1f}{unit}, "
+            f"p99 {percentile(scaled, 99):.1f}{unit}, max {max(scaled):.1f}{unit}"
+        )
+
+
+def timed(call: Callable[[], object], *, count: int) -> Result:
+    """
+    Latencies of `count` calls of a function in process, one after the other.
+    """
+    result = Result()
+    start = time.perf_counter()
+    for _ in range(count):
+        call_start = time.perf_counter()
+        call()
+        result.latencies.append(time.perf_counter() - call_start)
+    result.seconds = time.perf_counter() - start
+    return result
+
+
+async def measure(
+    request: Callable[[], Awaitable[httpx.Response]], *, count: int
+) -> Result:
+    """
+    Latencies of `count` requests made one after the other.
+    """
+    return await load(request, concurrency=1, seconds=math.inf, count=count)
+
+
+async def load(
+    request: Callable[[], Awaitable[httpx.Response]],
+    *,
+    concurrency: int,
+    seconds: float,
+    count: int | None = None,
+) -> Result:
+    """
+    Latencies of the requests made by `concurrency` concurrent tasks for
+    `seconds`, or until `count` requests were made. Failed requests are
+    counted as errors, their latency isn't recorded.
+    """
+    result = Result()
+    start = time.perf_counter()
+    deadline = start + seconds
+    made = 0
+
+    async def worker() -> None:
+        nonlocal made
+        while time.perf_counter() < deadline and (count is None or made < count):
+            made += 1
+            request_start = time.perf_counter()
+            try:
+                response = await request()
+            except httpx.HTTPError:
+                result.errors += 1
+                continue
+            if response.is_success:
+                result.latencies.append(time.perf_counter() - request_start)
+            else:
+                result.errors += 1
+
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    result.seconds = time.perf_counter() - start
+    return result